@@ -1,8 +1,8 @@
 import os
-from flask import Flask
+from flask import Flask, flash, jsonify, redirect, request, url_for
 from dotenv import load_dotenv
 from sqlalchemy import event
-from .extensions import db, migrate, login_manager, scheduler
+from .extensions import db, migrate, login_manager
 
 
 def create_app():
@@ -20,6 +20,38 @@ def create_app():
     app.config["SQLALCHEMY_DATABASE_URI"] = _raw_db_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     app.config["UPLOAD_FOLDER"] = os.getenv("UPLOAD_FOLDER", "uploads")
+    # Dónde viven los documentos: local (UPLOAD_FOLDER) o s3 (bucket S3/MinIO)
+    app.config["STORAGE_BACKEND"] = os.getenv("STORAGE_BACKEND", "local")
+    app.config["S3_BUCKET"] = os.getenv("S3_BUCKET")
+    app.config["S3_PREFIX"] = os.getenv("S3_PREFIX", "")
+    app.config["S3_ENDPOINT_URL"] = os.getenv("S3_ENDPOINT_URL")
+    app.config["S3_REGION"] = os.getenv("S3_REGION")
+    # Vigencia de las URLs firmadas de descarga; 0 transmite a través de Flask
+    app.config["S3_PRESIGN_EXPIRES"] = int(os.getenv("S3_PRESIGN_EXPIRES", "300"))
+    # Entrega de archivos locales: flask (en el proceso), x-accel (nginx) o x-sendfile (Apache)
+    app.config["FILE_DELIVERY"] = os.getenv("FILE_DELIVERY", "flask")
+    app.config["X_ACCEL_PREFIX"] = os.getenv("X_ACCEL_PREFIX", "/protected-uploads/")
+    app.config["USE_X_SENDFILE"] = app.config["FILE_DELIVERY"] == "x-sendfile"
+    # Cargas por partes reanudables: tamaño máximo del archivo y horas sin actividad antes de descartarlas.
+    # Las partes quedan en UPLOAD_FOLDER/_cargas de cada servidor: con varios, el balanceador tiene
+    # que mandar los pedidos de una carga siempre al mismo (o UPLOAD_FOLDER ser un volumen compartido)
+    app.config["CHUNKED_UPLOAD_MAX_BYTES"] = int(os.getenv("CHUNKED_UPLOAD_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+    app.config["CHUNKED_UPLOAD_TTL"] = int(os.getenv("CHUNKED_UPLOAD_TTL_HOURS", "24")) * 3600
+    # Tope del cuerpo de un pedido (formularios multipart incluidos) y de los campos de texto en memoria
+    app.config["MAX_CONTENT_LENGTH"] = int(os.getenv("MAX_UPLOAD_MB", "512")) * 1024 * 1024
+    app.config["MAX_FORM_MEMORY_SIZE"] = int(os.getenv("MAX_FORM_MEMORY_SIZE", "500000"))
+    # Hilos que pasan al almacén en segundo plano los documentos subidos por formulario (hash y blob)
+    app.config["UPLOAD_WORKERS"] = int(os.getenv("UPLOAD_WORKERS", "4"))
+    # Paginación de listados: auto (keyset en tablas grandes), offset o keyset
+    app.config["LIST_PAGINATION_MODE"] = os.getenv("LIST_PAGINATION_MODE", "auto")
+    app.config["KEYSET_MIN_ROWS"] = int(os.getenv("KEYSET_MIN_ROWS", "10000"))
+    # Caché en memoria de los parciales de búsqueda en vivo (por proceso)
+    app.config["FRAGMENT_CACHE_ENABLED"] = os.getenv("FRAGMENT_CACHE_ENABLED", "1") != "0"
+    app.config["FRAGMENT_CACHE_MAX_BYTES"] = int(os.getenv("FRAGMENT_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+
+    # Los archivos de formularios se escriben en UPLOAD_FOLDER mientras se reciben
+    from .uploads import SpoolingRequest
+    app.request_class = SpoolingRequest
 
     # Extensiones
     db.init_app(app)
@@ -44,9 +76,14 @@ def create_app():
             # Si aún no hay engine o falla la escucha, lo ignoramos silenciosamente
             pass
 
-    # Programador de tareas para alertas
-    from .jobs.alerts import register_jobs
-    register_jobs(app)
+    # Versionado de tablas para el caché de fragmentos
+    from .cache import fragment_cache, release_fragment_flights
+    fragment_cache.max_bytes = app.config["FRAGMENT_CACHE_MAX_BYTES"]
+    app.teardown_request(release_fragment_flights)
+
+    # Las tareas programadas corren aparte con `flask run-scheduler`
+    from .commands import register_commands
+    register_commands(app)
 
     # Blueprints
     from .auth.routes import bp as auth_bp
@@ -55,7 +92,6 @@ def create_app():
     from .proyectos.routes import bp as proyectos_bp
     from .propiedades.routes import bp as propiedades_bp
     from .vencimientos.routes import bp as vencimientos_bp
-    from .documentos.routes import bp as documentos_bp
     from .mades.routes import bp as mades_bp
 
     app.register_blueprint(auth_bp)
@@ -64,9 +100,17 @@ def create_app():
     app.register_blueprint(propiedades_bp, url_prefix="/propiedades")
     app.register_blueprint(proyectos_bp, url_prefix="/proyectos")
     app.register_blueprint(vencimientos_bp, url_prefix="/vencimientos")
-    app.register_blueprint(documentos_bp, url_prefix="/documentos")
     app.register_blueprint(mades_bp, url_prefix="/mades")
 
+    @app.errorhandler(413)
+    def _upload_too_large(error):
+        limite = app.config["MAX_CONTENT_LENGTH"] // (1024 * 1024)
+        mensaje = f"El envío supera el máximo de {limite} MB."
+        if request.accept_mimetypes.best == "application/json" or request.is_json:
+            return jsonify({"ok": False, "error": mensaje}), 413
+        flash(mensaje + " Para archivos grandes usá la carga desde la ficha del proyecto.", "warning")
+        return redirect(request.referrer or url_for("dashboard.index"))
+
     # Crear carpeta de uploads
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
 
@@ -0,0 +1,264 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+from flask_login import current_user
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import DataVersion
+
+# Tope por defecto del caché de fragmentos (caracteres de HTML por proceso)
+FRAGMENT_CACHE_MAX_BYTES = 8 * 1024 * 1024
+# Segundos que una petición espera a otra idéntica antes de calcular por su cuenta
+FRAGMENT_FLIGHT_TIMEOUT = 10
+
+_CHANGED_TABLES = '_tablas_modificadas'
+
+
+# --- Versiones de datos -----------------------------------------------------
+
+def _track(session, tables):
+    session.info.setdefault(_CHANGED_TABLES, set()).update(
+        table for table in tables if table != DataVersion.__tablename__
+    )
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flushed_tables(session, flush_context):
+    _track(
+        session,
+        (
+            obj.__table__.name
+            for obj in (*session.new, *session.dirty, *session.deleted)
+            if hasattr(obj, '__table__')
+        ),
+    )
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_tables(orm_execute_state):
+    # query.update()/delete() e insert(Modelo) no pasan por el flush
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None:
+            _track(orm_execute_state.session, [mapper.local_table.name])
+
+
+@event.listens_for(Session, 'before_commit')
+def _bump_data_versions(session):
+    # El incremento viaja en la misma transacción que los cambios: si el
+    # commit falla, la versión tampoco cambia.
+    session.flush()
+    tables = session.info.pop(_CHANGED_TABLES, None)
+    if not tables:
+        return
+    connection = session.connection()
+    tabla = DataVersion.__table__
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    for name in sorted(tables):  # orden fijo: evita interbloqueos entre commits
+        stmt = dialect.insert(tabla).values(tabla=name, version=1)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['tabla'],
+            set_={'version': tabla.c.version + 1},
+        )
+        connection.execute(stmt)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_data_versions(session):
+    session.info.pop(_CHANGED_TABLES, None)
+
+
+def data_versions(*tables):
+    """Versión actual de cada tabla (0 si nunca cambió), en el orden pedido."""
+    rows = dict(
+        db.session.query(DataVersion.tabla, DataVersion.version)
+        .filter(DataVersion.tabla.in_(tables))
+        .all()
+    )
+    return tuple(rows.get(table, 0) for table in tables)
+
+
+# --- Caché de fragmentos ------------------------------------------------------
+
+class FragmentCache:
+    """LRU de HTML renderizado con tope de tamaño total.
+
+    Las claves incluyen las versiones de datos, así que no hace falta
+    invalidar: una escritura cambia la versión y las entradas viejas dejan de
+    pedirse hasta que el LRU las descarta.
+    """
+
+    def __init__(self, max_bytes=FRAGMENT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = len(value)
+        # Un fragmento enorme no debe vaciar el caché entero
+        if size > self.max_bytes // 8:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+fragment_cache = FragmentCache()
+
+
+def fragment_key(template, tables, **params):
+    """Clave (plantilla, parámetros normalizados, versiones de ``tables``).
+
+    Se lee la versión antes de consultar los datos: un commit intermedio deja
+    el fragmento guardado bajo una versión que ya nadie va a pedir, nunca al
+    revés.
+    """
+    return (template, tuple(sorted(params.items())), data_versions(*tables))
+
+
+class SingleFlight:
+    """Registro de cálculos en curso: el primero calcula, los demás esperan."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def acquire(self, key):
+        """Devuelve (es_lider, evento). El líder debe llamar a ``release``."""
+        with self._lock:
+            done = self._calls.get(key)
+            if done is not None:
+                return False, done
+            done = self._calls[key] = threading.Event()
+            return True, done
+
+    def release(self, key):
+        with self._lock:
+            done = self._calls.pop(key, None)
+        if done is not None:
+            done.set()
+
+
+_fragment_flights = SingleFlight()
+
+
+def cached_fragment(key):
+    """Fragmento guardado para ``key``, o None si esta petición debe renderizarlo.
+
+    Si otra petición del mismo proceso ya está calculando la misma clave, se
+    espera a que termine y se usa su resultado en lugar de repetir la consulta.
+    """
+    if not current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        return None
+    html = fragment_cache.get(key)
+    if html is not None:
+        return html
+    leader, done = _fragment_flights.acquire(key)
+    if leader:
+        g.setdefault('fragment_flights', []).append(key)
+        return None
+    timeout = current_app.config.get('FRAGMENT_FLIGHT_TIMEOUT', FRAGMENT_FLIGHT_TIMEOUT)
+    if done.wait(timeout):
+        # Puede seguir vacío si el líder falló; entonces se calcula aquí
+        return fragment_cache.get(key)
+    return None
+
+
+def store_fragment(key, html):
+    if current_app.config.get('FRAGMENT_CACHE_ENABLED', True):
+        fragment_cache.set(key, html)
+    flights = g.get('fragment_flights')
+    if flights and key in flights:
+        flights.remove(key)
+        _fragment_flights.release(key)
+    return html
+
+
+def release_fragment_flights(exc=None):
+    """teardown_request: libera las claves que la petición no llegó a guardar."""
+    for key in g.pop('fragment_flights', []):
+        _fragment_flights.release(key)
+
+
+# --- GET condicional ----------------------------------------------------------
+
+_deploy_token = None
+
+
+def _templates_token():
+    # Cambia con cada despliegue que toca plantillas o estáticos, y es igual
+    # en todos los procesos de un mismo despliegue.
+    global _deploy_token
+    if _deploy_token is None:
+        newest = 0
+        for folder in (current_app.template_folder, current_app.static_folder):
+            folder = os.path.join(current_app.root_path, folder)
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    newest = max(newest, os.path.getmtime(os.path.join(root, name)))
+        _deploy_token = str(newest)
+    return _deploy_token
+
+
+def conditional_view(*tables):
+    """Responde 304 si no cambió ninguna de ``tables`` desde la última visita.
+
+    El ETag débil se arma con las versiones de datos, la URL completa, el
+    usuario, el despliegue y la fecha del día (tableros y fichas muestran
+    "vence en N días" calculado con date.today()), antes de ejecutar la
+    vista. No se usa si hay mensajes flash pendientes: la página los consume
+    al renderizarse.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method != 'GET' or session.get('_flashes'):
+                return view(*args, **kwargs)
+            parts = (
+                request.full_path,
+                request.headers.get('X-Requested-With', ''),
+                current_user.get_id() if current_user.is_authenticated else '',
+                _templates_token(),
+                date.today().isoformat(),
+                data_versions(*tables),
+            )
+            etag = hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('X-Requested-With')
+            return response
+        return wrapper
+    return decorator
@@ -1,10 +1,21 @@
+import hashlib
 import os
-from uuid import uuid4
-from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, send_file, abort
+from flask import Blueprint, render_template, request, redirect, url_for, current_app, flash, abort, jsonify
 from flask_login import login_required
 from datetime import date
 from ..extensions import db
-from ..models import Cliente, Proyecto, DocumentoCliente
+from ..models import Cliente, ProyectoResumen, DocumentoCliente, resumen_subtipo
+from ..cache import cached_fragment, conditional_view, fragment_key, store_fragment
+from ..pagination import count_rows, cursor_signature, keyset_paginate, sort_clauses, use_keyset
+from ..storage import delete_stored, send_stored, store_upload
+from ..search import (
+    LIKE_ESCAPE,
+    escape_like,
+    key_search_filter,
+    normalize_search_text,
+    text_search_filter,
+    text_search_rank,
+)
 from sqlalchemy import or_, func
 from werkzeug.utils import secure_filename
 
@@ -13,6 +24,7 @@ PAGE_SIZE_OPTIONS = (10, 20, 30, 40, 50, 100)
 
 @bp.route('/')
 @login_required
+@conditional_view('cliente')
 def list_clientes():
     q = request.args.get('q', '')
     page = request.args.get('page', type=int, default=1)
@@ -25,16 +37,19 @@ def list_clientes():
     sort_direction = request.args.get('direction', 'asc')
     if sort_direction not in ('asc', 'desc'):
         sort_direction = 'asc'
+    cursor = request.args.get('cursor')
 
     query = Cliente.query
+    search_columns = (
+        Cliente.cedula_identidad,
+        Cliente.correo_electronico,
+        Cliente.telefono,
+    )
     if q:
-        like = f'%{q}%'
         query = query.filter(
             or_(
-                Cliente.nombre_razon_social.ilike(like),
-                Cliente.cedula_identidad.ilike(like),
-                Cliente.correo_electronico.ilike(like),
-                Cliente.telefono.ilike(like),
+                key_search_filter(q, Cliente.nombre_busqueda),
+                text_search_filter(q, *search_columns),
             )
         )
     sort_columns = {
@@ -47,16 +62,56 @@ def list_clientes():
     if sort_field not in sort_columns:
         sort_field = 'nombre'
     order_column = sort_columns[sort_field]
-    if sort_direction == 'asc':
-        query = query.order_by(order_column.asc().nullslast(), Cliente.nombre_razon_social.asc())
-    else:
-        query = query.order_by(order_column.desc().nullslast(), Cliente.nombre_razon_social.desc())
 
-    pagination = query.paginate(
-        page=page,
-        per_page=per_page,
-        error_out=False,
-    )
+    is_fragment = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    if is_fragment:
+        cache_key = fragment_key(
+            'clientes/_results.html',
+            ('cliente',),
+            q=q.strip(),
+            page=page,
+            per_page=per_page,
+            sort=sort_field,
+            direction=sort_direction,
+            cursor=cursor,
+        )
+        cached = cached_fragment(cache_key)
+        if cached is not None:
+            return cached
+
+    # Con el orden por defecto, una búsqueda se ordena por relevancia
+    ranked = bool(q) and sort_field == 'nombre' and sort_direction == 'asc'
+    if ranked:
+        rank = text_search_rank(normalize_search_text(q), Cliente.nombre_busqueda, *search_columns)
+
+    total, total_is_estimate = count_rows(query)
+    if use_keyset(cursor, total, total_is_estimate):
+        pagination = keyset_paginate(
+            query,
+            rank if ranked else order_column,
+            Cliente.id_cliente,
+            False if ranked else sort_direction == 'asc',
+            per_page,
+            cursor,
+            cursor_signature('clientes', q, sort_field, sort_direction),
+            total,
+            total_is_estimate,
+        )
+    else:
+        if ranked:
+            query = query.order_by(rank.desc(), Cliente.nombre_razon_social.asc())
+        else:
+            query = query.order_by(
+                *sort_clauses(order_column, Cliente.id_cliente, sort_direction == 'asc')
+            )
+        pagination = query.paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False,
+            count=False,
+        )
+        pagination.total = total
+        pagination.total_is_estimate = total_is_estimate
     clientes = pagination.items
     common_params = {
         'q': q,
@@ -80,8 +135,8 @@ def list_clientes():
         'build_client_url': _build_url,
     }
 
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return render_template('clientes/_results.html', **template_kwargs)
+    if is_fragment:
+        return store_fragment(cache_key, render_template('clientes/_results.html', **template_kwargs))
 
     return render_template('clientes/list.html', **template_kwargs)
 
@@ -145,6 +200,52 @@ def _module_meta(key):
     return data
 
 
+MODULE_ORDER = ['MADES', 'SENAVE', 'INFONA', 'Asesoría Jurídica']
+SUBTIPO_ORDER = {
+    'MADES': [
+        'EIA',
+        'Auditorías',
+        'PGAG',
+        'Plan de ajuste Ambiental',
+        'Certificado de No Requiere',
+        'Certificación de Servicios Ambientales',
+        'Otros',
+    ],
+}
+
+
+def _module_keys():
+    keys = [key for key in MODULE_ORDER if key in MODULE_DEFINITIONS]
+    keys.extend(key for key in MODULE_DEFINITIONS if key not in keys)
+    return keys
+
+
+def _module_entry(id_cliente, key, count):
+    meta = _module_meta(key)
+    return {
+        'key': meta['key'],
+        'label': meta['label'],
+        'full_name': meta['full_name'],
+        'logo': meta['logo_url'],
+        'color': meta['color'],
+        'icon': meta['icon'],
+        'count': count,
+        'url': url_for('clientes.modulo_subtipos', id_cliente=id_cliente, inst=meta['key']),
+    }
+
+
+def _subtipo_sort_key(module_key):
+    preferred_order = SUBTIPO_ORDER.get(module_key, [])
+
+    def _sort_key(item):
+        nombre = item['name']
+        if nombre in preferred_order:
+            return (0, preferred_order.index(nombre))
+        return (1, nombre.lower())
+
+    return _sort_key
+
+
 def _optional(form, name):
     value = form.get(name)
     if value is None:
@@ -153,26 +254,9 @@ def _optional(form, name):
     return value or None
 
 
-def _normalize_subtipo(value):
-    if value is None:
-        return 'Otros'
-    normalized = value.strip()
-    return normalized or 'Otros'
-
-
-def _cliente_upload_dir(cliente_id):
-    base_upload = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-    if not os.path.isabs(base_upload):
-        base_upload = os.path.join(current_app.root_path, base_upload)
-    target_dir = os.path.join(base_upload, 'clientes', str(cliente_id))
-    os.makedirs(target_dir, exist_ok=True)
-    return target_dir
-
-
 def _guardar_documentos_cliente(cliente, archivos):
     if not archivos:
         return
-    target_dir = _cliente_upload_dir(cliente.id_cliente)
     for archivo in archivos:
         if not archivo or not archivo.filename:
             continue
@@ -181,14 +265,13 @@ def _guardar_documentos_cliente(cliente, archivos):
             flash(f'Archivo no permitido: {archivo.filename}', 'warning')
             continue
         filename = secure_filename(archivo.filename)
-        unique_name = f"{uuid4().hex}_{filename}"
-        save_path = os.path.join(target_dir, unique_name)
-        archivo.save(save_path)
+        sha256, relative = store_upload(archivo)
 
         doc = DocumentoCliente(
             id_cliente=cliente.id_cliente,
             nombre_original=filename,
-            archivo_url=save_path,
+            archivo_url=relative,
+            sha256=sha256,
             mime_type=archivo.mimetype or ''
         )
         db.session.add(doc)
@@ -249,16 +332,63 @@ def buscar():
     q = request.args.get('q', '')
     clientes = []
     if q:
-        like = f'%{q}%'
         clientes = Cliente.query.filter(
             or_(
-                Cliente.nombre_razon_social.ilike(like),
-                Cliente.cedula_identidad.ilike(like)
+                key_search_filter(q, Cliente.nombre_busqueda),
+                text_search_filter(q, Cliente.cedula_identidad),
             )
-        ).order_by(Cliente.nombre_razon_social.asc()).all()
+        ).order_by(
+            text_search_rank(
+                normalize_search_text(q), Cliente.nombre_busqueda, Cliente.cedula_identidad
+            ).desc(),
+            Cliente.nombre_razon_social.asc(),
+        ).all()
     return render_template('clientes/search.html', q=q, clientes=clientes)
 
 
+LOOKUP_PAGE_SIZE = 20
+
+
+@bp.route('/lookup')
+@login_required
+def lookup():
+    """Páginas de (id, nombre) para el selector de clientes con autocompletado."""
+    q = request.args.get('q', '', type=str).strip()
+    page = max(request.args.get('page', type=int, default=1), 1)
+    per_page = min(max(request.args.get('per_page', type=int, default=LOOKUP_PAGE_SIZE), 1), 50)
+
+    query = db.session.query(
+        Cliente.id_cliente,
+        Cliente.nombre_razon_social,
+        Cliente.cedula_identidad,
+    )
+    if q:
+        # Clave normalizada (índice trigram) o cédula por prefijo
+        query = query.filter(
+            or_(
+                key_search_filter(q, Cliente.nombre_busqueda),
+                Cliente.cedula_identidad.like(f'{escape_like(q)}%', escape=LIKE_ESCAPE),
+            )
+        ).order_by(
+            text_search_rank(normalize_search_text(q), Cliente.nombre_busqueda).desc(),
+            func.lower(Cliente.nombre_razon_social),
+            Cliente.id_cliente,
+        )
+    else:
+        query = query.order_by(func.lower(Cliente.nombre_razon_social), Cliente.id_cliente)
+
+    # Una fila de más alcanza para saber si hay otra página, sin COUNT
+    rows = query.offset((page - 1) * per_page).limit(per_page + 1).all()
+    return jsonify({
+        'items': [
+            {'id': id_cliente, 'nombre': nombre, 'cedula': cedula}
+            for id_cliente, nombre, cedula in rows[:per_page]
+        ],
+        'page': page,
+        'has_more': len(rows) > per_page,
+    })
+
+
 @bp.route('/<int:id_cliente>/detalle', methods=['GET', 'POST'])
 @login_required
 def detalle_cliente(id_cliente):
@@ -278,10 +408,13 @@ def descargar_documento_cliente(id_cliente, id_doc):
     doc = DocumentoCliente.query.get_or_404(id_doc)
     if doc.id_cliente != id_cliente:
         abort(404)
-    if not doc.archivo_url or not os.path.exists(doc.archivo_url):
+    response = send_stored(
+        doc.archivo_url, doc.nombre_original or 'documento', True, mimetype=doc.mime_type or None
+    )
+    if response is None:
         flash('Archivo no encontrado', 'danger')
         return redirect(url_for('clientes.detalle_cliente', id_cliente=id_cliente))
-    return send_file(doc.archivo_url, as_attachment=True, download_name=doc.nombre_original or 'documento')
+    return response
 
 
 @bp.route('/<int:id_cliente>/documento/<int:id_doc>/ver')
@@ -290,10 +423,13 @@ def ver_documento_cliente(id_cliente, id_doc):
     doc = DocumentoCliente.query.get_or_404(id_doc)
     if doc.id_cliente != id_cliente:
         abort(404)
-    if not doc.archivo_url or not os.path.exists(doc.archivo_url):
+    response = send_stored(
+        doc.archivo_url, doc.nombre_original or 'documento', False, mimetype=doc.mime_type or None
+    )
+    if response is None:
         flash('Archivo no encontrado', 'danger')
         return redirect(url_for('clientes.detalle_cliente', id_cliente=id_cliente))
-    return send_file(doc.archivo_url, as_attachment=False, download_name=doc.nombre_original or 'documento')
+    return response
 
 
 @bp.route('/<int:id_cliente>/documento/<int:id_doc>/eliminar', methods=['POST'])
@@ -302,11 +438,9 @@ def eliminar_documento_cliente(id_cliente, id_doc):
     doc = DocumentoCliente.query.get_or_404(id_doc)
     if doc.id_cliente != id_cliente:
         abort(404)
-    try:
-        if doc.archivo_url and os.path.exists(doc.archivo_url):
-            os.remove(doc.archivo_url)
-    except Exception:
-        pass
+    # Los blobs se liberan por referencias; solo los archivos anteriores se borran aquí
+    if not doc.sha256:
+        delete_stored(doc.archivo_url)
     db.session.delete(doc)
     db.session.commit()
     flash('Documento eliminado', 'success')
@@ -317,39 +451,18 @@ def eliminar_documento_cliente(id_cliente, id_doc):
 def modulos(id_cliente):
     cliente = Cliente.query.get_or_404(id_cliente)
     module_rows = (
-        db.session.query(Proyecto.institucion, func.count(Proyecto.id_proyecto))
-        .filter(Proyecto.id_cliente == id_cliente)
-        .group_by(Proyecto.institucion)
+        db.session.query(ProyectoResumen.institucion, func.sum(ProyectoResumen.total))
+        .filter(ProyectoResumen.id_cliente == id_cliente)
+        .group_by(ProyectoResumen.institucion)
         .all()
     )
 
-    project_counts = {inst or 'Otros': count for inst, count in module_rows}
-
-    preferred_order = ['MADES', 'SENAVE', 'INFONA', 'Asesoría Jurídica']
-    seen = set()
-    modules = []
-
-    def _append_module(key):
-        meta = _module_meta(key)
-        modules.append({
-            'key': meta['key'],
-            'label': meta['label'],
-            'full_name': meta['full_name'],
-            'logo': meta['logo_url'],
-            'color': meta['color'],
-            'icon': meta['icon'],
-            'count': project_counts.get(meta['key'], 0),
-            'url': url_for('clientes.modulo_subtipos', id_cliente=id_cliente, inst=meta['key']),
-        })
-        seen.add(meta['key'])
+    project_counts = {inst: int(count) for inst, count in module_rows}
 
-    for preferred in preferred_order:
-        if preferred in MODULE_DEFINITIONS:
-            _append_module(preferred)
-
-    for key in MODULE_DEFINITIONS.keys():
-        if key not in seen:
-            _append_module(key)
+    modules = [
+        _module_entry(id_cliente, key, project_counts.get(key, 0))
+        for key in _module_keys()
+    ]
 
     total_proyectos = sum(project_counts.values())
     create_project_url = url_for('proyectos.nuevo') + f'?id_cliente={id_cliente}'
@@ -364,23 +477,6 @@ def modulos(id_cliente):
     )
 
 
-def _subtipo_filter(query, inst, subtipo):
-    inst = inst or 'Otros'
-    query = query.filter(Proyecto.institucion == inst)
-    normalized = _normalize_subtipo(subtipo)
-    if normalized.lower() == 'otros':
-        query = query.filter(
-            or_(
-                Proyecto.subtipo.is_(None),
-                Proyecto.subtipo == '',
-                Proyecto.subtipo.ilike('otros')
-            )
-        )
-    else:
-        query = query.filter(Proyecto.subtipo == normalized)
-    return query, normalized
-
-
 @bp.route('/<int:id_cliente>/modulo/<string:inst>/subtipos')
 @login_required
 def modulo_subtipos(id_cliente, inst):
@@ -388,46 +484,26 @@ def modulo_subtipos(id_cliente, inst):
     meta = _module_meta(inst)
 
     rows = (
-        db.session.query(Proyecto.subtipo, func.count(Proyecto.id_proyecto))
-        .filter(Proyecto.id_cliente == id_cliente, Proyecto.institucion == meta['key'])
-        .group_by(Proyecto.subtipo)
+        db.session.query(ProyectoResumen.subtipo, func.sum(ProyectoResumen.total))
+        .filter(
+            ProyectoResumen.id_cliente == id_cliente,
+            ProyectoResumen.institucion == meta['key'],
+        )
+        .group_by(ProyectoResumen.subtipo)
         .all()
     )
 
-    preferred_order = []
-    if meta['key'] == 'MADES':
-        preferred_order = [
-            'EIA',
-            'Auditorías',
-            'PGAG',
-            'Plan de ajuste Ambiental',
-            'Certificado de No Requiere',
-            'Certificación de Servicios Ambientales',
-            'Otros',
-        ]
-
-    def _sort_key(item):
-        nombre = item['name']
-        if preferred_order:
-            try:
-                index = preferred_order.index(nombre)
-                return (0, index)
-            except ValueError:
-                pass
-        return (1, nombre.lower())
-
     subtipos = []
     total_subtipos = 0
-    for raw_subtipo, cantidad in rows:
-        nombre = (raw_subtipo or 'Otros').strip() or 'Otros'
+    for nombre, cantidad in rows:
         subtipos.append({
             'name': nombre,
-            'count': cantidad,
+            'count': int(cantidad),
             'url': url_for('clientes.modulo_subtipo_anhos', id_cliente=id_cliente, inst=meta['key'], subtipo=nombre)
         })
         total_subtipos += 1
 
-    subtipos.sort(key=_sort_key)
+    subtipos.sort(key=_subtipo_sort_key(meta['key']))
 
     create_project_url = url_for('proyectos.nuevo') + f'?id_cliente={id_cliente}&institucion={meta["key"]}'
 
@@ -447,15 +523,17 @@ def modulo_subtipos(id_cliente, inst):
 def modulo_subtipo_anhos(id_cliente, inst, subtipo):
     cliente = Cliente.query.get_or_404(id_cliente)
     meta = _module_meta(inst)
-    subtipo_label = _normalize_subtipo(subtipo)
+    normalized_subtipo = resumen_subtipo(subtipo)
 
-    base_query = db.session.query(Proyecto.anho).filter(Proyecto.id_cliente == id_cliente)
-    base_query, normalized_subtipo = _subtipo_filter(base_query, meta['key'], subtipo_label)
     anos_rows = (
-        base_query
-        .filter(Proyecto.anho.isnot(None))
-        .distinct()
-        .order_by(Proyecto.anho.desc())
+        db.session.query(ProyectoResumen.anho)
+        .filter(
+            ProyectoResumen.id_cliente == id_cliente,
+            ProyectoResumen.institucion == meta['key'],
+            ProyectoResumen.subtipo == normalized_subtipo,
+            ProyectoResumen.anho > 0,
+        )
+        .order_by(ProyectoResumen.anho.desc())
         .all()
     )
     anos = [row[0] for row in anos_rows]
@@ -474,3 +552,95 @@ def modulo_subtipo_anhos(id_cliente, inst, subtipo):
         no_anos=len(anos) == 0,
         create_project_url=create_project_url
     )
+
+
+@bp.route('/<int:id_cliente>/arbol')
+@login_required
+def arbol_cliente(id_cliente):
+    """Árbol módulo → subtipo → año con conteos, para navegar sin recargar."""
+    cliente = Cliente.query.get_or_404(id_cliente)
+    rows = (
+        db.session.query(
+            ProyectoResumen.institucion,
+            ProyectoResumen.subtipo,
+            ProyectoResumen.anho,
+            ProyectoResumen.total,
+        )
+        .filter(ProyectoResumen.id_cliente == id_cliente)
+        .order_by(
+            ProyectoResumen.institucion,
+            ProyectoResumen.subtipo,
+            ProyectoResumen.anho.desc(),
+        )
+        .all()
+    )
+
+    # El ETag sale de los mismos datos, así un 304 no arma el árbol
+    snapshot = (
+        cliente.nombre_razon_social,
+        cliente.cedula_identidad,
+        cliente.telefono,
+        cliente.correo_electronico,
+        cliente.ubicacion_gps,
+        [tuple(row) for row in rows],
+    )
+    etag = hashlib.sha1(repr(snapshot).encode('utf-8')).hexdigest()[:16]
+    if request.if_none_match.contains_weak(etag):
+        return _tree_response(current_app.response_class(status=304), etag)
+
+    subtipos_por_modulo = {}
+    for institucion, subtipo, anho, total in rows:
+        subtipos = subtipos_por_modulo.setdefault(institucion, {})
+        entry = subtipos.setdefault(subtipo, {
+            'name': subtipo,
+            'count': 0,
+            'url': url_for(
+                'clientes.modulo_subtipo_anhos', id_cliente=id_cliente, inst=institucion, subtipo=subtipo
+            ),
+            'anhos': [],
+        })
+        entry['count'] += total
+        if anho > 0:
+            entry['anhos'].append({
+                'anho': anho,
+                'count': total,
+                'url': url_for(
+                    'proyectos.board', id_cliente=id_cliente, ano=anho, inst=institucion, tipo=subtipo
+                ),
+            })
+
+    modules = []
+    for key in _module_keys():
+        subtipos = sorted(
+            subtipos_por_modulo.get(key, {}).values(),
+            key=_subtipo_sort_key(key),
+        )
+        module = _module_entry(id_cliente, key, sum(item['count'] for item in subtipos))
+        module['subtipos'] = subtipos
+        modules.append(module)
+
+    response = jsonify({
+        'cliente': {
+            'id': cliente.id_cliente,
+            'nombre': cliente.nombre_razon_social,
+            'cedula': cliente.cedula_identidad,
+            'telefono': cliente.telefono,
+            'correo': cliente.correo_electronico,
+            'ubicacion_gps': cliente.ubicacion_gps,
+            'url': url_for('clientes.modulos', id_cliente=id_cliente),
+            'listado_url': url_for('clientes.list_clientes'),
+            'ficha_url': url_for('clientes.detalle_cliente', id_cliente=id_cliente),
+            'editar_url': url_for('clientes.editar_cliente', id_cliente=id_cliente),
+        },
+        'nuevo_proyecto_url': url_for('proyectos.nuevo'),
+        'total': sum(module['count'] for module in modules),
+        'modulos': modules,
+    })
+    return _tree_response(response, etag)
+
+
+def _tree_response(response, etag):
+    response.set_etag(etag, weak=True)
+    # El navegador revalida siempre; si nada cambió recibe un 304 vacío
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
@@ -0,0 +1,247 @@
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+
+from .extensions import db
+from .models import DocumentoCliente, DocumentoProyecto, Proyecto, ProyectoResumen, resumen_clave
+
+
+def _chunks(values, size):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _hash_or_none(path):
+    from .storage import hash_file
+    if not path:
+        return None
+    try:
+        return hash_file(path)
+    except OSError:
+        return None
+
+
+def register_commands(app):
+    @app.cli.command('backfill-documentos')
+    @click.option('--batch-size', default=500, show_default=True, help='Proyectos por transacción.')
+    def backfill_documentos(batch_size):
+        """Recalcula doc_flags y hero_documento_id de todos los proyectos."""
+        ids = [row[0] for row in db.session.query(Proyecto.id_proyecto).order_by(Proyecto.id_proyecto).all()]
+        total = 0
+        for chunk in _chunks(ids, batch_size):
+            proyectos = Proyecto.query.filter(Proyecto.id_proyecto.in_(chunk)).all()
+            documentos = {}
+            rows = (
+                DocumentoProyecto.query
+                .filter(DocumentoProyecto.id_proyecto.in_(chunk))
+                .options(
+                    load_only(
+                        DocumentoProyecto.id_documento,
+                        DocumentoProyecto.id_proyecto,
+                        DocumentoProyecto.nombre_original,
+                        DocumentoProyecto.categoria,
+                        DocumentoProyecto.mime_type,
+                    )
+                )
+                .all()
+            )
+            for doc in rows:
+                documentos.setdefault(doc.id_proyecto, []).append(doc)
+            for proyecto in proyectos:
+                proyecto.recalcular_documentos(documentos.get(proyecto.id_proyecto, []))
+            db.session.commit()
+            total += len(proyectos)
+        click.echo(f'Proyectos actualizados: {total}')
+
+    @app.cli.command('rebuild-resumen')
+    def rebuild_resumen():
+        """Reconstruye proyecto_resumen desde cero a partir de proyecto."""
+        rows = (
+            db.session.query(
+                Proyecto.id_cliente,
+                Proyecto.institucion,
+                Proyecto.subtipo,
+                Proyecto.anho,
+                Proyecto.estado,
+                func.count(Proyecto.id_proyecto),
+            )
+            .filter(Proyecto.id_cliente.isnot(None))
+            .group_by(
+                Proyecto.id_cliente,
+                Proyecto.institucion,
+                Proyecto.subtipo,
+                Proyecto.anho,
+                Proyecto.estado,
+            )
+            .all()
+        )
+        # Varios valores crudos ('otros', '', NULL) caen en la misma clave
+        grupos = {}
+        for id_cliente, institucion, subtipo, anho, estado, cantidad in rows:
+            clave = resumen_clave(id_cliente, institucion, subtipo, anho)
+            grupo = grupos.setdefault(clave, {'total': 0, 'en_proceso': 0, 'licencia_emitida': 0})
+            grupo['total'] += cantidad
+            grupo[estado.value if estado else 'en_proceso'] += cantidad
+
+        db.session.query(ProyectoResumen).delete()
+        db.session.bulk_insert_mappings(
+            ProyectoResumen,
+            [
+                dict(zip(('id_cliente', 'institucion', 'subtipo', 'anho'), clave), **conteos)
+                for clave, conteos in grupos.items()
+            ],
+        )
+        db.session.commit()
+        click.echo(f'Grupos de proyectos: {len(grupos)}')
+
+    @app.cli.command('dedupe-documentos')
+    @click.option('--workers', default=8, show_default=True, help='Hilos que calculan hashes en paralelo.')
+    @click.option('--batch-size', default=200, show_default=True, help='Documentos por transacción.')
+    def dedupe_documentos(workers, batch_size):
+        """Pasa los archivos existentes al almacén por contenido y une duplicados."""
+        from .storage import absolute_path, delete_stored, place_blob, purge_unreferenced, storage_key
+
+        def _clave(archivo_url):
+            # Rutas relativas y absolutas al mismo archivo cuentan como una
+            return storage_key(archivo_url) or archivo_url
+
+        modelos = (DocumentoProyecto, DocumentoCliente)
+        pendientes = {
+            modelo: [
+                row[0]
+                for row in db.session.query(modelo.id_documento)
+                .filter(modelo.sha256.is_(None), modelo.archivo_url.isnot(None))
+                .order_by(modelo.id_documento)
+                .all()
+            ]
+            for modelo in modelos
+        }
+        # Un mismo archivo puede estar referenciado desde ambas tablas y desde
+        # varias filas: el original se borra después del commit del lote que
+        # migra su última referencia. Así una corrida que se corta a mitad no
+        # deja originales de los lotes ya confirmados (la siguiente no los
+        # vuelve a ver).
+        referencias = Counter(
+            _clave(row[0])
+            for modelo in modelos
+            for row in db.session.query(modelo.archivo_url)
+            .filter(modelo.sha256.is_(None), modelo.archivo_url.isnot(None))
+            .all()
+        )
+
+        total = faltantes = 0
+        hashes_vistos = set()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='dedupe') as pool:
+            for modelo in modelos:
+                for chunk in _chunks(pendientes[modelo], batch_size):
+                    docs = modelo.query.filter(modelo.id_documento.in_(chunk)).all()
+                    rutas = [absolute_path(doc.archivo_url) for doc in docs]
+                    # Leer y hashear es lo caro y no retiene el GIL: va en paralelo.
+                    # Las escrituras en la base quedan en este hilo.
+                    resultados = list(pool.map(_hash_or_none, rutas))
+                    migrados = []
+                    for doc, ruta, resultado in zip(docs, rutas, resultados):
+                        if resultado is None:
+                            faltantes += 1
+                            continue
+                        sha256, size = resultado
+                        anterior = doc.archivo_url
+                        # Se enlaza o copia: el original se borra recién tras el commit
+                        doc.archivo_url = place_blob(ruta, sha256, size)
+                        doc.sha256 = sha256
+                        if modelo is DocumentoProyecto:
+                            for columna in (Proyecto.factura_archivo_url, Proyecto.mapa_archivo_url):
+                                Proyecto.query.filter(columna == anterior).update(
+                                    {columna: doc.archivo_url}, synchronize_session=False
+                                )
+                        migrados.append(anterior)
+                        hashes_vistos.add(sha256)
+                        total += 1
+                    db.session.commit()
+                    for anterior in migrados:
+                        clave = _clave(anterior)
+                        referencias[clave] -= 1
+                        if referencias[clave] <= 0:
+                            # Por el backend: con S3, ``ruta`` es solo la copia en caché
+                            delete_stored(anterior)
+        purgados = purge_unreferenced()
+        click.echo(
+            f'Documentos migrados: {total} · contenidos distintos: {len(hashes_vistos)} · '
+            f'sin archivo: {faltantes} · blobs purgados: {purgados}'
+        )
+
+    @app.cli.command('migrate-storage')
+    @click.option('--workers', default=8, show_default=True, help='Subidas en paralelo.')
+    @click.option('--delete-local', is_flag=True, help='Borra cada archivo local después de subirlo.')
+    def migrate_storage(workers, delete_local):
+        """Copia el árbol de UPLOAD_FOLDER al backend configurado en STORAGE_BACKEND."""
+        from .jobs.thumbnails import RENDITION_FOLDER
+        from .storage import BLOB_FOLDER, CACHE_FOLDER, LocalStorage, get_storage, storage_key, upload_root
+        from .uploads import STAGING_FOLDER
+
+        storage = get_storage()
+        if isinstance(storage, LocalStorage):
+            raise click.ClickException('STORAGE_BACKEND es local: no hay nada que migrar.')
+
+        root = upload_root()
+        # Cachés y temporales se regeneran: no se suben
+        omitidas = {
+            os.path.join(root, CACHE_FOLDER),
+            os.path.join(root, RENDITION_FOLDER),
+            os.path.join(root, BLOB_FOLDER, 'tmp'),
+            os.path.join(root, STAGING_FOLDER),
+        }
+        archivos = []
+        for carpeta, subcarpetas, nombres in os.walk(root):
+            subcarpetas[:] = [d for d in subcarpetas if os.path.join(carpeta, d) not in omitidas]
+            for nombre in nombres:
+                if not nombre.endswith('.tmp'):
+                    ruta = os.path.join(carpeta, nombre)
+                    archivos.append((ruta, storage_key(ruta)))
+
+        def _subir(item):
+            ruta, key = item
+            if storage.exists(key):
+                subido = False
+            else:
+                storage.save_file(key, ruta)
+                subido = True
+            if delete_local:
+                os.remove(ruta)
+            return subido
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='storage') as pool:
+            subidos = sum(pool.map(_subir, archivos))
+
+        # Rutas absolutas heredadas dentro de UPLOAD_FOLDER pasan a ser claves
+        reescritas = 0
+        for modelo, pk, columna in (
+            (DocumentoCliente, DocumentoCliente.id_documento, DocumentoCliente.archivo_url),
+            (DocumentoProyecto, DocumentoProyecto.id_documento, DocumentoProyecto.archivo_url),
+            (Proyecto, Proyecto.id_proyecto, Proyecto.factura_archivo_url),
+            (Proyecto, Proyecto.id_proyecto, Proyecto.mapa_archivo_url),
+        ):
+            for id_fila, valor in db.session.query(pk, columna).filter(columna.isnot(None)).all():
+                if not os.path.isabs(valor):
+                    continue
+                key = storage_key(valor)
+                if key:
+                    db.session.query(modelo).filter(pk == id_fila).update(
+                        {columna: key}, synchronize_session=False
+                    )
+                    reescritas += 1
+        db.session.commit()
+        click.echo(
+            f'Archivos: {len(archivos)} · subidos: {subidos} · ya existentes: {len(archivos) - subidos} · '
+            f'rutas reescritas: {reescritas}'
+        )
+
+    @app.cli.command('run-scheduler')
+    def run_scheduler_command():
+        """Ejecuta las tareas programadas (alertas de vencimiento)."""
+        from .jobs.scheduler import run_scheduler
+        run_scheduler(app)
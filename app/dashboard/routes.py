@@ -1,8 +1,12 @@
 from flask import Blueprint, render_template, request, url_for
 from flask_login import login_required
-from ..models import Cliente, Proyecto
+from sqlalchemy import case
+from ..models import Cliente, Plazo
+from ..read_models import PlazoFila
 from ..extensions import db
-from datetime import date
+from ..cache import cached_fragment, fragment_key, store_fragment
+from ..search import key_search_filter
+from datetime import date, timedelta
 import math
 bp = Blueprint('dashboard', __name__)
 
@@ -59,58 +63,64 @@ def index():
     if page < 1:
         page = 1
 
-    total_clientes = db.session.query(Cliente).count()
     hoy = date.today()
-    proyectos = (
-        db.session.query(Proyecto)
-        .filter(Proyecto.fecha_vencimiento_licencia.isnot(None))
-        .all()
+    is_fragment = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    if is_fragment:
+        # Los días restantes dependen de la fecha, por eso va en la clave
+        cache_key = fragment_key(
+            'dashboard/_results.html',
+            ('cliente', 'proyecto', 'vencimiento'),
+            q=search,
+            page=page,
+            per_page=per_page,
+            hoy=hoy.isoformat(),
+        )
+        cached = cached_fragment(cache_key)
+        if cached is not None:
+            return cached
+    else:
+        total_clientes = db.session.query(Cliente).count()
+
+    # Todas las fechas de vencimiento (licencias, vencimientos de clientes)
+    # viven en la tabla plazo. Orden por proximidad: como los días restantes
+    # son fecha - hoy, ordenar por fecha ascendente deja primero los vencidos
+    # y luego los próximos, sin calcular nada fila por fila.
+    badge_expr = case(
+        (Plazo.fecha <= hoy + timedelta(days=30), 'bg-danger'),
+        (Plazo.fecha <= hoy + timedelta(days=60), 'bg-warning text-dark'),
+        (Plazo.fecha <= hoy + timedelta(days=90), 'bg-success'),
+        else_='bg-secondary',
+    )
+    query = (
+        db.session.query(*PlazoFila.columns(), badge_expr.label('badge_class'))
+        .select_from(Plazo)
+        .outerjoin(Plazo.cliente)
     )
 
-    def _orden_proximidad(proyecto):
-        dias = (proyecto.fecha_vencimiento_licencia - hoy).days
-        if dias < 0:
-            return (0, dias, proyecto.fecha_vencimiento_licencia)
-        return (1, dias, proyecto.fecha_vencimiento_licencia)
-
-    proximos_items = []
-    for proyecto in sorted(proyectos, key=_orden_proximidad):
-        dias_restantes = (proyecto.fecha_vencimiento_licencia - hoy).days
-        if dias_restantes <= 30:
-            badge_class = 'bg-danger'
-        elif dias_restantes <= 60:
-            badge_class = 'bg-warning text-dark'
-        elif dias_restantes <= 90:
-            badge_class = 'bg-success'
-        else:
-            badge_class = 'bg-secondary'
+    if search:
+        query = query.filter(
+            key_search_filter(search, Cliente.nombre_busqueda, Plazo.clave_busqueda)
+        )
+
+    total = query.order_by(None).count()
+    pagination = ListPagination(page, per_page, total)
+    rows = (
+        query
+        .order_by(Plazo.fecha.asc(), Plazo.id_plazo.asc())
+        .offset((pagination.page - 1) * pagination.per_page)
+        .limit(pagination.per_page)
+        .all()
+    )
 
-        proximos_items.append({
-            'proyecto': proyecto,
-            'dias_restantes': dias_restantes,
-            'badge_class': badge_class,
+    proximos_page_items = []
+    for row in rows:
+        plazo = PlazoFila.from_row(row)
+        proximos_page_items.append({
+            'plazo': plazo,
+            'dias_restantes': (plazo.fecha - hoy).days,
+            'badge_class': row.badge_class,
         })
 
-    if search:
-        lowered = search.lower()
-        def _matches(item):
-            proyecto = item['proyecto']
-            cliente_nombre = (proyecto.cliente.nombre_razon_social if proyecto.cliente else '') or ''
-            proyecto_nombre = (proyecto.nombre_proyecto or f"{proyecto.institucion or ''} {proyecto.anho or ''}")
-            subtipo = proyecto.subtipo or ''
-            return (
-                lowered in cliente_nombre.lower()
-                or lowered in proyecto_nombre.lower()
-                or lowered in subtipo.lower()
-            )
-
-        proximos_items = list(filter(_matches, proximos_items))
-
-    pagination = ListPagination(page, per_page, len(proximos_items))
-    start = (pagination.page - 1) * pagination.per_page
-    end = start + pagination.per_page
-    proximos_page_items = proximos_items[start:end]
-
     base_params = {'per_page': per_page}
     if search:
         base_params['q'] = search
@@ -121,7 +131,6 @@ def index():
         return url_for('dashboard.index', **params)
 
     template_kwargs = {
-        'total_clientes': total_clientes,
         'proximos_items': proximos_page_items,
         'pagination': pagination,
         'per_page_options': PAGE_SIZE_OPTIONS,
@@ -129,7 +138,7 @@ def index():
         'build_dashboard_url': _build_dashboard_url,
     }
 
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return render_template('dashboard/_results.html', **template_kwargs)
+    if is_fragment:
+        return store_fragment(cache_key, render_template('dashboard/_results.html', **template_kwargs))
 
-    return render_template('dashboard/index.html', **template_kwargs)
+    return render_template('dashboard/index.html', total_clientes=total_clientes, **template_kwargs)
@@ -1,13 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
-from apscheduler.schedulers.background import BackgroundScheduler
 
 
 db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 login_manager.login_view = "auth.login"
-
-# Scheduler global (se inicia en register_jobs)
-scheduler = BackgroundScheduler()
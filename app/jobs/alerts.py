@@ -1,39 +1,88 @@
-import os
 from datetime import date, timedelta
-from ..extensions import scheduler
-from ..models import Vencimiento, Notificacion
+
+from apscheduler.util import undefined
+from sqlalchemy import case, exists, insert, literal, null, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from ..models import PLAZO_VENCIMIENTO, Notificacion, Plazo
 from ..extensions import db
 
+# Umbrales de aviso (días antes del vencimiento), del más ajustado al más amplio
+ALERT_THRESHOLDS = (
+    (7, '7_dias'),
+    (30, '30_dias'),
+)
+
 
-def notify(kind, venc):
+def notify(kind, id_plazo):
     # Placeholder: aquí se podría enviar email/WhatsApp/Telegram
-    n = Notificacion(id_vencimiento=venc.id_vencimiento, tipo=kind)
-    db.session.add(n)
-    db.session.commit()
+    pass
 
 
 def job_check_vencimientos():
+    """Registra los avisos de vencimiento pendientes. Se puede re-ejecutar sin duplicar.
+
+    Recorre la tabla plazo, así una sola búsqueda por rango de fechas cubre
+    vencimientos de clientes y licencias de proyectos. Cada plazo dentro de
+    la ventana recibe el umbral más ajustado que ya cruzó; si ese aviso no
+    existe para la fecha actual del plazo se inserta. Así un día sin correr no
+    pierde avisos, una re-ejecución no los repite y una licencia renovada (o
+    un vencimiento reprogramado) vuelve a avisar con su nueva fecha.
+    """
     today = date.today()
-    in_30 = today + timedelta(days=30)
-    in_7 = today + timedelta(days=7)
+    horizon = today + timedelta(days=ALERT_THRESHOLDS[-1][0])
+    tipo = case(
+        *[
+            (Plazo.fecha <= today + timedelta(days=days), kind)
+            for days, kind in ALERT_THRESHOLDS
+        ]
+    )
+    already_sent = exists().where(
+        Notificacion.id_plazo == Plazo.id_plazo,
+        Notificacion.tipo == tipo,
+        Notificacion.fecha_plazo == Plazo.fecha,
+    )
+    # id_vencimiento se sigue completando para los avisos de Vencimiento
+    id_vencimiento = case((Plazo.origen == PLAZO_VENCIMIENTO, Plazo.id_origen), else_=null())
+    pending = select(Plazo.id_plazo, id_vencimiento, tipo, Plazo.fecha, literal(today)).where(
+        Plazo.fecha.between(today, horizon),
+        ~already_sent,
+    )
 
-    vencs_30 = Vencimiento.query.filter(Vencimiento.fecha_vencimiento == in_30).all()
-    for v in vencs_30:
-        notify('30_dias', v)
+    columns = ['id_plazo', 'id_vencimiento', 'tipo', 'fecha_plazo', 'fecha_envio']
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Ante dos corridas simultáneas decide la restricción única
+        stmt = pg_insert(Notificacion).from_select(columns, pending).on_conflict_do_nothing(
+            index_elements=['id_plazo', 'tipo', 'fecha_plazo']
+        )
+    else:
+        stmt = insert(Notificacion).from_select(columns, pending)
+    stmt = stmt.returning(Notificacion.id_plazo, Notificacion.tipo)
 
-    vencs_7 = Vencimiento.query.filter(Vencimiento.fecha_vencimiento == in_7).all()
-    for v in vencs_7:
-        notify('7_dias', v)
+    created = db.session.execute(stmt).all()
+    db.session.commit()
 
+    for id_plazo, kind in created:
+        notify(kind, id_plazo)
+    return len(created)
 
-def register_jobs(app):
-    if not scheduler.running:
-        scheduler.configure(timezone=os.getenv('SCHEDULER_TIMEZONE', 'UTC'))
-        scheduler.add_job(job_check_vencimientos, 'cron', hour=7, minute=0, id='check_vencimientos', replace_existing=True)
-        scheduler.start()
 
-        # detener ordenado al cerrar
-        @app.teardown_appcontext
-        def shutdown(exception=None):
-            if scheduler.running:
-                scheduler.shutdown(wait=False)
+def register_jobs(scheduler):
+    # Corre con el programador ya iniciado (ver create_scheduler), para poder
+    # leer la tarea guardada: se conserva su próxima corrida aunque ya haya
+    # pasado, así una corrida perdida de las 07:00 se ejecuta una sola vez al
+    # volver (coalesce, sin límite de demora). Sin esto add_job la recalcula
+    # desde ahora y la pisa.
+    stored = scheduler.get_job('check_vencimientos')
+    scheduler.add_job(
+        'app.jobs.scheduler:run_job',
+        'cron',
+        hour=7,
+        minute=0,
+        args=['app.jobs.alerts:job_check_vencimientos'],
+        id='check_vencimientos',
+        replace_existing=True,
+        coalesce=True,
+        misfire_grace_time=None,
+        next_run_time=stored.next_run_time if stored else undefined,
+    )
@@ -0,0 +1,104 @@
+"""Procesamiento en segundo plano de los documentos subidos por formulario.
+
+La vista registra el documento apuntando al archivo del spool y confirma;
+después del commit, un pool de hilos calcula el hash y lo pasa al almacén por
+contenido (el tipo ya lo detectó la vista). Si el proceso muere antes,
+``flask dedupe-documentos`` termina el trabajo (los documentos quedan sin
+sha256 y con su archivo en el spool).
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..extensions import db
+from ..models import DocumentoProyecto, Proyecto
+from ..storage import absolute_path, hash_file, place_blob, upload_root
+from .thumbnails import generate_renditions
+
+logger = logging.getLogger(__name__)
+
+_PENDING = '_documentos_pendientes'
+_executor = None
+
+
+def _get_executor(app):
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=app.config.get('UPLOAD_WORKERS', 4),
+            thread_name_prefix='documentos',
+        )
+    return _executor
+
+
+def queue_document(id_documento, spooled_path):
+    """Encola el documento para cuando se confirme la transacción actual."""
+    db.session.info.setdefault(_PENDING, []).append((id_documento, spooled_path))
+
+
+@event.listens_for(Session, 'after_commit')
+def _dispatch_pending(session):
+    pending = session.info.pop(_PENDING, None)
+    if not pending:
+        return
+    app = current_app._get_current_object()
+    executor = _get_executor(app)
+    for id_documento, spooled_path in pending:
+        executor.submit(process_document, app, id_documento, spooled_path)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    for _, spooled_path in session.info.pop(_PENDING, None) or ():
+        _remove_spooled(spooled_path)
+
+
+def _remove_spooled(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def process_document(app, id_documento, spooled_path):
+    """Hash, tipo y blob de un documento del spool; actualiza su fila."""
+    with app.app_context():
+        try:
+            _process_document(id_documento, spooled_path)
+        except Exception:
+            db.session.rollback()
+            logger.exception('No se pudo procesar el documento %s', id_documento)
+        finally:
+            db.session.remove()
+
+
+def _process_document(id_documento, spooled_path):
+    # Bloquea la fila: un borrado concurrente espera a que termine el cambio
+    doc = db.session.get(DocumentoProyecto, id_documento, with_for_update=True)
+    if doc is None or doc.sha256 or not os.path.exists(spooled_path):
+        # Se borró (o ya se procesó) mientras esperaba en la cola
+        db.session.rollback()
+        _remove_spooled(spooled_path)
+        return
+
+    sha256, size = hash_file(spooled_path)
+    previous, mimetype = doc.archivo_url, doc.mime_type
+    # Enlace y no movimiento: hasta el commit las descargas siguen leyendo el spool
+    key = place_blob(spooled_path, sha256, size)
+    doc.archivo_url = key
+    doc.sha256 = sha256
+    for columna in (Proyecto.factura_archivo_url, Proyecto.mapa_archivo_url):
+        (
+            Proyecto.query
+            .filter(Proyecto.id_proyecto == doc.id_proyecto, columna == previous)
+            .update({columna: key}, synchronize_session=False)
+        )
+    db.session.commit()
+    _remove_spooled(spooled_path)
+
+    if mimetype and mimetype.startswith('image/'):
+        generate_renditions(absolute_path(key), id_documento, upload_root())
@@ -0,0 +1,107 @@
+import logging
+import os
+import time
+
+from apscheduler.events import EVENT_SCHEDULER_START
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.util import ref_to_obj
+from sqlalchemy import text
+
+from ..extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Clave de pg_advisory_lock que identifica al proceso programador activo
+SCHEDULER_LOCK_KEY = 7_240_001
+LOCK_RETRY_SECONDS = 30
+JOBS_TABLE = 'apscheduler_jobs'
+
+_app = None
+
+
+def run_job(func_ref):
+    """Punto de entrada de cada tarea: la ejecuta dentro del contexto de la app."""
+    func = ref_to_obj(func_ref)
+    with _app.app_context():
+        try:
+            func()
+        finally:
+            db.session.remove()
+
+
+def _acquire_leader_lock(engine):
+    # El bloqueo consultivo es de sesión: se mantiene mientras esta conexión
+    # siga abierta, así que se reserva fuera del pool por toda la vida del proceso.
+    if engine.dialect.name != 'postgresql':
+        return None
+    connection = engine.connect()
+    while True:
+        acquired = connection.execute(
+            text('SELECT pg_try_advisory_lock(:key)'), {'key': SCHEDULER_LOCK_KEY}
+        ).scalar()
+        connection.commit()
+        if acquired:
+            return connection
+        logger.info('Otro proceso tiene el programador activo; reintento en %ss', LOCK_RETRY_SECONDS)
+        time.sleep(LOCK_RETRY_SECONDS)
+
+
+def create_scheduler(engine, scheduler_class=BlockingScheduler):
+    """Programador con las tareas persistidas en la tabla JOBS_TABLE.
+
+    Las tareas se registran al iniciar (y no antes): recién entonces se puede
+    leer lo que quedó guardado de la corrida anterior.
+    """
+    from .alerts import register_jobs
+
+    scheduler = scheduler_class(
+        timezone=os.getenv('SCHEDULER_TIMEZONE', 'UTC'),
+        jobstores={'default': SQLAlchemyJobStore(engine=engine, tablename=JOBS_TABLE)},
+    )
+    scheduler.add_listener(lambda event: register_jobs(scheduler), EVENT_SCHEDULER_START)
+    return scheduler
+
+
+def run_scheduler(app):
+    """Inicia el programador de tareas. Bloquea hasta que el proceso termina."""
+    global _app
+    _app = app
+
+    with app.app_context():
+        engine = db.engine
+        lock_connection = _acquire_leader_lock(engine)
+
+    scheduler = create_scheduler(engine)
+    lock_lost = []
+
+    if lock_connection is not None:
+        def _check_leader_lock():
+            # Si se pierde la conexión se pierde el bloqueo: se termina para que
+            # el supervisor reinicie y otro proceso pueda tomar el liderazgo.
+            try:
+                lock_connection.execute(text('SELECT 1'))
+                lock_connection.commit()
+            except Exception:
+                logger.exception('Se perdió la conexión del bloqueo del programador')
+                lock_lost.append(True)
+                scheduler.shutdown(wait=False)
+
+        # Tarea en memoria: no se persiste porque depende de esta conexión
+        scheduler.add_jobstore('memory', alias='local')
+        scheduler.add_job(
+            _check_leader_lock,
+            'interval',
+            minutes=1,
+            id='leader_lock_heartbeat',
+            jobstore='local',
+            replace_existing=True,
+        )
+
+    try:
+        scheduler.start()
+    finally:
+        if lock_connection is not None:
+            lock_connection.close()
+    if lock_lost:
+        raise SystemExit(1)
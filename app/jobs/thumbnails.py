@@ -0,0 +1,94 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from uuid import uuid4
+
+try:
+    from PIL import Image, ImageOps, features
+except ImportError:  # Sin Pillow se sirven siempre los originales
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# Ancho/alto máximo de cada versión reducida
+RENDITION_SIZES = {
+    'card': 480,
+    'gallery': 960,
+    'lightbox': 1920,
+}
+RENDITION_FOLDER = '_renditions'
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='renditions')
+
+
+def _rendition_format():
+    if Image is not None and features.check('webp'):
+        return 'WEBP', '.webp', 'image/webp'
+    return 'JPEG', '.jpg', 'image/jpeg'
+
+
+def rendition_mimetype():
+    return _rendition_format()[2]
+
+
+def rendition_path(upload_root, id_documento, size):
+    _, ext, _ = _rendition_format()
+    # Subcarpetas por centena para no acumular miles de archivos en un directorio
+    shard = f"{id_documento // 100:04d}"
+    return os.path.join(upload_root, RENDITION_FOLDER, shard, f"{id_documento}_{size}{ext}")
+
+
+def generate_renditions(source_path, id_documento, upload_root, sizes=None):
+    """Genera las versiones reducidas de una imagen. Devuelve True si todas quedaron en disco."""
+    if Image is None or not source_path or not os.path.exists(source_path):
+        return False
+    fmt, _, _ = _rendition_format()
+    try:
+        with Image.open(source_path) as original:
+            original = ImageOps.exif_transpose(original)
+            for size in sizes or RENDITION_SIZES:
+                target = rendition_path(upload_root, id_documento, size)
+                if os.path.exists(target):
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                image = original.copy()
+                image.thumbnail((RENDITION_SIZES[size], RENDITION_SIZES[size]))
+                if fmt == 'JPEG' and image.mode not in ('RGB', 'L'):
+                    image = image.convert('RGB')
+                elif image.mode not in ('RGB', 'RGBA', 'L'):
+                    image = image.convert('RGBA')
+                # Escritura atómica: nunca se sirve un archivo a medio escribir
+                tmp_target = f"{target}.{uuid4().hex}.tmp"
+                image.save(tmp_target, fmt, quality=82)
+                os.replace(tmp_target, target)
+    except Exception:
+        logger.exception('No se pudieron generar miniaturas del documento %s', id_documento)
+        return False
+    return True
+
+
+def schedule_renditions(source_path, id_documento, upload_root):
+    """Encola la generación de miniaturas en el pool de fondo."""
+    if Image is None:
+        return None
+    return _executor.submit(generate_renditions, source_path, id_documento, upload_root)
+
+
+def ensure_rendition(source_path, id_documento, upload_root, size):
+    """Ruta de la versión pedida, generándola en el momento si aún no existe."""
+    target = rendition_path(upload_root, id_documento, size)
+    if os.path.exists(target):
+        return target
+    if generate_renditions(source_path, id_documento, upload_root, sizes=[size]):
+        return target
+    return None
+
+
+def remove_renditions(upload_root, id_documento):
+    for size in RENDITION_SIZES:
+        target = rendition_path(upload_root, id_documento, size)
+        if os.path.exists(target):
+            try:
+                os.remove(target)
+            except OSError:
+                pass
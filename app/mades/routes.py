@@ -1,10 +1,14 @@
 from datetime import date, datetime
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
+from flask import Blueprint, request, redirect, url_for, flash
 from flask_login import login_required
 
+from sqlalchemy import func
+
+from ..cache import conditional_view
 from ..extensions import db
-from ..models import Cliente, Proyecto, ProyectoEstado
+from ..models import Proyecto, ProyectoEstado, ProyectoResumen
+from ..proyectos.routes import render_project_list
 
 bp = Blueprint("mades", __name__, url_prefix="/mades")
 
@@ -32,13 +36,34 @@ def _parse_date(value):
         return None
 
 
+def _resumen_por_anho():
+    # Una sola agregación sobre la tabla de conteos, no sobre los proyectos
+    filas = (
+        db.session.query(
+            ProyectoResumen.anho,
+            func.sum(ProyectoResumen.total).label("total"),
+            func.sum(ProyectoResumen.en_proceso).label("en_proceso"),
+            func.sum(ProyectoResumen.licencia_emitida).label("licencia_emitida"),
+        )
+        .filter(ProyectoResumen.institucion == "MADES")
+        .group_by(ProyectoResumen.anho)
+        .order_by(ProyectoResumen.anho.desc())
+        .all()
+    )
+    return {"resumen": filas, "estados": MADES_ESTADOS}
+
+
 @bp.route("/")
 @login_required
+@conditional_view("proyecto", "cliente")
 def index():
-    proyectos = Proyecto.query.filter_by(institucion="MADES").order_by(
-        Proyecto.anho.desc(), Proyecto.id_proyecto.desc()
-    ).all()
-    return render_template("mades/index.html", proyectos=proyectos, estados=MADES_ESTADOS)
+    return render_project_list(
+        "mades.index",
+        "mades/index.html",
+        "mades/_results.html",
+        institucion="MADES",
+        page_context=_resumen_por_anho,
+    )
 
 
 @bp.route("/cliente/<int:id_cliente>")
@@ -1,8 +1,12 @@
 import enum
+import os
 from datetime import date
 from decimal import Decimal
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.hybrid import hybrid_property
 from .extensions import db
+from .search import normalize_search_text
 
 
 class Cliente(db.Model):
@@ -19,6 +23,8 @@ class Cliente(db.Model):
     ubicacion_gps = db.Column(db.Text)
     saldo_total_pagado = db.Column(db.Numeric(12, 2), default=0)
     saldo_total_pendiente = db.Column(db.Numeric(12, 2), default=0)
+    # Clave de búsqueda sin acentos, mantenida al escribir
+    nombre_busqueda = db.Column(db.String(255))
 
     propiedades = db.relationship('Propiedad', backref='cliente', lazy=True)
     proyectos = db.relationship('Proyecto', backref='cliente', lazy=True)
@@ -49,6 +55,51 @@ class Propiedad(db.Model):
     vencimientos = db.relationship('Vencimiento', backref='propiedad', lazy=True)
 
 
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+
+# Banderas de tipos de documento que se guardan en Proyecto.doc_flags
+DOC_FLAG_MAPA = 1
+DOC_FLAG_PDF = 2
+DOC_FLAG_IMAGEN = 4
+DOC_FLAG_FACTURA = 8
+DOC_FLAG_OTROS = 16
+# Hay al menos un mapa en formato imagen (tiene prioridad como portada)
+DOC_FLAG_MAPA_IMAGEN = 32
+
+
+def tipo_documento(nombre_original, mime_type=None):
+    """Devuelve 'imagen', 'pdf' o 'documento' según el tipo del archivo.
+
+    Manda el tipo MIME detectado por el contenido al subirlo; la extensión
+    solo cuenta para documentos viejos que no tienen uno confiable.
+    """
+    if mime_type and mime_type != 'application/octet-stream':
+        if mime_type.startswith('image/'):
+            return 'imagen'
+        return 'pdf' if mime_type == 'application/pdf' else 'documento'
+    ext = os.path.splitext(nombre_original or '')[1].lower()
+    if ext in IMAGE_EXTENSIONS:
+        return 'imagen'
+    return 'pdf' if ext == '.pdf' else 'documento'
+
+
+def clasificar_documento(categoria, nombre_original, mime_type=None):
+    """Devuelve las banderas DOC_FLAG_* que aporta un documento."""
+    tipo = tipo_documento(nombre_original, mime_type)
+    categoria = (categoria or '').lower()
+    if categoria == 'mapa':
+        if tipo == 'imagen':
+            return DOC_FLAG_MAPA | DOC_FLAG_MAPA_IMAGEN
+        return DOC_FLAG_MAPA
+    if categoria == 'factura':
+        return DOC_FLAG_FACTURA
+    if tipo == 'imagen':
+        return DOC_FLAG_IMAGEN
+    if tipo == 'pdf':
+        return DOC_FLAG_PDF
+    return DOC_FLAG_OTROS
+
+
 class ProyectoEstado(enum.Enum):
     en_proceso = 'en_proceso'
     licencia_emitida = 'licencia_emitida'
@@ -93,6 +144,12 @@ class Proyecto(db.Model):
     # Campos específicos para SENAVE
     senave_desglose = db.Column(db.Text)
     senave_tipo_concepto = db.Column(db.String(150))
+    # Claves de búsqueda sin acentos, mantenidas al escribir
+    nombre_busqueda = db.Column(db.String(255))
+    subtipo_busqueda = db.Column(db.String(100))
+    # Resumen de documentos mantenido al escribir (ver registrar_documento)
+    doc_flags = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    hero_documento_id = db.Column(db.Integer)
 
     documentos = db.relationship('DocumentoProyecto', backref='proyecto', lazy=True)
     pagos = db.relationship('Pago', backref='proyecto', lazy=True)
@@ -120,6 +177,36 @@ class Proyecto(db.Model):
             self.monto_entregado = calculado
         self.saldo_restante = self.saldo_restante_calculado
 
+    def registrar_documento(self, doc):
+        """Actualiza banderas y documento de portada al agregar un documento."""
+        flags = clasificar_documento(doc.categoria, doc.nombre_original, doc.mime_type)
+        actuales = self.doc_flags or 0
+        if flags & DOC_FLAG_MAPA_IMAGEN and not actuales & DOC_FLAG_MAPA_IMAGEN:
+            self.hero_documento_id = doc.id_documento
+        elif flags & DOC_FLAG_IMAGEN and self.hero_documento_id is None:
+            self.hero_documento_id = doc.id_documento
+        self.doc_flags = actuales | flags
+
+    def recalcular_documentos(self, documentos):
+        """Recalcula el resumen de documentos desde cero (bajas y backfill)."""
+        self.doc_flags = 0
+        self.hero_documento_id = None
+        for doc in sorted(documentos, key=lambda d: d.id_documento):
+            self.registrar_documento(doc)
+
+
+class Blob(db.Model):
+    """Contenido subido, guardado una sola vez bajo su SHA-256.
+
+    ``referencias`` cuenta los documentos (de proyecto o de cliente) que lo
+    usan; lo mantienen los eventos de app.storage y los blobs que quedan en
+    cero se borran, fila y archivo, al confirmar la transacción.
+    """
+    __tablename__ = 'blob'
+    sha256 = db.Column(db.String(64), primary_key=True)
+    tamano = db.Column(db.BigInteger, nullable=False)
+    referencias = db.Column(db.Integer, nullable=False, default=0)
+
 
 class DocumentoProyecto(db.Model):
     __tablename__ = 'documento_proyecto'
@@ -127,6 +214,7 @@ class DocumentoProyecto(db.Model):
     id_proyecto = db.Column(db.Integer, db.ForeignKey('proyecto.id_proyecto'))
     tipo = db.Column(db.String(100))
     archivo_url = db.Column(db.Text)
+    sha256 = db.Column(db.String(64), db.ForeignKey('blob.sha256'))
     nombre_original = db.Column(db.String(255))
     categoria = db.Column(db.String(100))
     mime_type = db.Column(db.String(100))
@@ -164,11 +252,84 @@ class Vencimiento(db.Model):
     notificaciones = db.relationship('Notificacion', backref='vencimiento', lazy=True)
 
 
+class Plazo(db.Model):
+    """Índice unificado de fechas de vencimiento, alimentado por las tablas de origen.
+
+    Lo mantienen los eventos de mapeo de abajo; el tablero y los avisos leen
+    solo esta tabla con un rango sobre ``fecha``.
+    """
+    __tablename__ = 'plazo'
+    __table_args__ = (
+        db.UniqueConstraint('origen', 'id_origen', name='uq_plazo_origen'),
+    )
+    id_plazo = db.Column(db.Integer, primary_key=True)
+    origen = db.Column(db.String(20), nullable=False)
+    id_origen = db.Column(db.Integer, nullable=False)
+    fecha = db.Column(db.Date, nullable=False, index=True)
+    id_cliente = db.Column(db.Integer, db.ForeignKey('cliente.id_cliente'))
+    id_proyecto = db.Column(db.Integer, db.ForeignKey('proyecto.id_proyecto'))
+    titulo = db.Column(db.String(255))
+    subtipo = db.Column(db.String(100))
+    estado = db.Column(db.String(50))
+    clave_busqueda = db.Column(db.String(400))
+
+    cliente = db.relationship('Cliente', lazy=True)
+
+
+class ProyectoResumen(db.Model):
+    """Conteo de proyectos por cliente, módulo, subtipo y año.
+
+    Lo mantienen los eventos de Proyecto; la navegación clientes.modulos →
+    modulo_subtipos → modulo_subtipo_anhos lee solo esta tabla. Las claves se
+    guardan normalizadas (ver ``resumen_clave``) y un año desconocido es 0.
+    """
+    __tablename__ = 'proyecto_resumen'
+    id_cliente = db.Column(db.Integer, db.ForeignKey('cliente.id_cliente'), primary_key=True)
+    institucion = db.Column(db.String(100), primary_key=True)
+    subtipo = db.Column(db.String(100), primary_key=True)
+    anho = db.Column(db.Integer, primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+    en_proceso = db.Column(db.Integer, nullable=False, default=0)
+    licencia_emitida = db.Column(db.Integer, nullable=False, default=0)
+
+
+def resumen_subtipo(subtipo):
+    """Subtipo tal como se agrupa en la navegación: vacío u 'otros' es 'Otros'."""
+    nombre = (subtipo or '').strip()
+    if not nombre or nombre.lower() == 'otros':
+        return 'Otros'
+    return nombre
+
+
+def resumen_clave(id_cliente, institucion, subtipo, anho):
+    return (id_cliente, institucion or 'Otros', resumen_subtipo(subtipo), anho or 0)
+
+
+class DataVersion(db.Model):
+    """Contador de cambios por tabla; lo incrementa app.cache en cada commit."""
+    __tablename__ = 'data_version'
+    tabla = db.Column(db.String(63), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False, default=0)
+
+
+PLAZO_VENCIMIENTO = 'vencimiento'
+
+
+PLAZO_LICENCIA = 'licencia'
+
+
 class Notificacion(db.Model):
     __tablename__ = 'notificacion'
+    __table_args__ = (
+        # Un aviso por umbral y por fecha: si el plazo se renueva o reprograma,
+        # la nueva fecha vuelve a avisar
+        db.UniqueConstraint('id_plazo', 'tipo', 'fecha_plazo', name='uq_notificacion_plazo_tipo_fecha'),
+    )
     id_notificacion = db.Column(db.Integer, primary_key=True)
+    id_plazo = db.Column(db.Integer, db.ForeignKey('plazo.id_plazo', ondelete='SET NULL'))
     id_vencimiento = db.Column(db.Integer, db.ForeignKey('vencimiento.id_vencimiento'))
     tipo = db.Column(db.String(50))
+    fecha_plazo = db.Column(db.Date)
     fecha_envio = db.Column(db.Date, default=date.today)
 
 
@@ -178,5 +339,206 @@ class DocumentoCliente(db.Model):
     id_cliente = db.Column(db.Integer, db.ForeignKey('cliente.id_cliente'), nullable=False)
     nombre_original = db.Column(db.String(255))
     archivo_url = db.Column(db.Text, nullable=False)
+    sha256 = db.Column(db.String(64), db.ForeignKey('blob.sha256'))
     mime_type = db.Column(db.String(100))
     uploaded_at = db.Column(db.Date, default=date.today)
+
+
+# Índices de los caminos de acceso de las rutas (ver migración c5e1a9d3f7b6)
+db.Index(
+    'ix_proyecto_cliente_modulo',
+    Proyecto.id_cliente,
+    Proyecto.institucion,
+    Proyecto.subtipo,
+    Proyecto.anho,
+)
+db.Index('ix_proyecto_fecha_vencimiento_licencia', Proyecto.fecha_vencimiento_licencia)
+db.Index('ix_proyecto_institucion_lower', db.func.lower(Proyecto.institucion))
+db.Index('ix_proyecto_subtipo_lower', db.func.lower(Proyecto.subtipo))
+db.Index('ix_proyecto_nombre_lower', db.func.lower(Proyecto.nombre_proyecto))
+db.Index('ix_cliente_nombre_lower', db.func.lower(Cliente.nombre_razon_social))
+db.Index('ix_documento_proyecto_proyecto_fecha', DocumentoProyecto.id_proyecto, DocumentoProyecto.uploaded_at)
+db.Index('ix_vencimiento_fecha_vencimiento', Vencimiento.fecha_vencimiento)
+db.Index('ix_vencimiento_cliente_fecha', Vencimiento.id_cliente, Vencimiento.fecha_vencimiento)
+db.Index('ix_documento_cliente_cliente', DocumentoCliente.id_cliente)
+db.Index('ix_documento_proyecto_sha256', DocumentoProyecto.sha256)
+db.Index('ix_documento_cliente_sha256', DocumentoCliente.sha256)
+
+
+@event.listens_for(Cliente, 'before_insert')
+@event.listens_for(Cliente, 'before_update')
+def _cliente_claves_busqueda(mapper, connection, target):
+    target.nombre_busqueda = normalize_search_text(target.nombre_razon_social) or None
+
+
+@event.listens_for(Proyecto, 'before_insert')
+@event.listens_for(Proyecto, 'before_update')
+def _proyecto_claves_busqueda(mapper, connection, target):
+    # Mismo nombre que se muestra cuando el proyecto no tiene título propio
+    nombre = target.nombre_proyecto or f"{target.institucion or ''} {target.anho or ''}"
+    target.nombre_busqueda = normalize_search_text(nombre) or None
+    target.subtipo_busqueda = normalize_search_text(target.subtipo) or None
+
+
+def _plazo_de_vencimiento(target):
+    return {
+        'fecha': target.fecha_vencimiento,
+        'id_cliente': target.id_cliente,
+        'id_proyecto': None,
+        'titulo': target.tipo_documento,
+        'subtipo': None,
+        'estado': target.estado,
+    }
+
+
+def _plazo_de_licencia(target):
+    return {
+        'fecha': target.fecha_vencimiento_licencia,
+        'id_cliente': target.id_cliente,
+        'id_proyecto': target.id_proyecto,
+        'titulo': target.nombre_proyecto or f"{target.institucion or ''} {target.anho or ''}".strip(),
+        'subtipo': target.subtipo,
+        'estado': target.estado.value if target.estado else None,
+    }
+
+
+# Origen -> (modelo, id de origen, columnas que alimentan el plazo, valores)
+PLAZO_FUENTES = {
+    PLAZO_VENCIMIENTO: (
+        Vencimiento,
+        'id_vencimiento',
+        ('fecha_vencimiento', 'id_cliente', 'tipo_documento', 'estado'),
+        _plazo_de_vencimiento,
+    ),
+    PLAZO_LICENCIA: (
+        Proyecto,
+        'id_proyecto',
+        ('fecha_vencimiento_licencia', 'id_cliente', 'nombre_proyecto', 'institucion',
+         'anho', 'subtipo', 'estado'),
+        _plazo_de_licencia,
+    ),
+}
+
+
+def _sincronizar_plazo(connection, origen, id_origen, valores):
+    tabla = Plazo.__table__
+    mismo_origen = (tabla.c.origen == origen) & (tabla.c.id_origen == id_origen)
+    if valores is None or valores['fecha'] is None:
+        connection.execute(tabla.delete().where(mismo_origen))
+        return
+    valores = dict(valores)
+    valores['clave_busqueda'] = normalize_search_text(
+        ' '.join(filter(None, (valores['titulo'], valores['subtipo'])))
+    ) or None
+    # UPDATE en el lugar para conservar id_plazo (las notificaciones lo referencian)
+    resultado = connection.execute(tabla.update().where(mismo_origen).values(**valores))
+    if resultado.rowcount == 0:
+        connection.execute(tabla.insert().values(origen=origen, id_origen=id_origen, **valores))
+
+
+def _registrar_fuente_plazo(origen, modelo, id_attr, columnas, valores_de):
+    @event.listens_for(modelo, 'after_insert')
+    def _alta(mapper, connection, target):
+        _sincronizar_plazo(connection, origen, getattr(target, id_attr), valores_de(target))
+
+    @event.listens_for(modelo, 'after_update')
+    def _cambio(mapper, connection, target):
+        estado = db.inspect(target)
+        if not any(estado.attrs[columna].history.has_changes() for columna in columnas):
+            return
+        _sincronizar_plazo(connection, origen, getattr(target, id_attr), valores_de(target))
+
+    # Antes del DELETE del origen, para no dejar la FK de plazo colgando
+    @event.listens_for(modelo, 'before_delete')
+    def _baja(mapper, connection, target):
+        _sincronizar_plazo(connection, origen, getattr(target, id_attr), None)
+
+
+for _origen, (_modelo, _id_attr, _columnas, _valores_de) in PLAZO_FUENTES.items():
+    _registrar_fuente_plazo(_origen, _modelo, _id_attr, _columnas, _valores_de)
+
+
+# Columnas de Proyecto que determinan su fila en proyecto_resumen
+RESUMEN_COLUMNAS = ('id_cliente', 'institucion', 'subtipo', 'anho', 'estado')
+
+
+def _resumen_valores(valores):
+    clave = resumen_clave(*valores[:4])
+    estado = valores[4].value if isinstance(valores[4], ProyectoEstado) else valores[4]
+    if estado not in (ProyectoEstado.en_proceso.value, ProyectoEstado.licencia_emitida.value):
+        estado = ProyectoEstado.en_proceso.value
+    return clave, estado
+
+
+def _valor_anterior(estado, columna):
+    historia = estado.attrs[columna].history
+    if historia.deleted:
+        return historia.deleted[0]
+    if historia.unchanged:
+        return historia.unchanged[0]
+    return getattr(estado.obj(), columna)
+
+
+def _ajustar_resumen(connection, valores, delta):
+    if valores[0] is None:
+        return
+    clave, estado = _resumen_valores(valores)
+    tabla = ProyectoResumen.__table__
+    dialecto = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    fila = dict(zip(('id_cliente', 'institucion', 'subtipo', 'anho'), clave))
+    conteos = {'total': delta, 'en_proceso': 0, 'licencia_emitida': 0}
+    conteos[estado] = delta
+    stmt = dialecto.insert(tabla).values(**fila, **conteos)
+    # Suma atómica: dos altas concurrentes en el mismo grupo no se pisan
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(fila),
+        set_={nombre: tabla.c[nombre] + stmt.excluded[nombre] for nombre in conteos},
+    )
+    connection.execute(stmt)
+    if delta < 0:
+        connection.execute(
+            tabla.delete().where(
+                *(tabla.c[nombre] == valor for nombre, valor in fila.items()),
+                tabla.c.total <= 0,
+            )
+        )
+
+
+@event.listens_for(Proyecto, 'after_insert')
+def _resumen_alta(mapper, connection, target):
+    _ajustar_resumen(connection, [getattr(target, c) for c in RESUMEN_COLUMNAS], 1)
+
+
+@event.listens_for(Proyecto, 'after_update')
+def _resumen_cambio(mapper, connection, target):
+    estado = db.inspect(target)
+    if not any(estado.attrs[c].history.has_changes() for c in RESUMEN_COLUMNAS):
+        return
+    anteriores = [_valor_anterior(estado, c) for c in RESUMEN_COLUMNAS]
+    actuales = [getattr(target, c) for c in RESUMEN_COLUMNAS]
+    if _resumen_valores(anteriores) == _resumen_valores(actuales):
+        return
+    _ajustar_resumen(connection, anteriores, -1)
+    _ajustar_resumen(connection, actuales, 1)
+
+
+@event.listens_for(Proyecto, 'before_delete')
+def _resumen_baja(mapper, connection, target):
+    estado = db.inspect(target)
+    _ajustar_resumen(connection, [_valor_anterior(estado, c) for c in RESUMEN_COLUMNAS], -1)
+
+
+def _conservar_valor_anterior(target, value, oldvalue, initiator):
+    return value
+
+
+# active_history carga el valor previo aunque el atributo esté expirado
+# (p. ej. después de un commit), así after_update sabe de qué grupo restar.
+for _columna in RESUMEN_COLUMNAS:
+    event.listen(
+        getattr(Proyecto, _columna),
+        'set',
+        _conservar_valor_anterior,
+        active_history=True,
+        retval=True,
+    )
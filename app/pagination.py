@@ -0,0 +1,197 @@
+import base64
+import binascii
+import enum
+import hashlib
+import json
+import math
+
+from flask import current_app
+from sqlalchemy import and_, or_
+
+from .extensions import db
+
+# Con menos filas estimadas que esto se usa paginación por OFFSET y COUNT exacto
+KEYSET_MIN_ROWS = 10000
+
+
+def encode_cursor(data):
+    raw = json.dumps(data, separators=(',', ':'), default=_json_value).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, binascii.Error, UnicodeDecodeError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def _json_value(value):
+    if isinstance(value, enum.Enum):
+        return value.value
+    return str(value)
+
+
+def cursor_signature(*parts):
+    raw = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+
+def estimate_count(query):
+    """Cantidad de filas según el planificador de PostgreSQL (None si no aplica)."""
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return None
+    compiled = query.order_by(None).statement.compile(dialect=bind.dialect)
+    plan = db.session.connection().exec_driver_sql(
+        'EXPLAIN (FORMAT JSON) ' + compiled.string, compiled.params
+    ).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_rows(query):
+    """Devuelve (total, es_estimado): exacto en tablas chicas, del planificador en grandes."""
+    estimated = estimate_count(query)
+    threshold = current_app.config.get('KEYSET_MIN_ROWS', KEYSET_MIN_ROWS)
+    if estimated is not None and estimated >= threshold:
+        return estimated, True
+    return query.order_by(None).count(), False
+
+
+def use_keyset(cursor_token, total, total_is_estimate):
+    mode = current_app.config.get('LIST_PAGINATION_MODE', 'auto')
+    if mode == 'offset':
+        return False
+    if mode == 'keyset' or cursor_token:
+        return True
+    return total_is_estimate
+
+
+def sort_clauses(sort_expr, pk, ascending):
+    """ORDER BY de los listados: NULL cuenta como el valor más grande.
+
+    ASC NULLS LAST y DESC NULLS FIRST son el orden natural de un índice btree
+    de PostgreSQL (recorrido hacia adelante o hacia atrás), así el índice sirve
+    en ambas direcciones. Se escribe explícito para que SQLite, que pone los
+    NULL primero, ordene igual. OFFSET y keyset usan estas mismas cláusulas.
+    """
+    if ascending:
+        return sort_expr.asc().nullslast(), pk.asc()
+    return sort_expr.desc().nullsfirst(), pk.desc()
+
+
+def _after(sort_expr, pk, value, last_pk, ascending):
+    # Filas posteriores a (value, last_pk) en el orden de sort_clauses
+    tie = pk > last_pk if ascending else pk < last_pk
+    if ascending:
+        if value is None:
+            return and_(sort_expr.is_(None), tie)
+        return or_(sort_expr > value, and_(sort_expr == value, tie), sort_expr.is_(None))
+    if value is None:
+        return or_(and_(sort_expr.is_(None), tie), sort_expr.isnot(None))
+    return or_(sort_expr < value, and_(sort_expr == value, tie))
+
+
+class KeysetPagination:
+    """Página obtenida con WHERE (orden, pk) > cursor en lugar de OFFSET.
+
+    Expone la misma interfaz que usan las plantillas con ``query.paginate``
+    (page, per_page, total, pages, has_prev, has_next) más los cursores.
+    """
+
+    keyset = True
+
+    def __init__(self, items, page, per_page, total, total_is_estimate,
+                 prev_cursor=None, next_cursor=None):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+        self.pages = math.ceil(total / per_page) if total else 0
+        self.prev_cursor = prev_cursor
+        self.next_cursor = next_cursor
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _first_entity(row):
+    return row[0]
+
+
+def keyset_paginate(query, sort_expr, pk, ascending, per_page, cursor_token, signature,
+                    total, total_is_estimate, row_factory=None):
+    """Pagina ``query`` por (sort_expr, pk) en el orden de ``sort_clauses``.
+
+    ``signature`` identifica el orden activo; un cursor generado con otro orden
+    o con otros filtros se descarta y se vuelve a la primera página.
+    ``row_factory`` arma cada ítem desde la fila (por defecto, la primera
+    entidad); el ítem debe exponer ``pk.key`` como atributo.
+    """
+    if row_factory is None:
+        row_factory = _first_entity
+
+    cursor = decode_cursor(cursor_token)
+    if cursor and cursor.get('s') != signature:
+        cursor = None
+
+    backwards = bool(cursor) and cursor.get('d') == 'prev'
+    page = max(1, int(cursor.get('p', 1))) if cursor else 1
+
+    keyed = query.add_columns(sort_expr.label('_keyset_sort'))
+    if cursor:
+        value, last_pk = cursor.get('v'), cursor.get('k')
+        # Hacia atrás, "anteriores" son las posteriores en el orden invertido
+        keyed = keyed.filter(_after(sort_expr, pk, value, last_pk, ascending != backwards))
+
+    # Hacia atrás se recorre el orden invertido y luego se da vuelta la página
+    rows = (
+        keyed.order_by(*sort_clauses(sort_expr, pk, ascending != backwards))
+        .limit(per_page + 1)
+        .all()
+    )
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    items = [row_factory(row) for row in rows]
+
+    def _cursor(index, direction, target_page):
+        return encode_cursor({
+            's': signature,
+            'd': direction,
+            'p': target_page,
+            'v': rows[index][-1],
+            'k': getattr(items[index], pk.key),
+        })
+
+    prev_cursor = next_cursor = None
+    if rows:
+        if (backwards and has_more) or (not backwards and cursor):
+            prev_cursor = _cursor(0, 'prev', page - 1)
+        if (not backwards and has_more) or backwards:
+            next_cursor = _cursor(-1, 'next', page + 1)
+
+    return KeysetPagination(
+        items,
+        page,
+        per_page,
+        total,
+        total_is_estimate,
+        prev_cursor=prev_cursor,
+        next_cursor=next_cursor,
+    )
@@ -1,7 +1,6 @@
 import os
 from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
-from uuid import uuid4
 
 from flask import (
     Blueprint,
@@ -11,22 +10,70 @@ from flask import (
     url_for,
     flash,
     jsonify,
-    current_app,
-    send_file,
     abort,
 )
-from flask_login import login_required
+from flask_login import current_user, login_required
 from werkzeug.utils import secure_filename
 
 from sqlalchemy import or_, func
+from sqlalchemy.orm import load_only
 
+from ..cache import cached_fragment, conditional_view, fragment_key, store_fragment
 from ..extensions import db
+from ..pagination import count_rows, cursor_signature, keyset_paginate, sort_clauses, use_keyset
+from ..read_models import ProyectoFila
+from ..storage import (
+    absolute_path,
+    delete_stored,
+    deliver_file,
+    send_stored,
+    sniff_mimetype,
+    storage_key,
+    store_file,
+    upload_root,
+)
+from ..uploads import (
+    UPLOAD_CHUNK_SIZE,
+    StagedUpload,
+    UploadError,
+    append_chunk,
+    create_upload,
+    discard_upload,
+    finish_upload,
+    load_upload,
+    received_bytes,
+    record_result,
+    release_upload_data,
+    spool_upload,
+)
+from ..search import (
+    key_search_filter,
+    normalize_search_text,
+    text_search_filter,
+    text_search_rank,
+    year_term,
+)
+from ..jobs.thumbnails import (
+    RENDITION_SIZES,
+    ensure_rendition,
+    remove_renditions,
+    rendition_mimetype,
+    schedule_renditions,
+)
+from ..jobs.documentos import queue_document
 from ..models import (
     Proyecto,
     Cliente,
     Propiedad,
     DocumentoProyecto,
     ProyectoEstado,
+    DOC_FLAG_MAPA,
+    DOC_FLAG_PDF,
+    DOC_FLAG_IMAGEN,
+    DOC_FLAG_FACTURA,
+    DOC_FLAG_OTROS,
+    clasificar_documento,
+    tipo_documento,
 )
 
 bp = Blueprint('proyectos', __name__)
@@ -70,8 +117,23 @@ MODULE_SUBTIPOS = {
     ],
 }
 
-ALLOWED_DOCUMENT_EXT = {'.pdf', '.png', '.jpg', '.jpeg', '.gif', '.webp', '.doc', '.docx', '.xlsx', '.zip', '.rar', '.shp'}
-IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp'}
+RENDITION_MAX_AGE = 365 * 24 * 3600
+# Tipo que tiene que detectar sniff_mimetype en el contenido de cada extensión
+DOCUMENT_MIMETYPES = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif',
+    '.webp': 'image/webp',
+    '.doc': 'application/msword',
+    '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    '.zip': 'application/zip',
+    '.rar': 'application/vnd.rar',
+    '.shp': 'application/x-esri-shape',
+}
+ALLOWED_DOCUMENT_EXT = set(DOCUMENT_MIMETYPES)
 
 ESTADOS_LIST = [
     ProyectoEstado.en_proceso,
@@ -121,90 +183,111 @@ def _resolve_estado(raw_value):
     return ESTADOS_POR_VALOR.get(key, ProyectoEstado.en_proceso)
 
 
-def _upload_root():
-    base_upload = current_app.config.get('UPLOAD_FOLDER', 'uploads')
-    if not os.path.isabs(base_upload):
-        base_upload = os.path.join(current_app.root_path, base_upload)
-    os.makedirs(base_upload, exist_ok=True)
-    return base_upload
-
-
-def _project_folder(proyecto, categoria=None):
-    parts = [
-        str(proyecto.id_cliente or 'sin_cliente'),
-        (proyecto.institucion or 'otros').replace(' ', '_').lower(),
-        str(proyecto.anho or 'sin_anho'),
-        str(proyecto.id_proyecto or 'tmp'),
-    ]
-    target = os.path.join(_upload_root(), *parts)
-    if categoria:
-        target = os.path.join(target, categoria)
-    os.makedirs(target, exist_ok=True)
-    return target
-
-
-def _relative_path(absolute_path):
-    if not absolute_path:
-        return None
-    root = _upload_root()
-    try:
-        return os.path.relpath(absolute_path, root)
-    except ValueError:
-        # Cuando los discos difieren mantenemos absoluta
-        return absolute_path
-
+def _remove_file(stored_path):
+    delete_stored(stored_path)
 
-def _absolute_path(stored_path):
-    if not stored_path:
-        return None
-    if os.path.isabs(stored_path) and os.path.exists(stored_path):
-        return stored_path
-    candidate = os.path.join(_upload_root(), stored_path)
-    if os.path.exists(candidate):
-        return candidate
-    return stored_path if os.path.exists(stored_path) else None
 
+def _remove_document_files(doc):
+    # El blob de contenido lo libera el conteo de referencias al borrar la fila
+    if not doc.sha256:
+        _remove_file(doc.archivo_url)
+    remove_renditions(upload_root(), doc.id_documento)
 
-def _remove_file(stored_path):
-    abs_path = _absolute_path(stored_path)
-    if abs_path and os.path.exists(abs_path):
-        try:
-            os.remove(abs_path)
-        except OSError:
-            pass
 
+def _save_project_document(proyecto, file_storage, categoria=None):
+    """Registra el archivo como documento del proyecto y lo devuelve.
 
-def _save_project_document(proyecto, file_storage, categoria='documento'):
+    Sin ``categoria`` se deduce del tipo detectado en el contenido (imagen,
+    pdf o documento). Un archivo cuyo contenido no es lo que dice su
+    extensión se rechaza con ValueError.
+    """
     if not file_storage or not file_storage.filename:
         return None
     ext = os.path.splitext(file_storage.filename)[1].lower()
     if ext not in ALLOWED_DOCUMENT_EXT:
         raise ValueError(f"Extensión no permitida ({ext})")
 
-    folder = _project_folder(proyecto, categoria)
     original_name = secure_filename(file_storage.filename)
-    unique_name = f"{uuid4().hex}{ext}"
-    absolute_target = os.path.join(folder, unique_name)
-    file_storage.save(absolute_target)
-
-    relative = _relative_path(absolute_target)
+    staged = isinstance(file_storage, StagedUpload)
+    path = file_storage.path if staged else spool_upload(file_storage)
+    mimetype = sniff_mimetype(path)
+    if mimetype != DOCUMENT_MIMETYPES[ext]:
+        if not staged:
+            os.remove(path)
+        raise ValueError(f"El contenido de {original_name} no corresponde a un archivo {ext}")
+    categoria = categoria or tipo_documento(original_name, mimetype)
+
+    if staged:
+        # Carga por partes: ya está completa en disco y con el hash calculado.
+        # Se enlaza (no se mueve): si la transacción se revierte, la carga
+        # sigue en staging y el blob colocado se descarta.
+        sha256, relative = store_file(path, file_storage.sha256, file_storage.size)
+    else:
+        # Hash y paso al almacén se hacen en segundo plano tras el commit
+        sha256, relative = None, storage_key(path)
     doc = DocumentoProyecto(
         id_proyecto=proyecto.id_proyecto,
         tipo=categoria,
         categoria=categoria,
         archivo_url=relative,
+        sha256=sha256,
         nombre_original=original_name,
-        mime_type=file_storage.mimetype,
+        mime_type=mimetype,
     )
     db.session.add(doc)
-    return relative
+    db.session.flush()
+    proyecto.registrar_documento(doc)
+    if not staged:
+        queue_document(doc.id_documento, path)
+    elif mimetype.startswith('image/'):
+        schedule_renditions(absolute_path(relative), doc.id_documento, upload_root())
+    return doc
+
+
+def _refresh_document_summary(proyecto):
+    # Tras una baja no alcanza con un cálculo incremental: se rehace el resumen
+    # con los metadatos de los documentos que quedan.
+    db.session.flush()
+    documentos = (
+        DocumentoProyecto.query
+        .filter_by(id_proyecto=proyecto.id_proyecto)
+        .options(
+            load_only(
+                DocumentoProyecto.id_documento,
+                DocumentoProyecto.nombre_original,
+                DocumentoProyecto.categoria,
+                DocumentoProyecto.mime_type,
+            )
+        )
+        .all()
+    )
+    proyecto.recalcular_documentos(documentos)
+
+
+def _delete_document(id_documento):
+    # FOR UPDATE y recarga: si el worker está pasando el documento al almacén,
+    # se espera su commit y se ve el sha256 que asignó; con la fila vieja la
+    # baja no liberaría la referencia al blob. Sin autoflush para tomar el
+    # lock del documento antes que el del proyecto, en el mismo orden que el
+    # worker.
+    with db.session.no_autoflush:
+        doc = db.session.get(
+            DocumentoProyecto, id_documento, with_for_update=True, populate_existing=True
+        )
+    if doc is None:
+        return None
+    _remove_document_files(doc)
+    db.session.delete(doc)
+    return doc
 
 
 def _clear_documents(proyecto, categoria):
+    removed = False
     for doc in list(proyecto.documentos):
-        if doc.categoria == categoria:
-            _remove_file(doc.archivo_url)
-            db.session.delete(doc)
+        if doc.categoria == categoria and _delete_document(doc.id_documento):
+            removed = True
+    if removed:
+        _refresh_document_summary(proyecto)
 
 
 def _fill_project_from_form(proyecto, form_data):
@@ -256,9 +339,9 @@ def _process_project_files(proyecto, files):
 
     for factura_doc in factura_archivos:
         try:
-            relative = _save_project_document(proyecto, factura_doc, categoria='factura')
+            doc = _save_project_document(proyecto, factura_doc, categoria='factura')
             # Mantener compatibilidad con referencias existentes al último archivo cargado
-            proyecto.factura_archivo_url = relative
+            proyecto.factura_archivo_url = doc.archivo_url
         except ValueError as exc:
             flash(str(exc), 'warning')
 
@@ -267,8 +350,8 @@ def _process_project_files(proyecto, files):
         _clear_documents(proyecto, 'mapa')
         _remove_file(proyecto.mapa_archivo_url)
         try:
-            relative = _save_project_document(proyecto, mapa, categoria='mapa')
-            proyecto.mapa_archivo_url = relative
+            doc = _save_project_document(proyecto, mapa, categoria='mapa')
+            proyecto.mapa_archivo_url = doc.archivo_url
         except ValueError as exc:
             flash(str(exc), 'warning')
 
@@ -290,53 +373,32 @@ def _process_project_files(proyecto, files):
             flash(str(exc), 'warning')
 
 
-def _classify_documentos(documentos):
-    map_docs = []
-    factura_docs = []
-    image_docs = []
-    pdf_docs = []
-    other_docs = []
-
-    for doc in documentos:
-        name = doc.nombre_original or ''
-        ext = os.path.splitext(name)[1].lower()
-        categoria = (doc.categoria or '').lower()
-
-        if categoria == 'mapa':
-            map_docs.append(doc)
-            continue
-        if categoria == 'factura':
-            factura_docs.append(doc)
-            continue
-        if ext in IMAGE_EXTENSIONS:
-            image_docs.append(doc)
-        elif ext == '.pdf':
-            pdf_docs.append(doc)
-        else:
-            other_docs.append(doc)
-
-    return {
-        'mapas': map_docs,
-        'facturas': factura_docs,
-        'imagenes': image_docs,
-        'pdfs': pdf_docs,
-        'otros': other_docs,
-    }
+DOC_FLAG_GROUPS = (
+    (DOC_FLAG_MAPA, 'mapas'),
+    (DOC_FLAG_FACTURA, 'facturas'),
+    (DOC_FLAG_IMAGEN, 'imagenes'),
+    (DOC_FLAG_PDF, 'pdfs'),
+    (DOC_FLAG_OTROS, 'otros'),
+)
 
 
-def _select_hero_doc(classification):
-    for doc in classification['mapas']:
-        ext = os.path.splitext(doc.nombre_original or '')[1].lower()
-        if ext in IMAGE_EXTENSIONS:
-            return doc
-    if classification['imagenes']:
-        return classification['imagenes'][0]
-    return None
+def _classify_documentos(documentos):
+    classification = {key: [] for _, key in DOC_FLAG_GROUPS}
+    for doc in documentos:
+        flags = clasificar_documento(doc.categoria, doc.nombre_original, doc.mime_type)
+        for flag, key in DOC_FLAG_GROUPS:
+            if flags & flag:
+                classification[key].append(doc)
+                break
+    return classification
 
 
-def _prepare_document_groups(documentos):
+def _prepare_document_groups(proyecto, documentos):
     classification = _classify_documentos(documentos)
-    hero_doc = _select_hero_doc(classification)
+    hero_doc = next(
+        (doc for doc in documentos if doc.id_documento == proyecto.hero_documento_id),
+        None,
+    )
 
     group_specs = [
         ('Mapa de ubicación/referencia', classification['mapas']),
@@ -354,9 +416,14 @@ def _prepare_document_groups(documentos):
     return groups, hero_doc, classification
 
 
-@bp.route('/')
-@login_required
-def index():
+def render_project_list(endpoint, page_template, results_template, institucion=None,
+                        page_context=None):
+    """Listado paginado de proyectos con búsqueda en vivo y orden por columna.
+
+    Lo comparten proyectos.index y mades.index: ``institucion`` fija el filtro
+    del módulo y ``page_context`` (solo en la página completa, no en los
+    fragmentos de búsqueda) agrega variables propias de la plantilla.
+    """
     proyecto_id = request.args.get('proyecto_id', type=int)
     page = request.args.get('page', type=int, default=1)
     if page < 1:
@@ -370,23 +437,34 @@ def index():
     sort_direction = request.args.get('direction', 'desc')
     if sort_direction not in ('asc', 'desc'):
         sort_direction = 'desc'
+    cursor = request.args.get('cursor')
 
-    query = Proyecto.query.outerjoin(Cliente)
+    # Solo las columnas que muestra el listado, con el nombre del cliente por JOIN
+    query = (
+        db.session.query(*ProyectoFila.columns())
+        .select_from(Proyecto)
+        .outerjoin(Proyecto.cliente)
+    )
 
+    if institucion:
+        query = query.filter(Proyecto.institucion == institucion)
     if proyecto_id:
         query = query.filter(Proyecto.id_proyecto == proyecto_id)
 
+    search_keys = (
+        Cliente.nombre_busqueda,
+        Proyecto.subtipo_busqueda,
+        Proyecto.nombre_busqueda,
+    )
     if search:
-        like = f"%{search}%"
-        query = query.filter(
-            or_(
-                Cliente.nombre_razon_social.ilike(like),
-                Proyecto.institucion.ilike(like),
-                Proyecto.subtipo.ilike(like),
-                Proyecto.nombre_proyecto.ilike(like),
-                func.cast(Proyecto.anho, db.String).ilike(like),
-            )
+        condition = or_(
+            key_search_filter(search, *search_keys),
+            text_search_filter(search, Proyecto.institucion),
         )
+        anho = year_term(search)
+        if anho is not None:
+            condition = or_(condition, Proyecto.anho == anho)
+        query = query.filter(condition)
 
     sort_columns = {
         'cliente': func.lower(Cliente.nombre_razon_social),
@@ -395,16 +473,60 @@ def index():
         'subtipo': func.lower(Proyecto.subtipo),
         'proyecto': func.lower(Proyecto.nombre_proyecto),
         'estado': Proyecto.estado,
+        'vencimiento': Proyecto.fecha_vencimiento_licencia,
     }
     if sort_field not in sort_columns:
         sort_field = 'cliente'
     order_column = sort_columns[sort_field]
-    if sort_direction == 'asc':
-        query = query.order_by(order_column.asc(), Proyecto.id_proyecto.asc())
-    else:
-        query = query.order_by(order_column.desc(), Proyecto.id_proyecto.desc())
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    is_fragment = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+    if is_fragment:
+        cache_key = fragment_key(
+            results_template,
+            ('proyecto', 'cliente'),
+            institucion=institucion,
+            q=search,
+            proyecto_id=proyecto_id,
+            page=page,
+            per_page=per_page,
+            sort=sort_field,
+            direction=sort_direction,
+            cursor=cursor,
+        )
+        cached = cached_fragment(cache_key)
+        if cached is not None:
+            return cached
+
+    # Con el orden por defecto, una búsqueda se ordena por relevancia
+    ranked = bool(search) and sort_field == 'cliente' and sort_direction == 'desc'
+    if ranked:
+        rank = text_search_rank(normalize_search_text(search), *search_keys)
+
+    total, total_is_estimate = count_rows(query)
+    if use_keyset(cursor, total, total_is_estimate):
+        pagination = keyset_paginate(
+            query,
+            rank if ranked else order_column,
+            Proyecto.id_proyecto,
+            sort_direction == 'asc',
+            per_page,
+            cursor,
+            cursor_signature(endpoint, search, proyecto_id, sort_field, sort_direction),
+            total,
+            total_is_estimate,
+            row_factory=ProyectoFila.from_row,
+        )
+    else:
+        if ranked:
+            query = query.order_by(rank.desc(), order_column.desc(), Proyecto.id_proyecto.desc())
+        else:
+            query = query.order_by(
+                *sort_clauses(order_column, Proyecto.id_proyecto, sort_direction == 'asc')
+            )
+        pagination = query.paginate(page=page, per_page=per_page, error_out=False, count=False)
+        pagination.total = total
+        pagination.total_is_estimate = total_is_estimate
+        pagination.items = ProyectoFila.from_rows(pagination.items)
     proyectos = pagination.items
     active_filter_params = {}
     if search:
@@ -428,7 +550,7 @@ def index():
     def _build_url(**extra):
         params = dict(query_defaults)
         params.update({k: v for k, v in extra.items() if v is not None})
-        return url_for('proyectos.index', **params)
+        return url_for(endpoint, **params)
 
     template_kwargs = {
         'proyectos': proyectos,
@@ -441,19 +563,27 @@ def index():
         'sort_direction': sort_direction,
         'query_defaults': query_defaults,
         'build_projects_url': _build_url,
-        'clean_filter_url': url_for('proyectos.index', **clean_params),
+        'clean_filter_url': url_for(endpoint, **clean_params),
     }
 
-    if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
-        return render_template('proyectos/_results.html', **template_kwargs)
+    if is_fragment:
+        return store_fragment(cache_key, render_template(results_template, **template_kwargs))
+
+    if page_context is not None:
+        template_kwargs.update(page_context())
+    return render_template(page_template, **template_kwargs)
+
 
-    return render_template('proyectos/list.html', **template_kwargs)
+@bp.route('/')
+@login_required
+@conditional_view('proyecto', 'cliente')
+def index():
+    return render_project_list('proyectos.index', 'proyectos/list.html', 'proyectos/_results.html')
 
 
 @bp.route('/nuevo', methods=['GET', 'POST'])
 @login_required
 def nuevo():
-    clientes = Cliente.query.order_by(Cliente.nombre_razon_social.asc()).all()
     pre_id_cliente = request.args.get('id_cliente', type=int)
 
     if request.method == 'POST':
@@ -495,7 +625,7 @@ def nuevo():
 
     return render_template(
         'proyectos/new.html',
-        clientes=clientes,
+        pre_cliente=db.session.get(Cliente, pre_id_cliente) if pre_id_cliente else None,
         anho_actual=date.today().year,
         module_subtipos=MODULE_SUBTIPOS,
         estados=ESTADOS_LIST,
@@ -545,19 +675,20 @@ def _build_timeline(proyecto):
 
 
 def _project_card_data(proyecto):
-    classification = _classify_documentos(proyecto.documentos)
-    hero_doc = _select_hero_doc(classification)
+    # Las banderas y la portada se mantienen al escribir; la tarjeta no
+    # necesita leer documentos.
+    doc_flags = proyecto.doc_flags or 0
     flags = [
-        {'label': 'Mapa', 'icon': 'bi-geo-alt', 'available': bool(classification['mapas'])},
-        {'label': 'PDF', 'icon': 'bi-file-earmark-pdf', 'available': bool(classification['pdfs'])},
-        {'label': 'Imagen', 'icon': 'bi-card-image', 'available': bool(classification['imagenes'])},
-        {'label': 'Factura', 'icon': 'bi-receipt', 'available': bool(classification['facturas'])},
-        {'label': 'Otros', 'icon': 'bi-folder', 'available': bool(classification['otros'])},
+        {'label': 'Mapa', 'icon': 'bi-geo-alt', 'available': bool(doc_flags & DOC_FLAG_MAPA)},
+        {'label': 'PDF', 'icon': 'bi-file-earmark-pdf', 'available': bool(doc_flags & DOC_FLAG_PDF)},
+        {'label': 'Imagen', 'icon': 'bi-card-image', 'available': bool(doc_flags & DOC_FLAG_IMAGEN)},
+        {'label': 'Factura', 'icon': 'bi-receipt', 'available': bool(doc_flags & DOC_FLAG_FACTURA)},
+        {'label': 'Otros', 'icon': 'bi-folder', 'available': bool(doc_flags & DOC_FLAG_OTROS)},
     ]
     timeline = _build_timeline(proyecto)
     return {
         'project': proyecto,
-        'hero_doc': hero_doc,
+        'hero_doc_id': proyecto.hero_documento_id,
         'doc_flags': flags,
         'timeline': timeline,
     }
@@ -571,6 +702,7 @@ def board_legacy(id_cliente, inst):
 
 @bp.route('/clientes/<int:id_cliente>/ano/<int:ano>/institucion/<string:inst>/proyectos')
 @login_required
+@conditional_view('proyecto', 'cliente')
 def board(id_cliente, ano, inst):
     tipo_prefill = request.args.get('tipo')
     cliente = Cliente.query.get_or_404(id_cliente)
@@ -652,14 +784,14 @@ def board(id_cliente, ano, inst):
 
 @bp.route('/<int:id_proyecto>/detalle')
 @login_required
+@conditional_view('proyecto', 'cliente', 'documento_proyecto', 'propiedad')
 def vista(id_proyecto):
     proyecto = Proyecto.query.get_or_404(id_proyecto)
     documentos = DocumentoProyecto.query.filter_by(id_proyecto=id_proyecto).order_by(DocumentoProyecto.uploaded_at.desc()).all()
-    doc_groups, hero_doc, classification = _prepare_document_groups(documentos)
+    doc_groups, hero_doc, classification = _prepare_document_groups(proyecto, documentos)
     image_docs = list(classification['imagenes'])
     if hero_doc and hero_doc not in image_docs:
-        ext = os.path.splitext(hero_doc.nombre_original or '')[1].lower()
-        if ext in IMAGE_EXTENSIONS:
+        if tipo_documento(hero_doc.nombre_original, hero_doc.mime_type) == 'imagen':
             image_docs.insert(0, hero_doc)
 
     back_inst = request.args.get('inst')
@@ -739,14 +871,7 @@ def agregar_documentos(id_proyecto):
         if not archivo or not archivo.filename:
             continue
         try:
-            ext = os.path.splitext(archivo.filename)[1].lower()
-            if ext in IMAGE_EXTENSIONS:
-                categoria = 'imagen'
-            elif ext == '.pdf':
-                categoria = 'pdf'
-            else:
-                categoria = 'documento'
-            _save_project_document(proyecto, archivo, categoria=categoria)
+            _save_project_document(proyecto, archivo)
         except ValueError as exc:
             flash(str(exc), 'warning')
 
@@ -755,6 +880,138 @@ def agregar_documentos(id_proyecto):
     return redirect(url_for('proyectos.vista', id_proyecto=id_proyecto))
 
 
+def _upload_error(exc):
+    payload = {"ok": False, "error": str(exc)}
+    if exc.received is not None:
+        payload["received"] = exc.received
+    return jsonify(payload), exc.status
+
+
+def _upload_status(upload_id, meta):
+    return {
+        "ok": True,
+        "upload_id": upload_id,
+        "filename": meta['filename'],
+        "size": meta['size'],
+        # Completada: sus partes ya se borraron, el cliente pasa a ``completar``
+        "received": meta['size'] if meta.get('resultado') else received_bytes(upload_id),
+        "chunk_size": UPLOAD_CHUNK_SIZE,
+    }
+
+
+def _completed_upload_document(proyecto, meta):
+    resultado = meta.get('resultado')
+    if not resultado:
+        return None
+    # El resultado se anota antes del commit: si no se confirmó, no hay documento
+    doc = db.session.get(DocumentoProyecto, resultado['id_documento'])
+    if doc is None or doc.id_proyecto != proyecto.id_proyecto or doc.sha256 != resultado['sha256']:
+        return None
+    return doc
+
+
+@bp.route('/<int:id_proyecto>/cargas', methods=['POST'])
+@login_required
+def iniciar_carga(id_proyecto):
+    """Abre una carga por partes para un archivo de ``agregar_documentos``."""
+    proyecto = Proyecto.query.get_or_404(id_proyecto)
+    data = request.get_json(silent=True) or {}
+    filename = (data.get('filename') or '').strip()
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in ALLOWED_DOCUMENT_EXT:
+        return jsonify({"ok": False, "error": f"Extensión no permitida ({ext})"}), 400
+    try:
+        upload_id = create_upload(
+            current_user.get_id(),
+            filename,
+            _parse_int(data.get('size')),
+            id_proyecto=proyecto.id_proyecto,
+        )
+        return jsonify(_upload_status(upload_id, load_upload(upload_id, current_user.get_id()))), 201
+    except UploadError as exc:
+        return _upload_error(exc)
+
+
+def _load_project_upload(id_proyecto, upload_id):
+    meta = load_upload(upload_id, current_user.get_id())
+    if meta.get('id_proyecto') != id_proyecto:
+        raise UploadError('Carga inexistente', status=404)
+    return meta
+
+
+@bp.route('/<int:id_proyecto>/cargas/<upload_id>', methods=['GET'])
+@login_required
+def estado_carga(id_proyecto, upload_id):
+    """Bytes recibidos: el cliente reanuda desde ``received``."""
+    try:
+        meta = _load_project_upload(id_proyecto, upload_id)
+        return jsonify(_upload_status(upload_id, meta))
+    except UploadError as exc:
+        return _upload_error(exc)
+
+
+@bp.route('/<int:id_proyecto>/cargas/<upload_id>', methods=['PUT'])
+@login_required
+def agregar_parte(id_proyecto, upload_id):
+    """Recibe una parte en el cuerpo crudo; ``offset`` y X-Chunk-Sha256 la ubican y verifican."""
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({"ok": False, "error": "Falta offset"}), 400
+    try:
+        _load_project_upload(id_proyecto, upload_id)
+        received = append_chunk(
+            upload_id,
+            current_user.get_id(),
+            offset,
+            request.get_data(cache=False),
+            checksum=request.headers.get('X-Chunk-Sha256'),
+        )
+    except UploadError as exc:
+        return _upload_error(exc)
+    return jsonify({"ok": True, "received": received})
+
+
+@bp.route('/<int:id_proyecto>/cargas/<upload_id>/completar', methods=['POST'])
+@login_required
+def completar_carga(id_proyecto, upload_id):
+    """Cierra la carga y la registra como documento del proyecto."""
+    proyecto = Proyecto.query.get_or_404(id_proyecto)
+    data = request.get_json(silent=True) or {}
+    try:
+        meta = _load_project_upload(id_proyecto, upload_id)
+        doc = _completed_upload_document(proyecto, meta)
+        if doc is not None:
+            # Reintento de un ``completar`` cuya respuesta se perdió
+            return jsonify(_completed_upload(doc, meta['size']))
+        staged = finish_upload(upload_id, current_user.get_id(), sha256=data.get('sha256'))
+        doc = _save_project_document(proyecto, staged)
+        record_result(upload_id, id_documento=doc.id_documento, sha256=doc.sha256)
+    except UploadError as exc:
+        return _upload_error(exc)
+    except ValueError as exc:
+        # El contenido no es lo que dice la extensión: reintentar no sirve
+        discard_upload(upload_id)
+        return jsonify({"ok": False, "error": str(exc)}), 400
+    db.session.commit()
+    release_upload_data(upload_id)
+    return jsonify(_completed_upload(doc, staged.size))
+
+
+def _completed_upload(doc, size):
+    return {"ok": True, "id_documento": doc.id_documento, "sha256": doc.sha256, "size": size}
+
+
+@bp.route('/<int:id_proyecto>/cargas/<upload_id>', methods=['DELETE'])
+@login_required
+def cancelar_carga(id_proyecto, upload_id):
+    try:
+        _load_project_upload(id_proyecto, upload_id)
+    except UploadError as exc:
+        return _upload_error(exc)
+    discard_upload(upload_id)
+    return jsonify({"ok": True})
+
+
 def _financial_summary(proyecto):
     costo = proyecto.costo_total
     entregado = proyecto.monto_entregado_calculado if proyecto.monto_entregado_calculado is not None else None
@@ -793,7 +1050,6 @@ def update_estado(id_proyecto):
 @login_required
 def editar(id_proyecto):
     proyecto = Proyecto.query.get_or_404(id_proyecto)
-    clientes = Cliente.query.order_by(Cliente.nombre_razon_social.asc()).all()
 
     raw_back_inst = request.args.get('inst')
     raw_back_ano = request.args.get('ano', type=int)
@@ -830,7 +1086,6 @@ def editar(id_proyecto):
     return render_template(
         'proyectos/edit.html',
         p=proyecto,
-        clientes=clientes,
         documentos=documentos,
         estados=ESTADOS_LIST,
         estado_labels=ESTADO_LABELS,
@@ -842,6 +1097,7 @@ def editar(id_proyecto):
 
 @bp.route('/api/cliente/<int:id_cliente>/propiedades')
 @login_required
+@conditional_view('propiedad')
 def get_propiedades_cliente(id_cliente):
     propiedades = Propiedad.query.filter_by(id_cliente=id_cliente).order_by(Propiedad.finca.asc()).all()
     return jsonify(
@@ -860,10 +1116,11 @@ def get_propiedades_cliente(id_cliente):
 @bp.route('/doc/<int:id_doc>/eliminar', methods=['POST'])
 @login_required
 def eliminar_doc(id_doc):
-    doc = DocumentoProyecto.query.get_or_404(id_doc)
+    doc = _delete_document(id_doc)
+    if doc is None:
+        abort(404)
     proyecto = Proyecto.query.get_or_404(doc.id_proyecto)
-    _remove_file(doc.archivo_url)
-    db.session.delete(doc)
+    _refresh_document_summary(proyecto)
     db.session.commit()
     flash('Documento eliminado correctamente', 'success')
     return redirect(url_for('proyectos.editar', id_proyecto=proyecto.id_proyecto))
@@ -875,8 +1132,7 @@ def eliminar_proyecto(id_proyecto):
     proyecto = Proyecto.query.get_or_404(id_proyecto)
     try:
         for doc in list(proyecto.documentos):
-            _remove_file(doc.archivo_url)
-            db.session.delete(doc)
+            _delete_document(doc.id_documento)
 
         _remove_file(proyecto.factura_archivo_url)
         _remove_file(proyecto.mapa_archivo_url)
@@ -897,18 +1153,39 @@ def eliminar_proyecto(id_proyecto):
 
 
 def _send_document(doc, as_attachment):
-    resolved = _absolute_path(doc.archivo_url)
-    if not resolved or not os.path.exists(resolved):
+    download_name = doc.nombre_original or os.path.basename(doc.archivo_url or '') or 'documento'
+    response = send_stored(doc.archivo_url, download_name, as_attachment, mimetype=doc.mime_type or None)
+    if response is None:
         flash(f'Archivo no encontrado: {doc.archivo_url}', 'error')
         abort(404)
-    download_name = doc.nombre_original or os.path.basename(resolved)
-    return send_file(resolved, as_attachment=as_attachment, download_name=download_name)
+    return response
+
+
+def _send_rendition(doc, size):
+    # Las miniaturas son inmutables por id de documento: se cachean por un año.
+    # Si el documento es anterior a esta función se generan al primer pedido.
+    resolved = absolute_path(doc.archivo_url)
+    if not resolved or tipo_documento(doc.nombre_original or doc.archivo_url, doc.mime_type) != 'imagen':
+        return None
+    rendition = ensure_rendition(resolved, doc.id_documento, upload_root(), size)
+    if not rendition:
+        return None
+    response = deliver_file(rendition, mimetype=rendition_mimetype(), max_age=RENDITION_MAX_AGE)
+    response.cache_control.private = True
+    response.cache_control.public = False
+    response.cache_control.immutable = True
+    return response
 
 
 @bp.route('/doc/<int:id_doc>/ver', methods=['GET'])
 @login_required
 def ver_doc(id_doc):
     doc = DocumentoProyecto.query.get_or_404(id_doc)
+    size = request.args.get('size')
+    if size in RENDITION_SIZES:
+        response = _send_rendition(doc, size)
+        if response is not None:
+            return response
     return _send_document(doc, as_attachment=False)
 
 
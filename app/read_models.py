@@ -0,0 +1,111 @@
+"""Filas de solo lectura para los listados.
+
+Cada clase declara las columnas que muestra su plantilla (incluido el nombre
+del cliente por JOIN) y se materializa en objetos con ``__slots__``, sin
+identidad en la sesión ni carga perezosa de relaciones.
+"""
+from .models import Cliente, Plazo, Proyecto, Vencimiento
+
+
+class ReadModel:
+    __slots__ = ()
+
+    @classmethod
+    def columns(cls):
+        """Expresiones SELECT en el mismo orden que ``__slots__``."""
+        raise NotImplementedError
+
+    def __init__(self, *values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(*row[:len(cls.__slots__)])
+
+    @classmethod
+    def from_rows(cls, rows):
+        return [cls.from_row(row) for row in rows]
+
+    def __repr__(self):
+        return f"<{type(self).__name__} {getattr(self, self.__slots__[0], None)!r}>"
+
+
+class ProyectoFila(ReadModel):
+    __slots__ = (
+        'id_proyecto',
+        'id_cliente',
+        'cliente_nombre',
+        'institucion',
+        'anho',
+        'subtipo',
+        'nombre_proyecto',
+        'estado',
+        'fecha_vencimiento_licencia',
+    )
+
+    @classmethod
+    def columns(cls):
+        return (
+            Proyecto.id_proyecto,
+            Proyecto.id_cliente,
+            Cliente.nombre_razon_social,
+            Proyecto.institucion,
+            Proyecto.anho,
+            Proyecto.subtipo,
+            Proyecto.nombre_proyecto,
+            Proyecto.estado,
+            Proyecto.fecha_vencimiento_licencia,
+        )
+
+
+class PlazoFila(ReadModel):
+    __slots__ = (
+        'id_plazo',
+        'origen',
+        'id_cliente',
+        'id_proyecto',
+        'cliente_nombre',
+        'titulo',
+        'subtipo',
+        'estado',
+        'fecha',
+    )
+
+    @classmethod
+    def columns(cls):
+        return (
+            Plazo.id_plazo,
+            Plazo.origen,
+            Plazo.id_cliente,
+            Plazo.id_proyecto,
+            Cliente.nombre_razon_social,
+            Plazo.titulo,
+            Plazo.subtipo,
+            Plazo.estado,
+            Plazo.fecha,
+        )
+
+
+class VencimientoFila(ReadModel):
+    __slots__ = (
+        'id_vencimiento',
+        'id_cliente',
+        'cliente_nombre',
+        'tipo_documento',
+        'fecha_emision',
+        'fecha_vencimiento',
+        'estado',
+    )
+
+    @classmethod
+    def columns(cls):
+        return (
+            Vencimiento.id_vencimiento,
+            Vencimiento.id_cliente,
+            Cliente.nombre_razon_social,
+            Vencimiento.tipo_documento,
+            Vencimiento.fecha_emision,
+            Vencimiento.fecha_vencimiento,
+            Vencimiento.estado,
+        )
@@ -0,0 +1,77 @@
+import unicodedata
+
+from sqlalchemy import Numeric, case, cast, func, or_
+
+from .extensions import db
+
+
+def normalize_search_text(value):
+    """Clave de búsqueda sin acentos ni mayúsculas: 'Núñez  SA' -> 'nunez sa'."""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split())
+
+
+LIKE_ESCAPE = '\\'
+
+
+def escape_like(value):
+    """Escapa ``\\``, ``%`` y ``_`` para usar texto del usuario en un patrón LIKE."""
+    return (
+        value.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace('%', LIKE_ESCAPE + '%')
+        .replace('_', LIKE_ESCAPE + '_')
+    )
+
+
+def _dialect_name():
+    return db.session.get_bind().dialect.name
+
+
+def text_search_filter(term, *columns):
+    """Filtro ILIKE '%term%' sobre varias columnas.
+
+    En PostgreSQL lo resuelven los índices GIN ``gin_trgm_ops`` creados por la
+    migración de búsqueda, en vez de un recorrido secuencial.
+    """
+    like = f'%{escape_like(term)}%'
+    return or_(*(column.ilike(like, escape=LIKE_ESCAPE) for column in columns))
+
+
+def key_search_filter(term, *key_columns):
+    """Filtro sobre columnas de clave normalizada (ver normalize_search_text).
+
+    Las claves ya están en minúsculas y sin acentos, así que alcanza con LIKE
+    y el índice trigram de la columna de clave.
+    """
+    like = f'%{escape_like(normalize_search_text(term))}%'
+    return or_(*(column.like(like, escape=LIKE_ESCAPE) for column in key_columns))
+
+
+def text_search_rank(term, *columns):
+    """Expresión de relevancia (mayor es mejor) para ordenar resultados."""
+    if _dialect_name() == 'postgresql':
+        # Redondeado a numeric para que sirva como clave exacta en cursores
+        return cast(
+            func.greatest(
+                *(func.word_similarity(term, func.coalesce(column, '')) for column in columns)
+            ),
+            Numeric(6, 4),
+        )
+    # Sin pg_trgm (SQLite en desarrollo): primero las coincidencias por prefijo
+    prefix = f'{escape_like(term.lower())}%'
+    rank = None
+    for column in columns:
+        match = case((func.lower(column).like(prefix, escape=LIKE_ESCAPE), 1), else_=0)
+        rank = match if rank is None else rank + match
+    return rank
+
+
+def year_term(term):
+    """Año buscado si el término es numérico (se compara por igualdad, indexable)."""
+    term = term.strip()
+    if term.isdigit() and len(term) == 4:
+        return int(term)
+    return None
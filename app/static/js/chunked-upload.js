@@ -0,0 +1,157 @@
+(() => {
+  const forms = document.querySelectorAll('form[data-chunked-upload]');
+  if (!forms.length || !window.fetch || !window.Blob || !Blob.prototype.slice) return;
+
+  const MAX_ATTEMPTS = 8;
+  const STORAGE_PREFIX = 'carga:';
+
+  const sleep = (ms) => new Promise((resolve) => window.setTimeout(resolve, ms));
+
+  // crypto.subtle solo existe en contextos seguros (https o localhost); sin él
+  // las partes viajan sin suma y el servidor confía en el desplazamiento.
+  const sha256Hex = async (buffer) => {
+    if (!window.crypto || !window.crypto.subtle) return null;
+    const digest = await window.crypto.subtle.digest('SHA-256', buffer);
+    return Array.from(new Uint8Array(digest), (b) => b.toString(16).padStart(2, '0')).join('');
+  };
+
+  const request = async (url, options = {}) => {
+    const response = await fetch(url, {
+      credentials: 'same-origin',
+      ...options,
+      headers: { Accept: 'application/json', ...(options.headers || {}) },
+    });
+    let data = {};
+    try {
+      data = await response.json();
+    } catch (error) {
+      // Respuesta sin JSON (proxy, sesión vencida): se trata por el código HTTP
+    }
+    return { status: response.status, ok: response.ok, data };
+  };
+
+  // Reintenta errores de red y 5xx con espera exponencial; los 4xx se devuelven
+  const withRetry = async (fn) => {
+    for (let attempt = 1; ; attempt += 1) {
+      try {
+        const result = await fn();
+        if (result.status < 500 || attempt >= MAX_ATTEMPTS) return result;
+      } catch (error) {
+        if (attempt >= MAX_ATTEMPTS) throw error;
+      }
+      await sleep(Math.min(30000, 500 * 2 ** attempt));
+    }
+  };
+
+  const fileKey = (baseUrl, file) => `${STORAGE_PREFIX}${baseUrl}:${file.name}:${file.size}:${file.lastModified}`;
+
+  forms.forEach((form) => {
+    const input = form.querySelector('input[type="file"]');
+    const button = form.querySelector('button');
+    const baseUrl = form.dataset.chunkedUpload;
+    if (!input || !baseUrl) return;
+
+    const status = document.createElement('div');
+    status.className = 'mt-2 d-none';
+    status.innerHTML = `
+      <div class="progress" role="progressbar" aria-valuemin="0" aria-valuemax="100">
+        <div class="progress-bar" style="width: 0%"></div>
+      </div>
+      <div class="form-text" data-upload-label></div>`;
+    form.appendChild(status);
+    const bar = status.querySelector('.progress-bar');
+    const label = status.querySelector('[data-upload-label]');
+
+    const report = (text, percent) => {
+      status.classList.remove('d-none');
+      label.textContent = text;
+      if (percent !== undefined) {
+        bar.style.width = `${percent}%`;
+        status.querySelector('.progress').setAttribute('aria-valuenow', Math.round(percent));
+      }
+    };
+
+    // Retoma una carga anterior del mismo archivo si el servidor todavía la tiene
+    const openUpload = async (file) => {
+      const key = fileKey(baseUrl, file);
+      const previous = window.localStorage.getItem(key);
+      if (previous) {
+        const result = await withRetry(() => request(`${baseUrl}/${previous}`));
+        if (result.ok) return result.data;
+        window.localStorage.removeItem(key);
+      }
+      const result = await withRetry(() => request(baseUrl, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ filename: file.name, size: file.size }),
+      }));
+      if (!result.ok) throw new Error(result.data.error || `HTTP ${result.status}`);
+      window.localStorage.setItem(key, result.data.upload_id);
+      return result.data;
+    };
+
+    const uploadFile = async (file, index, total) => {
+      const upload = await openUpload(file);
+      const uploadUrl = `${baseUrl}/${upload.upload_id}`;
+      const chunkSize = upload.chunk_size;
+      let offset = upload.received;
+      let corrupted = 0;
+      const prefix = total > 1 ? `(${index + 1}/${total}) ` : '';
+
+      while (offset < file.size) {
+        report(`${prefix}${file.name}: ${Math.floor((offset / file.size) * 100)}%`, (offset / file.size) * 100);
+        const buffer = await file.slice(offset, offset + chunkSize).arrayBuffer();
+        const checksum = await sha256Hex(buffer);
+        const headers = { 'Content-Type': 'application/octet-stream' };
+        if (checksum) headers['X-Chunk-Sha256'] = checksum;
+        const result = await withRetry(() => request(`${uploadUrl}?offset=${offset}`, {
+          method: 'PUT',
+          headers,
+          body: buffer,
+        }));
+        if (result.ok) {
+          offset = result.data.received;
+          corrupted = 0;
+        } else if (result.status === 409 && typeof result.data.received === 'number') {
+          // El servidor tiene otra cantidad (parte repetida o perdida): seguir desde ahí
+          offset = result.data.received;
+        } else if (result.status === 422) {
+          // Suma no coincide: la parte se corrompió en el camino, se reenvía
+          corrupted += 1;
+          if (corrupted >= MAX_ATTEMPTS) throw new Error(result.data.error);
+        } else {
+          throw new Error(result.data.error || `HTTP ${result.status}`);
+        }
+      }
+
+      report(`${prefix}${file.name}: verificando…`, 100);
+      const result = await withRetry(() => request(`${uploadUrl}/completar`, { method: 'POST' }));
+      if (!result.ok) throw new Error(result.data.error || `HTTP ${result.status}`);
+      window.localStorage.removeItem(fileKey(baseUrl, file));
+    };
+
+    form.addEventListener('submit', async (event) => {
+      const files = Array.from(input.files || []);
+      if (!files.length) return;
+      event.preventDefault();
+      input.disabled = true;
+      if (button) button.disabled = true;
+      const errors = [];
+      for (let i = 0; i < files.length; i += 1) {
+        try {
+          await uploadFile(files[i], i, files.length);
+        } catch (error) {
+          errors.push(`${files[i].name}: ${error.message}`);
+        }
+      }
+      if (errors.length) {
+        report(`No se pudieron subir: ${errors.join('; ')}. Volvé a intentar para reanudar.`);
+        bar.classList.add('bg-danger');
+        input.disabled = false;
+        if (button) button.disabled = false;
+        return;
+      }
+      window.location.reload();
+    });
+  });
+})();
@@ -0,0 +1,188 @@
+(() => {
+  const pickers = document.querySelectorAll('[data-client-picker]');
+  if (!pickers.length) return;
+
+  const debounce = (fn, delay) => {
+    let timerId;
+    return (...args) => {
+      window.clearTimeout(timerId);
+      timerId = window.setTimeout(() => fn.apply(null, args), delay);
+    };
+  };
+
+  const escapeHtml = (value) => String(value ?? '').replace(/[&<>"']/g, (ch) => ({
+    '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;',
+  })[ch]);
+
+  pickers.forEach((picker) => {
+    const valueInput = picker.querySelector('[data-picker-value]');
+    const textInput = picker.querySelector('[data-picker-input]');
+    const menu = picker.querySelector('[data-picker-menu]');
+    const lookupUrl = picker.dataset.lookupUrl;
+    const required = textInput.hasAttribute('data-picker-required');
+    // Respuestas ya pedidas en esta página: borrar y volver a escribir no consulta de nuevo
+    const responses = new Map();
+    let controller = null;
+    let currentQuery = null;
+    let nextPage = null;
+    let activeIndex = -1;
+    let selectedName = textInput.value;
+
+    const setValidity = () => {
+      if (!required) return;
+      textInput.setCustomValidity(valueInput.value ? '' : 'Seleccioná un cliente de la lista.');
+    };
+
+    const items = () => Array.from(menu.querySelectorAll('[data-picker-option]'));
+
+    const open = () => {
+      menu.classList.add('show');
+      textInput.setAttribute('aria-expanded', 'true');
+    };
+
+    const close = () => {
+      menu.classList.remove('show');
+      textInput.setAttribute('aria-expanded', 'false');
+      activeIndex = -1;
+    };
+
+    const highlight = (index) => {
+      const options = items();
+      if (!options.length) return;
+      activeIndex = (index + options.length) % options.length;
+      options.forEach((option, i) => option.classList.toggle('active', i === activeIndex));
+      options[activeIndex].scrollIntoView({ block: 'nearest' });
+    };
+
+    const select = (id, nombre) => {
+      valueInput.value = id;
+      textInput.value = nombre;
+      selectedName = nombre;
+      setValidity();
+      close();
+      valueInput.dispatchEvent(new Event('change', { bubbles: true }));
+    };
+
+    const render = (data, append) => {
+      if (!append) {
+        menu.innerHTML = '';
+        activeIndex = -1;
+      }
+      const more = menu.querySelector('[data-picker-more]');
+      if (more) more.remove();
+      if (!data.items.length && !append) {
+        menu.innerHTML = '<span class="dropdown-item-text text-muted small">Sin coincidencias</span>';
+      }
+      data.items.forEach((item) => {
+        menu.insertAdjacentHTML(
+          'beforeend',
+          `<button type="button" class="dropdown-item" data-picker-option data-id="${item.id}" data-nombre="${escapeHtml(item.nombre)}">
+            ${escapeHtml(item.nombre)}
+            ${item.cedula ? `<small class="text-muted ms-1">${escapeHtml(item.cedula)}</small>` : ''}
+          </button>`,
+        );
+      });
+      nextPage = data.has_more ? data.page + 1 : null;
+      if (nextPage) {
+        menu.insertAdjacentHTML(
+          'beforeend',
+          '<button type="button" class="dropdown-item text-primary small" data-picker-more>Ver más…</button>',
+        );
+      }
+      open();
+    };
+
+    const fetchPage = (query, page) => {
+      const url = new URL(lookupUrl, window.location.origin);
+      if (query) url.searchParams.set('q', query);
+      url.searchParams.set('page', page);
+      const cacheKey = url.search;
+      if (responses.has(cacheKey)) {
+        return Promise.resolve(responses.get(cacheKey));
+      }
+      if (controller) controller.abort();
+      controller = new AbortController();
+      return fetch(url, { headers: { Accept: 'application/json' }, signal: controller.signal })
+        .then((response) => {
+          if (!response.ok) throw new Error(`HTTP ${response.status}`);
+          return response.json();
+        })
+        .then((data) => {
+          responses.set(cacheKey, data);
+          return data;
+        })
+        .finally(() => {
+          controller = null;
+        });
+    };
+
+    const search = (page = 1) => {
+      const query = textInput.value.trim();
+      const append = page > 1;
+      currentQuery = query;
+      fetchPage(query, page)
+        .then((data) => {
+          // Descarta respuestas de un texto que ya cambió
+          if (query === currentQuery) render(data, append);
+        })
+        .catch((error) => {
+          if (error.name !== 'AbortError') console.error('Client lookup error:', error);
+        });
+    };
+
+    const debouncedSearch = debounce(() => search(1), 250);
+
+    textInput.addEventListener('input', () => {
+      if (textInput.value !== selectedName && valueInput.value) {
+        valueInput.value = '';
+        valueInput.dispatchEvent(new Event('change', { bubbles: true }));
+      }
+      setValidity();
+      debouncedSearch();
+    });
+
+    textInput.addEventListener('focus', () => {
+      if (!valueInput.value) search(1);
+    });
+
+    textInput.addEventListener('keydown', (event) => {
+      if (event.key === 'ArrowDown') {
+        event.preventDefault();
+        if (!menu.classList.contains('show')) search(1);
+        else highlight(activeIndex + 1);
+      } else if (event.key === 'ArrowUp') {
+        event.preventDefault();
+        highlight(activeIndex - 1);
+      } else if (event.key === 'Enter' && menu.classList.contains('show') && activeIndex >= 0) {
+        event.preventDefault();
+        const option = items()[activeIndex];
+        select(option.dataset.id, option.dataset.nombre);
+      } else if (event.key === 'Escape') {
+        close();
+      }
+    });
+
+    // mousedown en lugar de click: se procesa antes de que el input pierda el foco
+    menu.addEventListener('mousedown', (event) => {
+      const option = event.target.closest('[data-picker-option]');
+      const more = event.target.closest('[data-picker-more]');
+      if (!option && !more) return;
+      event.preventDefault();
+      if (option) {
+        select(option.dataset.id, option.dataset.nombre);
+      } else if (nextPage) {
+        search(nextPage);
+      }
+    });
+
+    textInput.addEventListener('blur', () => {
+      window.setTimeout(close, 100);
+      if (!textInput.value.trim() && valueInput.value) {
+        valueInput.value = '';
+        valueInput.dispatchEvent(new Event('change', { bubbles: true }));
+      }
+    });
+
+    setValidity();
+  });
+})();
@@ -0,0 +1,253 @@
+(() => {
+  const container = document.querySelector('[data-client-tree]');
+  if (!container || !window.fetch || !window.history.pushState) return;
+
+  const treeUrl = container.dataset.treeUrl;
+  let treePromise = null;
+
+  const loadTree = () => {
+    if (!treePromise) {
+      // no-cache: el navegador revalida con el ETag y suele recibir un 304
+      treePromise = fetch(treeUrl, { cache: 'no-cache', headers: { Accept: 'application/json' } })
+        .then((response) => {
+          if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+          }
+          return response.json();
+        })
+        .catch((error) => {
+          treePromise = null;
+          throw error;
+        });
+    }
+    return treePromise;
+  };
+
+  const escapeHtml = (value) => String(value ?? '').replace(/[&<>"']/g, (ch) => ({
+    '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;',
+  })[ch]);
+
+  const plural = (count) => `${count} proyecto${count !== 1 ? 's' : ''}`;
+
+  const createProjectUrl = (tree, params) => {
+    const url = new URL(tree.nuevo_proyecto_url, window.location.origin);
+    url.searchParams.set('id_cliente', tree.cliente.id);
+    Object.entries(params).forEach(([key, value]) => url.searchParams.set(key, value));
+    return url.pathname + url.search;
+  };
+
+  const contactLine = (cliente) => `
+    ${escapeHtml(cliente.cedula || 'Sin cédula')} · ${escapeHtml(cliente.telefono || 'Sin teléfono')} · ${escapeHtml(cliente.correo || 'Sin correo')}`;
+
+  const emptyState = (title, hint, createUrl) => `
+    <div class="alert alert-light border text-muted">
+      <div class="d-flex align-items-center gap-2">
+        <i class="bi bi-info-circle fs-4"></i>
+        <div>
+          <strong>${escapeHtml(title)}</strong>
+          <div>${escapeHtml(hint)}</div>
+        </div>
+      </div>
+      <div class="mt-3">
+        <a href="${escapeHtml(createUrl)}" class="btn btn-primary">
+          <i class="bi bi-plus-lg"></i> Crear proyecto
+        </a>
+      </div>
+    </div>`;
+
+  // Cada nivel replica el marcado de su plantilla (instituciones.html,
+  // institucion_detalle.html y periodos.html). Solo se reemplaza la parte
+  // que cambia entre niveles; nombre del cliente y botones fijos quedan.
+  const renderers = {
+    modulos(tree) {
+      const createUrl = createProjectUrl(tree, {});
+      const logo = `
+        <div class="bg-light rounded-circle d-flex align-items-center justify-content-center" style="width:60px;height:60px;">
+          <i class="bi bi-people fs-3 text-secondary"></i>
+        </div>`;
+      const header = `
+        <div class="text-muted small">${contactLine(tree.cliente)}</div>
+        <div class="text-muted small">Total de proyectos: <strong>${tree.total}</strong></div>`;
+      const { cliente } = tree;
+      const actions = `
+        <a href="${escapeHtml(cliente.listado_url)}" class="btn btn-outline-secondary btn-sm">
+          <i class="bi bi-arrow-left"></i> Listado de clientes
+        </a>
+        ${cliente.ubicacion_gps ? `
+        <a href="${escapeHtml(cliente.ubicacion_gps)}" target="_blank" rel="noopener" class="btn btn-outline-primary btn-sm">
+          <i class="bi bi-geo-alt"></i> Ver mapa
+        </a>` : ''}
+        <a href="${escapeHtml(cliente.ficha_url)}" class="btn btn-outline-secondary btn-sm">
+          <i class="bi bi-card-text"></i> Ver ficha
+        </a>
+        <a href="${escapeHtml(cliente.editar_url)}" class="btn btn-outline-secondary btn-sm">
+          <i class="bi bi-pencil-square"></i> Editar cliente
+        </a>
+        <a href="${escapeHtml(createUrl)}" class="btn btn-primary btn-sm">
+          <i class="bi bi-plus-circle"></i> Crear proyecto
+        </a>`;
+      const cards = tree.modulos.map((modulo) => `
+        <div class="col-md-4 col-xl-3">
+          <a href="${escapeHtml(modulo.url)}" class="text-decoration-none" data-tree-nav data-level="subtipos" data-inst="${escapeHtml(modulo.key)}">
+            <div class="card h-100 shadow-sm border-0 module-card">
+              <div class="card-body text-center py-4">
+                <div class="mb-3">
+                  <img src="${escapeHtml(modulo.logo)}" alt="${escapeHtml(modulo.label)}" class="img-fluid" style="max-height:70px;">
+                </div>
+                <h5 class="fw-semibold mb-1 text-uppercase">${escapeHtml(modulo.label)}</h5>
+                <p class="text-muted small mb-2">${escapeHtml(modulo.full_name)}</p>
+                <span class="badge bg-primary-subtle text-primary border border-primary-subtle">${plural(modulo.count)}</span>
+              </div>
+            </div>
+          </a>
+        </div>`).join('');
+      const body = tree.modulos.length
+        ? `<div class="row g-3">${cards}</div>`
+        : emptyState(
+          'Este cliente aún no tiene proyectos registrados.',
+          'Creá el primer proyecto para habilitar sus módulos.',
+          createUrl,
+        );
+      return { logo, header, actions, body };
+    },
+
+    subtipos(tree, inst) {
+      const modulo = tree.modulos.find((item) => item.key === inst);
+      if (!modulo) return null;
+      const createUrl = createProjectUrl(tree, { institucion: modulo.key });
+      const logo = `
+        <img src="${escapeHtml(modulo.logo)}" alt="${escapeHtml(modulo.label)}" class="rounded shadow-sm" style="height:64px;">`;
+      const header = `
+        <div class="text-muted small">${escapeHtml(modulo.full_name)} · ${escapeHtml(modulo.label)}</div>
+        <div class="text-muted small">${contactLine(tree.cliente)}</div>`;
+      const actions = `
+        <a href="${escapeHtml(tree.cliente.url)}" class="btn btn-outline-secondary btn-sm" data-tree-nav data-level="modulos">
+          <i class="bi bi-arrow-left"></i> Volver a módulos
+        </a>
+        <a href="${escapeHtml(createUrl)}" class="btn btn-primary btn-sm">
+          <i class="bi bi-plus-circle"></i> Crear proyecto en ${escapeHtml(modulo.label)}
+        </a>`;
+      const cards = modulo.subtipos.map((subtipo) => `
+        <div class="col-md-4 col-lg-3">
+          <a href="${escapeHtml(subtipo.url)}" class="text-decoration-none" data-tree-nav data-level="anhos" data-inst="${escapeHtml(modulo.key)}" data-subtipo="${escapeHtml(subtipo.name)}">
+            <div class="card h-100 shadow-sm border-0 subtipo-card">
+              <div class="card-body text-center py-4">
+                <div class="rounded-circle bg-primary-subtle text-primary d-inline-flex align-items-center justify-content-center mb-3" style="width:64px;height:64px;">
+                  <i class="bi bi-folder-fill fs-3"></i>
+                </div>
+                <h6 class="fw-semibold text-uppercase mb-1">${escapeHtml(subtipo.name)}</h6>
+                <p class="text-muted small mb-2">Proyectos en este submódulo</p>
+                <span class="badge bg-primary">${plural(subtipo.count)}</span>
+              </div>
+            </div>
+          </a>
+        </div>`).join('');
+      const body = modulo.subtipos.length
+        ? `<div class="row g-3">${cards}</div>`
+        : emptyState(
+          `Aún no hay subtipos registrados en ${modulo.label} para este cliente.`,
+          'Creá un proyecto para habilitar los submódulos.',
+          createUrl,
+        );
+      return { logo, header, actions, body };
+    },
+
+    anhos(tree, inst, subtipoName) {
+      const modulo = tree.modulos.find((item) => item.key === inst);
+      if (!modulo) return null;
+      const subtipo = modulo.subtipos.find((item) => item.name === subtipoName)
+        || { name: subtipoName, anhos: [] };
+      const createUrl = createProjectUrl(tree, { institucion: modulo.key, subtipo: subtipo.name });
+      const logo = `
+        <img src="${escapeHtml(modulo.logo)}" alt="${escapeHtml(modulo.label)}" class="rounded shadow-sm" style="height:60px;">`;
+      const header = `
+        <div class="text-muted small">${escapeHtml(modulo.full_name)} · ${escapeHtml(modulo.label)}</div>
+        <div class="text-muted small">Submódulo: <strong>${escapeHtml(subtipo.name)}</strong></div>`;
+      const actions = `
+        <a href="${escapeHtml(modulo.url)}" class="btn btn-outline-secondary btn-sm" data-tree-nav data-level="subtipos" data-inst="${escapeHtml(modulo.key)}">
+          <i class="bi bi-arrow-left"></i> Volver a subtipos
+        </a>
+        <a href="${escapeHtml(createUrl)}" class="btn btn-primary btn-sm">
+          <i class="bi bi-plus-circle"></i> Crear proyecto
+        </a>`;
+      const cards = subtipo.anhos.map((anho) => `
+        <div class="col-md-4 col-lg-3">
+          <a href="${escapeHtml(anho.url)}" class="text-decoration-none">
+            <div class="card h-100 year-card shadow-sm border-0">
+              <div class="card-body text-center py-4">
+                <div class="rounded-circle bg-primary-subtle text-primary d-inline-flex align-items-center justify-content-center mb-3" style="width:64px;height:64px;">
+                  <i class="bi bi-calendar-check fs-3"></i>
+                </div>
+                <h5 class="fw-semibold mb-1">Año ${anho.anho}</h5>
+                <p class="text-muted small mb-0">Ver proyectos de ${escapeHtml(subtipo.name)}</p>
+              </div>
+            </div>
+          </a>
+        </div>`).join('');
+      const body = subtipo.anhos.length
+        ? `<div class="row g-3">${cards}</div>`
+        : emptyState(
+          `No hay proyectos registrados en ${subtipo.name} para este cliente.`,
+          'Creá un proyecto para iniciar el historial de años.',
+          createUrl,
+        );
+      return { logo, header, actions, body };
+    },
+  };
+
+  const regions = {
+    logo: container.querySelector('[data-tree-logo]'),
+    header: container.querySelector('[data-tree-header]'),
+    actions: container.querySelector('[data-tree-actions]'),
+    body: container.querySelector('[data-tree-body]'),
+  };
+
+  const render = (tree, state) => {
+    const renderer = renderers[state.level];
+    const html = renderer && renderer(tree, state.inst, state.subtipo);
+    if (!html) return false;
+    Object.entries(regions).forEach(([name, element]) => {
+      if (element) element.innerHTML = html[name];
+    });
+    window.scrollTo({ top: 0 });
+    return true;
+  };
+
+  const initialState = {
+    level: container.dataset.level,
+    inst: container.dataset.inst,
+    subtipo: container.dataset.subtipo,
+  };
+  window.history.replaceState({ clientTree: initialState }, '', window.location.href);
+
+  container.addEventListener('click', (event) => {
+    const link = event.target.closest('a[data-tree-nav]');
+    if (!link || event.defaultPrevented || event.button !== 0
+      || event.metaKey || event.ctrlKey || event.shiftKey || event.altKey) {
+      return;
+    }
+    event.preventDefault();
+    const state = { level: link.dataset.level, inst: link.dataset.inst, subtipo: link.dataset.subtipo };
+    loadTree()
+      .then((tree) => {
+        if (!render(tree, state)) throw new Error('Nivel desconocido');
+        window.history.pushState({ clientTree: state }, '', link.href);
+      })
+      .catch(() => {
+        window.location.href = link.href;
+      });
+  });
+
+  window.addEventListener('popstate', (event) => {
+    const state = event.state && event.state.clientTree;
+    if (!state) return;
+    loadTree()
+      .then((tree) => {
+        if (!render(tree, state)) window.location.reload();
+      })
+      .catch(() => window.location.reload());
+  });
+
+  // Se precarga para que el primer clic ya no espere al servidor
+  loadTree().catch(() => {});
+})();
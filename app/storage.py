@@ -0,0 +1,607 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import shutil
+import tempfile
+import zipfile
+from urllib.parse import quote
+from uuid import uuid4
+
+from flask import current_app, redirect, request, send_file
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+from werkzeug.datastructures import ContentRange
+from werkzeug.wsgi import wrap_file
+
+from .extensions import db
+from .models import Blob, DocumentoCliente, DocumentoProyecto
+
+try:
+    import boto3
+    from botocore.exceptions import ClientError
+except ImportError:  # Solo hace falta con STORAGE_BACKEND=s3
+    boto3 = None
+    ClientError = Exception
+
+logger = logging.getLogger(__name__)
+
+# Los blobs viven en <raíz del almacenamiento>/_blobs/ab/cd/<sha256>
+BLOB_FOLDER = '_blobs'
+# Copias locales de objetos remotos (miniaturas, etc.); se pueden borrar
+CACHE_FOLDER = '_cache'
+# Cargas en curso y archivos recién recibidos: siempre en el disco local de
+# este servidor, aunque el backend sea remoto
+STAGING_FOLDER = '_cargas'
+CHUNK_SIZE = 1024 * 1024
+
+_RELEASED_BLOBS = '_blobs_liberados'
+_PLACED_BLOBS = '_blobs_colocados'
+
+
+# --- Backends -----------------------------------------------------------------
+#
+# Las claves son rutas relativas con '/' (las mismas que guarda archivo_url),
+# así una base migrada de disco a S3 no cambia ningún valor.
+
+class LocalStorage:
+    """Archivos bajo UPLOAD_FOLDER en el disco de este servidor."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def exists(self, key):
+        return os.path.exists(self.path(key))
+
+    def save_file(self, key, source_path, move=False):
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if move:
+            os.replace(source_path, target)
+            return
+        # Enlace duro si se puede; si no, copia. Siempre con reemplazo atómico
+        tmp_target = f'{target}.{uuid4().hex}.tmp'
+        try:
+            os.link(source_path, tmp_target)
+        except OSError:
+            shutil.copyfile(source_path, tmp_target)
+        os.replace(tmp_target, target)
+
+    def open(self, key):
+        return open(self.path(key), 'rb')
+
+    def delete(self, key):
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            pass
+
+    def local_copy(self, key):
+        path = self.path(key)
+        return path if os.path.exists(path) else None
+
+    def download_url(self, key, download_name, as_attachment, mimetype=None):
+        # Se sirve desde Flask
+        return None
+
+
+class S3Storage:
+    """Bucket S3 o compatible (MinIO, etc. vía ``endpoint_url``)."""
+
+    def __init__(self, bucket, prefix='', cache_root=None, presign_expires=300, client=None,
+                 **client_options):
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError('STORAGE_BACKEND=s3 requiere el paquete boto3')
+            client = boto3.client('s3', **client_options)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.cache_root = cache_root
+        self.presign_expires = presign_expires
+
+    def object_key(self, key):
+        return posixpath.join(self.prefix, key) if self.prefix else key
+
+    def head(self, key):
+        """Metadatos del objeto (ContentLength, ETag, ...); None si no existe."""
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+        except ClientError as exc:
+            if getattr(exc, 'response', {}).get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, key):
+        return self.head(key) is not None
+
+    def save_file(self, key, source_path, move=False):
+        # upload_file parte los archivos grandes en multipart y lee por bloques
+        self.client.upload_file(source_path, self.bucket, self.object_key(key))
+        if move:
+            os.remove(source_path)
+
+    def open(self, key, byte_range=None):
+        """Cuerpo del objeto; ``byte_range`` (inicio, fin exclusivo) lee solo esa parte."""
+        params = {'Bucket': self.bucket, 'Key': self.object_key(key)}
+        if byte_range is not None:
+            params['Range'] = f'bytes={byte_range[0]}-{byte_range[1] - 1}'
+        return self.client.get_object(**params)['Body']
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+        if self.cache_root:
+            # La copia en caché ya no corresponde a ningún objeto
+            try:
+                os.remove(os.path.join(self.cache_root, *key.split('/')))
+            except FileNotFoundError:
+                pass
+
+    def local_copy(self, key):
+        """Descarga el objeto a la caché local (una vez) y devuelve la ruta."""
+        target = os.path.join(self.cache_root, *key.split('/'))
+        if os.path.exists(target):
+            return target
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_target = f'{target}.{uuid4().hex}.tmp'
+        try:
+            self.client.download_file(self.bucket, self.object_key(key), tmp_target)
+        except ClientError:
+            if os.path.exists(tmp_target):
+                os.remove(tmp_target)
+            return None
+        os.replace(tmp_target, target)
+        return target
+
+    def download_url(self, key, download_name, as_attachment, mimetype=None):
+        if not self.presign_expires:
+            # Sin URLs firmadas: se transmite a través de Flask
+            return None
+        disposition = 'attachment' if as_attachment else 'inline'
+        params = {
+            'Bucket': self.bucket,
+            'Key': self.object_key(key),
+            'ResponseContentDisposition': _content_disposition(disposition, download_name),
+        }
+        if mimetype:
+            params['ResponseContentType'] = mimetype
+        return self.client.generate_presigned_url(
+            'get_object', Params=params, ExpiresIn=self.presign_expires
+        )
+
+
+def _content_disposition(disposition, filename):
+    ascii_name = filename.encode('ascii', 'ignore').decode('ascii').replace('"', '') or 'archivo'
+    return f"{disposition}; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(filename)}"
+
+
+def build_storage(app):
+    config = app.config
+    backend = config.get('STORAGE_BACKEND', 'local')
+    root = upload_root(app)
+    if backend == 'local':
+        return LocalStorage(root)
+    if backend == 's3':
+        options = {
+            key: config.get(name)
+            for key, name in (
+                ('endpoint_url', 'S3_ENDPOINT_URL'),
+                ('region_name', 'S3_REGION'),
+            )
+            if config.get(name)
+        }
+        return S3Storage(
+            config['S3_BUCKET'],
+            prefix=config.get('S3_PREFIX', ''),
+            cache_root=os.path.join(root, CACHE_FOLDER),
+            presign_expires=config.get('S3_PRESIGN_EXPIRES', 300),
+            **options,
+        )
+    raise RuntimeError(f'STORAGE_BACKEND desconocido: {backend}')
+
+
+def get_storage():
+    """Backend configurado para la app actual (uno por proceso)."""
+    extensions = current_app.extensions
+    if 'storage' not in extensions:
+        extensions['storage'] = build_storage(current_app)
+    return extensions['storage']
+
+
+def storage_for(key):
+    """Backend que guarda ``key``."""
+    if key.startswith(STAGING_FOLDER + '/'):
+        return LocalStorage(upload_root())
+    return get_storage()
+
+
+# --- Rutas --------------------------------------------------------------------
+
+def upload_root(app=None):
+    """Carpeta local de subidas: backend local, staging y cachés."""
+    app = app or current_app
+    base_upload = app.config.get('UPLOAD_FOLDER', 'uploads')
+    if not os.path.isabs(base_upload):
+        base_upload = os.path.join(app.root_path, base_upload)
+    os.makedirs(base_upload, exist_ok=True)
+    return base_upload
+
+
+def storage_key(stored_path):
+    """Clave del backend para un ``archivo_url`` (None si queda fuera de UPLOAD_FOLDER).
+
+    Los documentos anteriores pueden guardar rutas absolutas; si están dentro
+    de UPLOAD_FOLDER se traducen a su ruta relativa.
+    """
+    if not stored_path:
+        return None
+    if os.path.isabs(stored_path):
+        relative = os.path.relpath(stored_path, upload_root())
+        if relative.startswith(os.pardir):
+            return None
+        stored_path = relative
+    return '/'.join(os.path.normpath(stored_path).split(os.sep))
+
+
+def absolute_path(stored_path):
+    """Ruta en disco local de un ``archivo_url`` (descargándolo si el backend es remoto)."""
+    if not stored_path:
+        return None
+    key = storage_key(stored_path)
+    if key is None:
+        # Ruta absoluta heredada fuera de UPLOAD_FOLDER
+        return stored_path if os.path.exists(stored_path) else None
+    return storage_for(key).local_copy(key)
+
+
+def blob_path(sha256):
+    """Clave del blob: dos niveles de 256 carpetas por prefijo del hash."""
+    return posixpath.join(BLOB_FOLDER, sha256[:2], sha256[2:4], sha256)
+
+
+def is_blob_path(stored_path):
+    # Un blob puede estar compartido: nunca se borra por ruta, solo por referencias
+    return bool(stored_path) and os.path.normpath(stored_path).startswith(BLOB_FOLDER + os.sep)
+
+
+def hash_file(path):
+    """(sha256, tamaño) de un archivo leyendo por bloques."""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as source:
+        for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+# Firmas al comienzo del archivo; los ZIP se miran por dentro (docx/xlsx también lo son)
+_MAGIC_NUMBERS = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+    (b'Rar!\x1a\x07', 'application/vnd.rar'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/msword'),
+    # Código de archivo 9994 (big endian) de la cabecera de un .shp
+    (b'\x00\x00\x27\x0a', 'application/x-esri-shape'),
+)
+_OOXML_TYPES = (
+    ('word/', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    ('xl/', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+)
+
+
+def sniff_mimetype(path):
+    """Tipo MIME según el contenido (bytes mágicos); None si no se reconoce."""
+    with open(path, 'rb') as source:
+        head = source.read(16)
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    for magic, mimetype in _MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return mimetype
+    if head.startswith(b'PK\x03\x04'):
+        try:
+            with zipfile.ZipFile(path) as archive:
+                names = archive.namelist()
+        except zipfile.BadZipFile:
+            return None
+        if '[Content_Types].xml' in names:
+            for folder, mimetype in _OOXML_TYPES:
+                if any(name.startswith(folder) for name in names):
+                    return mimetype
+        return 'application/zip'
+    return None
+
+
+def delete_stored(stored_path):
+    """Borra un archivo que no es blob (documentos anteriores al almacén por contenido)."""
+    if not stored_path or is_blob_path(stored_path):
+        return
+    key = storage_key(stored_path)
+    try:
+        if key is None:
+            if os.path.exists(stored_path):
+                os.remove(stored_path)
+        else:
+            storage_for(key).delete(key)
+    except Exception:
+        logger.warning('No se pudo borrar %s', stored_path, exc_info=True)
+
+
+def send_stored(stored_path, download_name, as_attachment, mimetype=None):
+    """Respuesta de descarga: redirección a URL firmada si el backend la da.
+
+    Devuelve None si el archivo no existe.
+    """
+    key = storage_key(stored_path)
+    if key is not None:
+        storage = storage_for(key)
+        url = storage.download_url(key, download_name, as_attachment, mimetype)
+        if url:
+            return redirect(url)
+        if not isinstance(storage, LocalStorage):
+            return _send_object(storage, key, download_name, as_attachment, mimetype)
+    resolved = absolute_path(stored_path)
+    if not resolved:
+        return None
+    return deliver_file(resolved, mimetype=mimetype, as_attachment=as_attachment, download_name=download_name)
+
+
+def _send_object(storage, key, download_name, as_attachment, mimetype):
+    # Sin URL firmada el objeto pasa por Flask. Un Range simple se reenvía al
+    # backend (solo se lee esa parte) para que las descargas se puedan
+    # reanudar igual que desde el disco; varios rangos reciben el archivo entero.
+    info = storage.head(key)
+    if info is None:
+        return None
+    length = info['ContentLength']
+    etag = (info.get('ETag') or '').strip('"')
+    byte_range = None
+    status = 200
+    # If-Range por fecha no se compara: se responde el archivo entero
+    if_range = request.if_range
+    if request.range and if_range.date is None and if_range.etag in (None, etag):
+        if len(request.range.ranges) == 1:
+            byte_range = request.range.range_for_length(length)
+            if byte_range is None:
+                response = current_app.response_class(status=416)
+                response.content_range = ContentRange('bytes', None, None, length)
+                return response
+            status = 206
+    body = storage.open(key, byte_range)
+    response = current_app.response_class(
+        wrap_file(request.environ, body),
+        status=status,
+        mimetype=mimetype or mimetypes.guess_type(download_name)[0] or 'application/octet-stream',
+        direct_passthrough=True,
+    )
+    response.headers['Content-Disposition'] = _content_disposition(
+        'attachment' if as_attachment else 'inline', download_name
+    )
+    response.accept_ranges = 'bytes'
+    if byte_range is None:
+        response.content_length = length
+    else:
+        start, stop = byte_range
+        response.content_length = stop - start
+        response.content_range = ContentRange('bytes', start, stop, length)
+    if etag:
+        response.set_etag(etag)
+    return response
+
+
+def deliver_file(path, mimetype=None, as_attachment=False, download_name=None, max_age=None):
+    """Respuesta para un archivo del disco local según FILE_DELIVERY.
+
+    - ``flask``: se transmite desde el proceso (send_file atiende Range).
+    - ``x-accel``: Flask ya autorizó; nginx entrega X_ACCEL_PREFIX + clave
+      desde una location ``internal`` y resuelve Range/If-Range él mismo.
+    - ``x-sendfile``: cabecera X-Sendfile de Flask (USE_X_SENDFILE), para
+      Apache/lighttpd.
+
+    Lo que no está bajo UPLOAD_FOLDER no tiene ruta interna y se transmite
+    desde el proceso.
+    """
+    download_name = download_name or os.path.basename(path)
+    if current_app.config.get('FILE_DELIVERY') == 'x-accel':
+        key = storage_key(path)
+        if key is not None:
+            response = current_app.response_class()
+            prefix = current_app.config.get('X_ACCEL_PREFIX', '/protected-uploads/').rstrip('/')
+            response.headers['X-Accel-Redirect'] = f'{prefix}/{quote(key)}'
+            # Los blobs no tienen extensión: nginx no puede deducir el tipo
+            response.headers['Content-Type'] = (
+                mimetype or mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+            )
+            response.headers['Content-Disposition'] = _content_disposition(
+                'attachment' if as_attachment else 'inline', download_name
+            )
+            if max_age is not None:
+                response.cache_control.max_age = max_age
+            return response
+    return send_file(
+        path,
+        mimetype=mimetype,
+        as_attachment=as_attachment,
+        download_name=download_name,
+        max_age=max_age,
+    )
+
+
+# --- Alta de blobs ------------------------------------------------------------
+
+def _upsert_blob(connection, sha256, size, referencias=0):
+    # ON CONFLICT DO UPDATE (y no DO NOTHING) para tomar el lock de la fila:
+    # una purga concurrente del mismo hash espera a este commit y vuelve a
+    # ver las referencias antes de borrar.
+    tabla = Blob.__table__
+    dialect = postgresql if connection.dialect.name == 'postgresql' else sqlite
+    stmt = dialect.insert(tabla).values(sha256=sha256, tamano=size, referencias=referencias)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['sha256'],
+        set_={'referencias': tabla.c.referencias + referencias},
+    )
+    connection.execute(stmt)
+
+
+def place_blob(source_path, sha256, size, move=False):
+    """Registra el blob y deja su contenido en el backend bajo la clave por hash.
+
+    El archivo se (re)coloca siempre después del upsert, aunque ya exista: así
+    una purga que borró el archivo antes de que este commit la desbloquee no
+    deja la fila sin contenido. ``move`` consume ``source_path``; si no, se
+    enlaza o copia. Si la transacción se revierte, el archivo se descarta
+    salvo que otra fila confirmada ya lo use (ver ``_discard_placed_blobs``).
+    """
+    _upsert_blob(db.session.connection(), sha256, size)
+    db.session.info.setdefault(_PLACED_BLOBS, {})[sha256] = size
+    key = blob_path(sha256)
+    get_storage().save_file(key, source_path, move=move)
+    return key
+
+
+def store_upload(file_storage):
+    """Guarda un FileStorage por contenido. Devuelve (sha256, clave).
+
+    El hash se calcula mientras se copia a un temporal local, sin leer el
+    archivo dos veces ni cargarlo entero en memoria. Las referencias las suma
+    el documento que apunte al blob al insertarse.
+    """
+    staging = os.path.join(upload_root(), BLOB_FOLDER, 'tmp')
+    os.makedirs(staging, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=staging, delete=False) as tmp:
+        try:
+            for chunk in iter(lambda: file_storage.stream.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+                tmp.write(chunk)
+                size += len(chunk)
+        except BaseException:
+            tmp.close()
+            os.remove(tmp.name)
+            raise
+    sha256 = digest.hexdigest()
+    try:
+        return sha256, place_blob(tmp.name, sha256, size, move=True)
+    except BaseException:
+        if os.path.exists(tmp.name):
+            os.remove(tmp.name)
+        raise
+
+
+def store_file(path, sha256=None, size=None, move=False):
+    """Guarda por contenido un archivo que ya está en disco. Devuelve (sha256, clave).
+
+    Si quien llama ya calculó el hash (p. ej. al verificar una carga por
+    partes) se evita leer el archivo otra vez.
+    """
+    if sha256 is None or size is None:
+        sha256, size = hash_file(path)
+    return sha256, place_blob(path, sha256, size, move=move)
+
+
+# --- Conteo de referencias ----------------------------------------------------
+
+def _adjust_references(connection, sha256, delta):
+    tabla = Blob.__table__
+    connection.execute(
+        tabla.update().where(tabla.c.sha256 == sha256).values(referencias=tabla.c.referencias + delta)
+    )
+
+
+def _release(connection, target, sha256):
+    _adjust_references(connection, sha256, -1)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_RELEASED_BLOBS, set()).add(sha256)
+
+
+def _documento_alta(mapper, connection, target):
+    if target.sha256:
+        _adjust_references(connection, target.sha256, 1)
+
+
+def _documento_cambio(mapper, connection, target):
+    history = db.inspect(target).attrs.sha256.history
+    if not history.has_changes():
+        return
+    for old in history.deleted:
+        if old:
+            _release(connection, target, old)
+    if target.sha256:
+        _adjust_references(connection, target.sha256, 1)
+
+
+def _documento_baja(mapper, connection, target):
+    if target.sha256:
+        _release(connection, target, target.sha256)
+
+
+for _modelo in (DocumentoProyecto, DocumentoCliente):
+    event.listen(_modelo, 'after_insert', _documento_alta)
+    event.listen(_modelo, 'after_update', _documento_cambio)
+    # before_delete: con la fila todavía presente se puede cargar sha256 si
+    # el documento vino con load_only
+    event.listen(_modelo, 'before_delete', _documento_baja)
+
+
+@event.listens_for(Session, 'after_commit')
+def _purge_released_blobs(session):
+    session.info.pop(_PLACED_BLOBS, None)
+    shas = session.info.pop(_RELEASED_BLOBS, None)
+    if shas:
+        try:
+            purge_unreferenced(shas)
+        except Exception:
+            # El commit ya ocurrió: un blob huérfano lo levanta la próxima purga
+            logger.exception('No se pudieron purgar blobs sin referencias')
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_released_blobs(session):
+    session.info.pop(_RELEASED_BLOBS, None)
+    placed = session.info.pop(_PLACED_BLOBS, None)
+    if placed:
+        try:
+            _discard_placed_blobs(placed)
+        except Exception:
+            logger.exception('No se pudieron descartar blobs de una transacción revertida')
+
+
+def _discard_placed_blobs(placed):
+    # La fila del blob se fue con el rollback pero el archivo quedó colocado.
+    # Se vuelve a dar de alta sin referencias (con el mismo lock que un alta
+    # normal) y la purga decide: si otra transacción ya lo confirmó con
+    # referencias, el archivo se queda.
+    with db.engine.begin() as connection:
+        for sha256, size in placed.items():
+            _upsert_blob(connection, sha256, size)
+    purge_unreferenced(placed)
+
+
+def purge_unreferenced(shas=None):
+    """Borra filas y archivos de blobs sin referencias; devuelve cuántos.
+
+    Corre en su propia transacción. Los archivos se borran antes del commit,
+    mientras las filas siguen bloqueadas: un alta concurrente del mismo hash
+    espera y vuelve a colocar el archivo después (ver ``place_blob``).
+    """
+    tabla = Blob.__table__
+    stmt = tabla.delete().where(tabla.c.referencias <= 0)
+    if shas is not None:
+        stmt = stmt.where(tabla.c.sha256.in_(list(shas)))
+    storage = get_storage()
+    with db.engine.begin() as connection:
+        purged = connection.execute(stmt.returning(tabla.c.sha256)).scalars().all()
+        for sha256 in purged:
+            storage.delete(blob_path(sha256))
+    return len(purged)
@@ -0,0 +1,288 @@
+"""Recepción de archivos: cargas por partes y spool de formularios multipart.
+
+Cada carga por partes en curso es una carpeta de UPLOAD_FOLDER/_cargas con
+``meta.json`` y ``data`` (las partes recibidas, una detrás de otra). El
+cliente pregunta cuántos bytes llegaron y sigue desde ahí, así un corte de
+conexión solo obliga a reenviar la parte en vuelo.
+
+Los archivos de un formulario multipart se escriben directamente en
+UPLOAD_FOLDER/_cargas/spool mientras Werkzeug lee el cuerpo; la vista los
+toma de ahí sin volver a copiarlos (ver ``spool_upload``).
+"""
+import hashlib
+import json
+import mimetypes
+import os
+import re
+import shutil
+import tempfile
+import time
+from uuid import uuid4
+
+from flask import Request, current_app
+
+from .storage import CHUNK_SIZE, STAGING_FOLDER, hash_file, sniff_mimetype, upload_root
+
+SPOOL_FOLDER = 'spool'
+# Tamaño de parte que se le sugiere al cliente y máximo aceptado por pedido
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+MAX_CHUNK_SIZE = 16 * 1024 * 1024
+CHUNKED_UPLOAD_MAX_BYTES = 2 * 1024 * 1024 * 1024
+# Cargas sin actividad por más de esto se descartan
+STAGING_TTL = 24 * 3600
+# Un lock más viejo que esto quedó de un proceso que murió escribiendo
+_LOCK_STALE_SECONDS = 120
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(Exception):
+    """Pedido inválido dentro del protocolo; ``status`` es el código HTTP."""
+
+    def __init__(self, message, status=400, received=None):
+        super().__init__(message)
+        self.status = status
+        self.received = received
+
+
+class StagedUpload:
+    """Carga completa en staging, lista para pasar al almacén."""
+
+    __slots__ = ('upload_id', 'path', 'filename', 'mimetype', 'sha256', 'size', 'meta')
+
+    def __init__(self, upload_id, path, filename, mimetype, sha256, size, meta):
+        self.upload_id = upload_id
+        self.path = path
+        self.filename = filename
+        self.mimetype = mimetype
+        self.sha256 = sha256
+        self.size = size
+        self.meta = meta
+
+
+def _staging_root():
+    root = os.path.join(upload_root(), STAGING_FOLDER)
+    os.makedirs(root, exist_ok=True)
+    return root
+
+
+def _upload_dir(upload_id):
+    if not upload_id or not _UPLOAD_ID.match(upload_id):
+        raise UploadError('Carga inexistente', status=404)
+    return os.path.join(_staging_root(), upload_id)
+
+
+def _max_bytes():
+    return current_app.config.get('CHUNKED_UPLOAD_MAX_BYTES', CHUNKED_UPLOAD_MAX_BYTES)
+
+
+def create_upload(owner, filename, size, **meta):
+    """Abre una carga nueva y devuelve su id."""
+    if not filename:
+        raise UploadError('Falta el nombre del archivo')
+    if size is None or size < 0:
+        raise UploadError('Tamaño inválido')
+    if size > _max_bytes():
+        raise UploadError('El archivo supera el tamaño máximo permitido', status=413)
+    purge_stale_uploads()
+    upload_id = uuid4().hex
+    folder = os.path.join(_staging_root(), upload_id)
+    os.makedirs(folder)
+    open(os.path.join(folder, 'data'), 'wb').close()
+    with open(os.path.join(folder, 'meta.json'), 'w', encoding='utf-8') as fh:
+        json.dump({'owner': owner, 'filename': filename, 'size': size, **meta}, fh)
+    return upload_id
+
+
+def load_upload(upload_id, owner):
+    """Metadatos de la carga; 404 si no existe o es de otro usuario."""
+    folder = _upload_dir(upload_id)
+    try:
+        with open(os.path.join(folder, 'meta.json'), encoding='utf-8') as fh:
+            meta = json.load(fh)
+    except (OSError, ValueError):
+        raise UploadError('Carga inexistente', status=404)
+    if meta.get('owner') != owner:
+        raise UploadError('Carga inexistente', status=404)
+    return meta
+
+
+def received_bytes(upload_id):
+    try:
+        return os.path.getsize(os.path.join(_upload_dir(upload_id), 'data'))
+    except OSError:
+        raise UploadError('Carga inexistente', status=404)
+
+
+def _acquire_lock(folder):
+    lock = os.path.join(folder, 'lock')
+    try:
+        return os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY), lock
+    except FileExistsError:
+        try:
+            stale = time.time() - os.path.getmtime(lock) > _LOCK_STALE_SECONDS
+        except OSError:
+            stale = True
+        if not stale:
+            raise UploadError('Otra parte de esta carga se está escribiendo', status=409)
+        try:
+            os.remove(lock)
+        except OSError:
+            pass
+        return os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY), lock
+
+
+def append_chunk(upload_id, owner, offset, data, checksum=None):
+    """Agrega ``data`` en ``offset`` y devuelve los bytes recibidos.
+
+    La parte se verifica contra ``checksum`` (SHA-256 hex) antes de tocar el
+    archivo. Un ``offset`` que no coincide con lo recibido responde 409 con el
+    valor correcto: el cliente reintenta desde ahí (parte repetida o perdida).
+    """
+    meta = load_upload(upload_id, owner)
+    if meta.get('resultado'):
+        raise UploadError('La carga ya se completó', status=409, received=meta['size'])
+    if len(data) > MAX_CHUNK_SIZE:
+        raise UploadError('Parte demasiado grande', status=413)
+    if checksum and hashlib.sha256(data).hexdigest() != checksum.lower():
+        raise UploadError('La suma de verificación de la parte no coincide', status=422)
+
+    folder = _upload_dir(upload_id)
+    fd, lock = _acquire_lock(folder)
+    try:
+        path = os.path.join(folder, 'data')
+        received = os.path.getsize(path)
+        if offset != received:
+            raise UploadError('Desplazamiento incorrecto', status=409, received=received)
+        if received + len(data) > meta['size']:
+            raise UploadError('La parte excede el tamaño declarado', status=413, received=received)
+        with open(path, 'ab') as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        return received + len(data)
+    finally:
+        os.close(fd)
+        os.remove(lock)
+
+
+def finish_upload(upload_id, owner, sha256=None):
+    """Verifica que la carga esté completa y la devuelve como StagedUpload.
+
+    El hash del archivo entero se calcula acá una sola vez; si el cliente
+    mandó el suyo, tiene que coincidir.
+    """
+    meta = load_upload(upload_id, owner)
+    received = received_bytes(upload_id)
+    if received != meta['size']:
+        raise UploadError('La carga está incompleta', status=409, received=received)
+    path = os.path.join(_upload_dir(upload_id), 'data')
+    digest, size = hash_file(path)
+    if sha256 and digest != sha256.lower():
+        raise UploadError('La suma de verificación del archivo no coincide', status=422)
+    filename = meta['filename']
+    mimetype = (
+        sniff_mimetype(path) or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    )
+    return StagedUpload(upload_id, path, filename, mimetype, digest, size, meta)
+
+
+def record_result(upload_id, **result):
+    """Anota en meta.json lo que produjo la carga (p. ej. el documento creado).
+
+    Se anota antes del commit: si la respuesta de ``completar`` se pierde, el
+    reintento encuentra el resultado en vez de registrar el archivo otra vez.
+    Quien lo lee tiene que verificar que se haya confirmado.
+    """
+    path = os.path.join(_upload_dir(upload_id), 'meta.json')
+    with open(path, encoding='utf-8') as fh:
+        meta = json.load(fh)
+    meta['resultado'] = result
+    tmp_path = f'{path}.{uuid4().hex}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh)
+    os.replace(tmp_path, path)
+
+
+def release_upload_data(upload_id):
+    """Borra las partes de una carga ya registrada.
+
+    meta.json queda (con su resultado) hasta que ``purge_stale_uploads`` lo
+    descarte, para responder a un ``completar`` repetido.
+    """
+    try:
+        os.remove(os.path.join(_upload_dir(upload_id), 'data'))
+    except FileNotFoundError:
+        pass
+
+
+def discard_upload(upload_id):
+    shutil.rmtree(_upload_dir(upload_id), ignore_errors=True)
+
+
+def purge_stale_uploads():
+    """Descarta cargas abandonadas (sin partes nuevas en STAGING_TTL)."""
+    root = _staging_root()
+    limit = time.time() - current_app.config.get('CHUNKED_UPLOAD_TTL', STAGING_TTL)
+    for entry in os.scandir(root):
+        if not entry.is_dir() or not _UPLOAD_ID.match(entry.name):
+            continue
+        try:
+            last_activity = os.path.getmtime(os.path.join(entry.path, 'data'))
+        except OSError:
+            last_activity = entry.stat().st_mtime
+        if last_activity < limit:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+# --- Spool de formularios multipart --------------------------------------------
+
+def _spool_dir():
+    folder = os.path.join(_staging_root(), SPOOL_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    return folder
+
+
+class SpoolingRequest(Request):
+    """Request que escribe cada archivo del formulario en el spool del disco.
+
+    Werkzeug guarda en memoria los archivos chicos y el resto en temporales
+    anónimos; acá todos van a un temporal con nombre en UPLOAD_FOLDER, que se
+    borra solo al cerrarse salvo que la vista lo tome con ``spool_upload``.
+    MAX_CONTENT_LENGTH corta el cuerpo completo y MAX_FORM_MEMORY_SIZE los
+    campos de texto, así la memoria por pedido queda acotada.
+    """
+
+    @property
+    def max_form_memory_size(self):
+        return current_app.config.get('MAX_FORM_MEMORY_SIZE')
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None,
+                         content_length=None):
+        return tempfile.NamedTemporaryFile(dir=_spool_dir(), suffix='.part')
+
+
+def spool_upload(file_storage):
+    """Deja el archivo subido en el spool bajo un nombre propio y devuelve la ruta.
+
+    Si Werkzeug ya lo escribió en el spool se enlaza (sin copiar); si no, se
+    copia por bloques.
+    """
+    target = os.path.join(_spool_dir(), uuid4().hex)
+    source = getattr(file_storage.stream, 'name', None)
+    if isinstance(source, str) and os.path.dirname(source) == _spool_dir():
+        try:
+            os.link(source, target)
+            return target
+        except OSError:
+            pass
+    file_storage.stream.seek(0)
+    with open(target, 'wb') as spooled:
+        try:
+            for chunk in iter(lambda: file_storage.stream.read(CHUNK_SIZE), b''):
+                spooled.write(chunk)
+        except BaseException:
+            spooled.close()
+            os.remove(target)
+            raise
+    return target
@@ -1,20 +1,148 @@
-from datetime import date, timedelta
-from flask import Blueprint, render_template, request
+import calendar
+from datetime import date, datetime, timedelta
+from flask import Blueprint, jsonify, render_template, request, url_for
 from flask_login import login_required
+from sqlalchemy import func
+from ..cache import conditional_view
+from ..extensions import db
 from ..models import Vencimiento, Cliente
+from ..read_models import VencimientoFila
 
 bp = Blueprint('vencimientos', __name__)
 
+PAGE_SIZE = 50
+
+
+def _parse_mes(value):
+    """'YYYY-MM' → primer día del mes (None si no es válido)."""
+    try:
+        return datetime.strptime(value or '', '%Y-%m').date()
+    except ValueError:
+        return None
+
+
+def _parse_fecha(value):
+    try:
+        return datetime.strptime(value or '', '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def _mes_siguiente(inicio):
+    return date(inicio.year + inicio.month // 12, inicio.month % 12 + 1, 1)
+
+
+def _en_rango(query, desde, hasta):
+    # Rango semiabierto [desde, hasta): vale para meses de cualquier largo y
+    # compara fechas contra la columna indexada, sin funciones sobre ella
+    return query.filter(
+        Vencimiento.fecha_vencimiento >= desde,
+        Vencimiento.fecha_vencimiento < hasta,
+    )
+
+
+def _conteo_por_dia(desde, hasta, cliente_id=None):
+    """{fecha: cantidad} de vencimientos en [desde, hasta), en una sola consulta agrupada."""
+    query = _en_rango(
+        db.session.query(Vencimiento.fecha_vencimiento, func.count(Vencimiento.id_vencimiento)),
+        desde,
+        hasta,
+    )
+    if cliente_id:
+        query = query.filter(Vencimiento.id_cliente == cliente_id)
+    return dict(query.group_by(Vencimiento.fecha_vencimiento).all())
+
+
 @bp.route('/')
 @login_required
+@conditional_view('vencimiento', 'cliente')
 def list_vencimientos():
     mes = request.args.get('mes')
-    cliente_id = request.args.get('cliente_id')
-    query = Vencimiento.query
-    if mes:
-        query = query.filter(Vencimiento.fecha_vencimiento.between(f'{mes}-01', f'{mes}-31'))
+    cliente_id = request.args.get('cliente_id', type=int)
+    dia = _parse_fecha(request.args.get('dia'))
+    page = max(request.args.get('page', type=int, default=1), 1)
+    inicio = _parse_mes(mes)
+    if inicio is None:
+        mes = None
+
+    query = (
+        db.session.query(*VencimientoFila.columns())
+        .select_from(Vencimiento)
+        .outerjoin(Vencimiento.cliente)
+    )
+    if dia:
+        query = _en_rango(query, dia, dia + timedelta(days=1))
+    elif inicio:
+        query = _en_rango(query, inicio, _mes_siguiente(inicio))
+    cliente = None
     if cliente_id:
-        query = query.filter_by(id_cliente=cliente_id)
-    vencs = query.order_by(Vencimiento.fecha_vencimiento.asc()).all()
-    clientes = Cliente.query.order_by(Cliente.nombre_razon_social.asc()).all()
-    return render_template('vencimientos/list.html', vencimientos=vencs, clientes=clientes)
+        query = query.filter(Vencimiento.id_cliente == cliente_id)
+        cliente = db.session.get(Cliente, cliente_id)
+
+    pagination = query.order_by(
+        Vencimiento.fecha_vencimiento.asc(), Vencimiento.id_vencimiento.asc()
+    ).paginate(page=page, per_page=PAGE_SIZE, error_out=False)
+    pagination.items = VencimientoFila.from_rows(pagination.items)
+
+    semanas = conteos = None
+    if inicio:
+        conteos = _conteo_por_dia(inicio, _mes_siguiente(inicio), cliente_id)
+        semanas = calendar.Calendar().monthdatescalendar(inicio.year, inicio.month)
+
+    filtros = {'mes': mes, 'cliente_id': cliente_id, 'dia': dia.isoformat() if dia else None}
+
+    def _build_url(**extra):
+        params = {k: v for k, v in {**filtros, **extra}.items() if v is not None}
+        return url_for('vencimientos.list_vencimientos', **params)
+
+    return render_template(
+        'vencimientos/list.html',
+        vencimientos=pagination.items,
+        pagination=pagination,
+        mes=mes,
+        inicio=inicio,
+        dia=dia,
+        cliente=cliente,
+        semanas=semanas,
+        conteos=conteos,
+        build_url=_build_url,
+    )
+
+
+@bp.route('/calendario')
+@login_required
+@conditional_view('vencimiento')
+def calendario():
+    """Cantidad de vencimientos por día de un mes (``mes``) o de una semana (``semana``)."""
+    cliente_id = request.args.get('cliente_id', type=int)
+    semana = _parse_fecha(request.args.get('semana'))
+    if semana:
+        vista = 'semana'
+        desde = semana - timedelta(days=semana.weekday())
+        hasta = desde + timedelta(days=7)
+    else:
+        vista = 'mes'
+        desde = _parse_mes(request.args.get('mes')) or date.today().replace(day=1)
+        hasta = _mes_siguiente(desde)
+
+    conteos = _conteo_por_dia(desde, hasta, cliente_id)
+    dias = []
+    for offset in range((hasta - desde).days):
+        fecha = desde + timedelta(days=offset)
+        total = conteos.get(fecha, 0)
+        dias.append({
+            'fecha': fecha.isoformat(),
+            'total': total,
+            'url': url_for(
+                'vencimientos.list_vencimientos',
+                dia=fecha.isoformat(),
+                cliente_id=cliente_id,
+            ) if total else None,
+        })
+    return jsonify({
+        'vista': vista,
+        'desde': desde.isoformat(),
+        'hasta': hasta.isoformat(),
+        'total': sum(conteos.values()),
+        'dias': dias,
+    })
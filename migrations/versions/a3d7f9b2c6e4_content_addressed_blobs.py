@@ -0,0 +1,40 @@
+"""content-addressed blob table shared by project and client documents
+
+Revision ID: a3d7f9b2c6e4
+Revises: f7c3a1e5d2b8
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d7f9b2c6e4'
+down_revision = 'f7c3a1e5d2b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'blob',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('tamano', sa.BigInteger(), nullable=False),
+        sa.Column('referencias', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('sha256'),
+    )
+    for table in ('documento_proyecto', 'documento_cliente'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.add_column(sa.Column('sha256', sa.String(length=64), nullable=True))
+            batch_op.create_foreign_key(f'fk_{table}_blob', 'blob', ['sha256'], ['sha256'])
+            batch_op.create_index(f'ix_{table}_sha256', ['sha256'])
+
+
+def downgrade():
+    for table in ('documento_cliente', 'documento_proyecto'):
+        with op.batch_alter_table(table) as batch_op:
+            batch_op.drop_index(f'ix_{table}_sha256')
+            batch_op.drop_constraint(f'fk_{table}_blob', type_='foreignkey')
+            batch_op.drop_column('sha256')
+    op.drop_table('blob')
@@ -0,0 +1,41 @@
+"""unique notification per vencimiento and threshold
+
+Revision ID: a7c3e9f1d5b2
+Revises: f2a8c4d6e1b3
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9f1d5b2'
+down_revision = 'f2a8c4d6e1b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Conservar solo el primer aviso de cada (vencimiento, umbral)
+    op.execute(
+        text(
+            """
+            DELETE FROM notificacion
+            WHERE id_notificacion NOT IN (
+                SELECT MIN(id_notificacion)
+                FROM notificacion
+                GROUP BY id_vencimiento, tipo
+            )
+            """
+        )
+    )
+    op.create_unique_constraint(
+        'uq_notificacion_vencimiento_tipo',
+        'notificacion',
+        ['id_vencimiento', 'tipo'],
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_notificacion_vencimiento_tipo', 'notificacion', type_='unique')
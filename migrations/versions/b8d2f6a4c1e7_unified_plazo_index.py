@@ -0,0 +1,160 @@
+"""unified deadline table (plazo) for vencimientos and licences
+
+Revision ID: b8d2f6a4c1e7
+Revises: a7c3e9f1d5b2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8d2f6a4c1e7'
+down_revision = 'a7c3e9f1d5b2'
+branch_labels = None
+depends_on = None
+
+
+def _normalize(value):
+    # Copia de app.search.normalize_search_text: la migración no depende de la app
+    if not value:
+        return None
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split()) or None
+
+
+def _clave(titulo, subtipo):
+    return _normalize(' '.join(filter(None, (titulo, subtipo))))
+
+
+def _backfill(bind):
+    plazos = []
+    vencimientos = bind.execute(
+        text(
+            'SELECT id_vencimiento, id_cliente, tipo_documento, fecha_vencimiento, estado '
+            'FROM vencimiento WHERE fecha_vencimiento IS NOT NULL'
+        )
+    ).fetchall()
+    for row in vencimientos:
+        plazos.append({
+            'origen': 'vencimiento',
+            'id_origen': row.id_vencimiento,
+            'fecha': row.fecha_vencimiento,
+            'id_cliente': row.id_cliente,
+            'id_proyecto': None,
+            'titulo': row.tipo_documento,
+            'subtipo': None,
+            'estado': row.estado,
+            'clave_busqueda': _clave(row.tipo_documento, None),
+        })
+
+    proyectos = bind.execute(
+        text(
+            'SELECT id_proyecto, id_cliente, nombre_proyecto, institucion, anho, subtipo, '
+            'estado, fecha_vencimiento_licencia FROM proyecto '
+            'WHERE fecha_vencimiento_licencia IS NOT NULL'
+        )
+    ).fetchall()
+    for row in proyectos:
+        titulo = row.nombre_proyecto or f"{row.institucion or ''} {row.anho or ''}".strip()
+        plazos.append({
+            'origen': 'licencia',
+            'id_origen': row.id_proyecto,
+            'fecha': row.fecha_vencimiento_licencia,
+            'id_cliente': row.id_cliente,
+            'id_proyecto': row.id_proyecto,
+            'titulo': titulo,
+            'subtipo': row.subtipo,
+            'estado': row.estado,
+            'clave_busqueda': _clave(titulo, row.subtipo),
+        })
+
+    if plazos:
+        bind.execute(
+            text(
+                'INSERT INTO plazo (origen, id_origen, fecha, id_cliente, id_proyecto, titulo, '
+                'subtipo, estado, clave_busqueda) VALUES (:origen, :id_origen, :fecha, '
+                ':id_cliente, :id_proyecto, :titulo, :subtipo, :estado, :clave_busqueda)'
+            ),
+            plazos,
+        )
+
+
+def upgrade():
+    op.create_table(
+        'plazo',
+        sa.Column('id_plazo', sa.Integer(), nullable=False),
+        sa.Column('origen', sa.String(length=20), nullable=False),
+        sa.Column('id_origen', sa.Integer(), nullable=False),
+        sa.Column('fecha', sa.Date(), nullable=False),
+        sa.Column('id_cliente', sa.Integer(), nullable=True),
+        sa.Column('id_proyecto', sa.Integer(), nullable=True),
+        sa.Column('titulo', sa.String(length=255), nullable=True),
+        sa.Column('subtipo', sa.String(length=100), nullable=True),
+        sa.Column('estado', sa.String(length=50), nullable=True),
+        sa.Column('clave_busqueda', sa.String(length=400), nullable=True),
+        sa.ForeignKeyConstraint(['id_cliente'], ['cliente.id_cliente']),
+        sa.ForeignKeyConstraint(['id_proyecto'], ['proyecto.id_proyecto']),
+        sa.PrimaryKeyConstraint('id_plazo'),
+        sa.UniqueConstraint('origen', 'id_origen', name='uq_plazo_origen'),
+    )
+    op.create_index('ix_plazo_fecha', 'plazo', ['fecha'])
+
+    bind = op.get_bind()
+    _backfill(bind)
+    if bind.dialect.name == 'postgresql':
+        op.create_index(
+            'ix_plazo_clave_busqueda_trgm',
+            'plazo',
+            ['clave_busqueda'],
+            postgresql_using='gin',
+            postgresql_ops={'clave_busqueda': 'gin_trgm_ops'},
+        )
+
+    # Los avisos pasan a referenciar el plazo en lugar del vencimiento
+    op.add_column('notificacion', sa.Column('id_plazo', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_notificacion_plazo',
+        'notificacion',
+        'plazo',
+        ['id_plazo'],
+        ['id_plazo'],
+        ondelete='SET NULL',
+    )
+    op.execute(
+        text(
+            """
+            UPDATE notificacion SET id_plazo = (
+                SELECT plazo.id_plazo FROM plazo
+                WHERE plazo.origen = 'vencimiento'
+                  AND plazo.id_origen = notificacion.id_vencimiento
+            )
+            """
+        )
+    )
+    op.drop_constraint('uq_notificacion_vencimiento_tipo', 'notificacion', type_='unique')
+    op.create_unique_constraint(
+        'uq_notificacion_plazo_tipo',
+        'notificacion',
+        ['id_plazo', 'tipo'],
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_notificacion_plazo_tipo', 'notificacion', type_='unique')
+    op.create_unique_constraint(
+        'uq_notificacion_vencimiento_tipo',
+        'notificacion',
+        ['id_vencimiento', 'tipo'],
+    )
+    op.drop_constraint('fk_notificacion_plazo', 'notificacion', type_='foreignkey')
+    op.drop_column('notificacion', 'id_plazo')
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_plazo_clave_busqueda_trgm', table_name='plazo')
+    op.drop_index('ix_plazo_fecha', table_name='plazo')
+    op.drop_table('plazo')
@@ -0,0 +1,68 @@
+"""indexes for the access paths used by the routes
+
+Revision ID: c5e1a9d3f7b6
+Revises: b8d2f6a4c1e7
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e1a9d3f7b6'
+down_revision = 'b8d2f6a4c1e7'
+branch_labels = None
+depends_on = None
+
+
+# (nombre, tabla, columnas o expresiones)
+INDEXES = [
+    # clientes.modulos / modulo_subtipos / modulo_subtipo_anhos y proyectos.board
+    ('ix_proyecto_cliente_modulo', 'proyecto', ['id_cliente', 'institucion', 'subtipo', 'anho']),
+    # Vencimientos de licencias
+    ('ix_proyecto_fecha_vencimiento_licencia', 'proyecto', ['fecha_vencimiento_licencia']),
+    # Claves de orden func.lower(...) de proyectos.index
+    ('ix_proyecto_institucion_lower', 'proyecto', [sa.text('lower(institucion)')]),
+    ('ix_proyecto_subtipo_lower', 'proyecto', [sa.text('lower(subtipo)')]),
+    ('ix_proyecto_nombre_lower', 'proyecto', [sa.text('lower(nombre_proyecto)')]),
+    ('ix_cliente_nombre_lower', 'cliente', [sa.text('lower(nombre_razon_social)')]),
+    # Documentos de proyectos.vista / editar, del más reciente al más antiguo
+    ('ix_documento_proyecto_proyecto_fecha', 'documento_proyecto', ['id_proyecto', 'uploaded_at']),
+    ('ix_vencimiento_fecha_vencimiento', 'vencimiento', ['fecha_vencimiento']),
+    ('ix_documento_cliente_cliente', 'documento_cliente', ['id_cliente']),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns)
+        return
+    # CREATE INDEX CONCURRENTLY no bloquea escrituras pero no puede correr
+    # dentro de una transacción. Si una creación se interrumpe queda un índice
+    # INVALID que hay que borrar a mano antes de re-ejecutar.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name,
+                table,
+                columns,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table)
+        return
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
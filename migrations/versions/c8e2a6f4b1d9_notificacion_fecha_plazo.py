@@ -0,0 +1,61 @@
+"""include the deadline date in the notification identity
+
+Revision ID: c8e2a6f4b1d9
+Revises: a3d7f9b2c6e4
+Create Date: 2026-10-18 19:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e2a6f4b1d9'
+down_revision = 'a3d7f9b2c6e4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('notificacion', sa.Column('fecha_plazo', sa.Date(), nullable=True))
+    # Los avisos ya enviados corresponden a la fecha vigente de su plazo
+    op.execute(
+        sa.text(
+            """
+            UPDATE notificacion SET fecha_plazo = (
+                SELECT plazo.fecha FROM plazo
+                WHERE plazo.id_plazo = notificacion.id_plazo
+            )
+            """
+        )
+    )
+    op.drop_constraint('uq_notificacion_plazo_tipo', 'notificacion', type_='unique')
+    op.create_unique_constraint(
+        'uq_notificacion_plazo_tipo_fecha',
+        'notificacion',
+        ['id_plazo', 'tipo', 'fecha_plazo'],
+    )
+
+
+def downgrade():
+    op.drop_constraint('uq_notificacion_plazo_tipo_fecha', 'notificacion', type_='unique')
+    # Sin la fecha, solo puede quedar un aviso por plazo y umbral
+    op.execute(
+        sa.text(
+            """
+            DELETE FROM notificacion
+            WHERE id_plazo IS NOT NULL AND id_notificacion NOT IN (
+                SELECT MAX(id_notificacion)
+                FROM notificacion
+                WHERE id_plazo IS NOT NULL
+                GROUP BY id_plazo, tipo
+            )
+            """
+        )
+    )
+    op.create_unique_constraint(
+        'uq_notificacion_plazo_tipo',
+        'notificacion',
+        ['id_plazo', 'tipo'],
+    )
+    op.drop_column('notificacion', 'fecha_plazo')
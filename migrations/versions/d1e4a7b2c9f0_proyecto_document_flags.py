@@ -0,0 +1,27 @@
+"""add persisted document flags and hero document to proyecto
+
+Revision ID: d1e4a7b2c9f0
+Revises: c4b9215bd3a2
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd1e4a7b2c9f0'
+down_revision = 'c4b9215bd3a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('proyecto', sa.Column('doc_flags', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('proyecto', sa.Column('hero_documento_id', sa.Integer(), nullable=True))
+    # Los valores existentes se completan con `flask backfill-documentos`.
+
+
+def downgrade():
+    op.drop_column('proyecto', 'hero_documento_id')
+    op.drop_column('proyecto', 'doc_flags')
@@ -0,0 +1,74 @@
+"""proyecto_resumen rollup for the client drill-down
+
+Revision ID: d9b4e2c6a8f1
+Revises: c5e1a9d3f7b6
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9b4e2c6a8f1'
+down_revision = 'c5e1a9d3f7b6'
+branch_labels = None
+depends_on = None
+
+
+def _subtipo(value):
+    # Copia de app.models.resumen_subtipo: la migración no depende de la app
+    nombre = (value or '').strip()
+    if not nombre or nombre.lower() == 'otros':
+        return 'Otros'
+    return nombre
+
+
+def _backfill(bind):
+    rows = bind.execute(
+        text(
+            'SELECT id_cliente, institucion, subtipo, anho, estado, COUNT(*) AS cantidad '
+            'FROM proyecto WHERE id_cliente IS NOT NULL '
+            'GROUP BY id_cliente, institucion, subtipo, anho, estado'
+        )
+    ).fetchall()
+    grupos = {}
+    for row in rows:
+        clave = (row.id_cliente, row.institucion or 'Otros', _subtipo(row.subtipo), row.anho or 0)
+        grupo = grupos.setdefault(clave, {'total': 0, 'en_proceso': 0, 'licencia_emitida': 0})
+        grupo['total'] += row.cantidad
+        estado = row.estado if row.estado == 'licencia_emitida' else 'en_proceso'
+        grupo[estado] += row.cantidad
+    if grupos:
+        bind.execute(
+            text(
+                'INSERT INTO proyecto_resumen (id_cliente, institucion, subtipo, anho, total, '
+                'en_proceso, licencia_emitida) VALUES (:id_cliente, :institucion, :subtipo, '
+                ':anho, :total, :en_proceso, :licencia_emitida)'
+            ),
+            [
+                dict(zip(('id_cliente', 'institucion', 'subtipo', 'anho'), clave), **conteos)
+                for clave, conteos in grupos.items()
+            ],
+        )
+
+
+def upgrade():
+    op.create_table(
+        'proyecto_resumen',
+        sa.Column('id_cliente', sa.Integer(), nullable=False),
+        sa.Column('institucion', sa.String(length=100), nullable=False),
+        sa.Column('subtipo', sa.String(length=100), nullable=False),
+        sa.Column('anho', sa.Integer(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('en_proceso', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('licencia_emitida', sa.Integer(), nullable=False, server_default='0'),
+        sa.ForeignKeyConstraint(['id_cliente'], ['cliente.id_cliente']),
+        sa.PrimaryKeyConstraint('id_cliente', 'institucion', 'subtipo', 'anho'),
+    )
+    _backfill(op.get_bind())
+
+
+def downgrade():
+    op.drop_table('proyecto_resumen')
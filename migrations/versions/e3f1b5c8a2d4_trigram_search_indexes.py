@@ -0,0 +1,49 @@
+"""trigram search indexes for clientes and proyectos
+
+Revision ID: e3f1b5c8a2d4
+Revises: d1e4a7b2c9f0
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3f1b5c8a2d4'
+down_revision = 'd1e4a7b2c9f0'
+branch_labels = None
+depends_on = None
+
+
+TRGM_INDEXES = [
+    ('ix_cliente_nombre_trgm', 'cliente', 'nombre_razon_social'),
+    ('ix_cliente_cedula_trgm', 'cliente', 'cedula_identidad'),
+    ('ix_cliente_correo_trgm', 'cliente', 'correo_electronico'),
+    ('ix_cliente_telefono_trgm', 'cliente', 'telefono'),
+    ('ix_proyecto_nombre_trgm', 'proyecto', 'nombre_proyecto'),
+    ('ix_proyecto_subtipo_trgm', 'proyecto', 'subtipo'),
+    ('ix_proyecto_institucion_trgm', 'proyecto', 'institucion'),
+]
+
+
+def upgrade():
+    # Los índices GIN con gin_trgm_ops permiten resolver ILIKE '%q%' sin
+    # recorrer la tabla completa.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for name, table, column in TRGM_INDEXES:
+        op.create_index(
+            name,
+            table,
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for name, table, _ in reversed(TRGM_INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,29 @@
+"""data_version counters for the fragment cache
+
+Revision ID: e6a8c2f4b9d3
+Revises: d9b4e2c6a8f1
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e6a8c2f4b9d3'
+down_revision = 'd9b4e2c6a8f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        'data_version',
+        sa.Column('tabla', sa.String(length=63), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('tabla'),
+    )
+
+
+def downgrade():
+    op.drop_table('data_version')
@@ -0,0 +1,110 @@
+"""accent-insensitive search key columns
+
+Revision ID: f2a8c4d6e1b3
+Revises: e3f1b5c8a2d4
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import text
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8c4d6e1b3'
+down_revision = 'e3f1b5c8a2d4'
+branch_labels = None
+depends_on = None
+
+
+KEY_INDEXES = [
+    ('ix_cliente_nombre_busqueda_trgm', 'cliente', 'nombre_busqueda'),
+    ('ix_proyecto_nombre_busqueda_trgm', 'proyecto', 'nombre_busqueda'),
+    ('ix_proyecto_subtipo_busqueda_trgm', 'proyecto', 'subtipo_busqueda'),
+]
+# Reemplazados por los índices sobre las claves normalizadas
+REPLACED_INDEXES = [
+    ('ix_cliente_nombre_trgm', 'cliente', 'nombre_razon_social'),
+    ('ix_proyecto_nombre_trgm', 'proyecto', 'nombre_proyecto'),
+    ('ix_proyecto_subtipo_trgm', 'proyecto', 'subtipo'),
+]
+
+
+def _normalize(value):
+    # Copia de app.search.normalize_search_text: la migración no depende de la app
+    if not value:
+        return None
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(stripped.casefold().split()) or None
+
+
+def _backfill(bind):
+    clientes = bind.execute(text('SELECT id_cliente, nombre_razon_social FROM cliente')).fetchall()
+    if clientes:
+        bind.execute(
+            text('UPDATE cliente SET nombre_busqueda = :clave WHERE id_cliente = :id'),
+            [{'id': row.id_cliente, 'clave': _normalize(row.nombre_razon_social)} for row in clientes],
+        )
+
+    proyectos = bind.execute(
+        text('SELECT id_proyecto, nombre_proyecto, institucion, anho, subtipo FROM proyecto')
+    ).fetchall()
+    if proyectos:
+        bind.execute(
+            text(
+                'UPDATE proyecto SET nombre_busqueda = :nombre, subtipo_busqueda = :subtipo '
+                'WHERE id_proyecto = :id'
+            ),
+            [
+                {
+                    'id': row.id_proyecto,
+                    'nombre': _normalize(
+                        row.nombre_proyecto or f"{row.institucion or ''} {row.anho or ''}"
+                    ),
+                    'subtipo': _normalize(row.subtipo),
+                }
+                for row in proyectos
+            ],
+        )
+
+
+def upgrade():
+    op.add_column('cliente', sa.Column('nombre_busqueda', sa.String(length=255), nullable=True))
+    op.add_column('proyecto', sa.Column('nombre_busqueda', sa.String(length=255), nullable=True))
+    op.add_column('proyecto', sa.Column('subtipo_busqueda', sa.String(length=100), nullable=True))
+
+    bind = op.get_bind()
+    _backfill(bind)
+
+    if bind.dialect.name != 'postgresql':
+        return
+    for name, table, _ in REPLACED_INDEXES:
+        op.drop_index(name, table_name=table)
+    for name, table, column in KEY_INDEXES:
+        op.create_index(
+            name,
+            table,
+            [column],
+            postgresql_using='gin',
+            postgresql_ops={column: 'gin_trgm_ops'},
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        for name, table, _ in reversed(KEY_INDEXES):
+            op.drop_index(name, table_name=table)
+        for name, table, column in REPLACED_INDEXES:
+            op.create_index(
+                name,
+                table,
+                [column],
+                postgresql_using='gin',
+                postgresql_ops={column: 'gin_trgm_ops'},
+            )
+    op.drop_column('proyecto', 'subtipo_busqueda')
+    op.drop_column('proyecto', 'nombre_busqueda')
+    op.drop_column('cliente', 'nombre_busqueda')
@@ -0,0 +1,42 @@
+"""index for vencimientos filtered by client and month
+
+Revision ID: f7c3a1e5d2b8
+Revises: e6a8c2f4b9d3
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c3a1e5d2b8'
+down_revision = 'e6a8c2f4b9d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.create_index('ix_vencimiento_cliente_fecha', 'vencimiento', ['id_cliente', 'fecha_vencimiento'])
+        return
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_vencimiento_cliente_fecha',
+            'vencimiento',
+            ['id_cliente', 'fecha_vencimiento'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        op.drop_index('ix_vencimiento_cliente_fecha', table_name='vencimiento')
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_vencimiento_cliente_fecha',
+            table_name='vencimiento',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
@@ -0,0 +1,55 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from app.extensions import db
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv('UPLOAD_FOLDER', str(tmp_path / 'uploads'))
+    monkeypatch.setenv('ADMIN_USER', 'admin')
+    monkeypatch.setenv('ADMIN_PASSWORD', 'secreto')
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False, FRAGMENT_CACHE_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    client = app.test_client()
+    client.post('/login', data={'username': 'admin', 'password': 'secreto'})
+    return client
+
+
+class QueryCounter:
+    """Cuenta las sentencias que llegan al cursor (sin PRAGMA ni SAVEPOINT)."""
+
+    def __init__(self):
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')):
+            self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app):
+    def _count(fn):
+        counter = QueryCounter()
+        event.listen(db.engine, 'before_cursor_execute', counter)
+        try:
+            result = fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', counter)
+        return counter, result
+    return _count
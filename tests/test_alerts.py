@@ -0,0 +1,68 @@
+"""Avisos de vencimiento sobre la tabla plazo."""
+from datetime import date, timedelta
+
+from app.extensions import db
+from app.jobs.alerts import job_check_vencimientos
+from app.models import Cliente, Notificacion, Proyecto, ProyectoEstado, Vencimiento
+
+
+def _proyecto(vence_en):
+    cliente = Cliente(nombre_razon_social='Renovaciones SA')
+    db.session.add(cliente)
+    db.session.flush()
+    proyecto = Proyecto(
+        id_cliente=cliente.id_cliente,
+        institucion='MADES',
+        anho=2024,
+        subtipo='EIA',
+        nombre_proyecto='Licencia ambiental',
+        estado=ProyectoEstado.licencia_emitida,
+        fecha_vencimiento_licencia=date.today() + timedelta(days=vence_en),
+    )
+    db.session.add(proyecto)
+    db.session.commit()
+    return proyecto
+
+
+def test_rerun_does_not_repeat_alerts(app):
+    _proyecto(vence_en=5)
+    assert job_check_vencimientos() == 1
+    assert job_check_vencimientos() == 0
+
+
+def test_renewed_licence_alerts_again(app):
+    proyecto = _proyecto(vence_en=5)
+    assert job_check_vencimientos() == 1
+
+    # Renovación: nueva fecha de vencimiento, otra vez dentro de los 7 días
+    proyecto.fecha_vencimiento_licencia = date.today() + timedelta(days=6)
+    db.session.commit()
+
+    assert job_check_vencimientos() == 1
+    avisos = Notificacion.query.order_by(Notificacion.id_notificacion).all()
+    assert [(n.tipo, n.fecha_plazo) for n in avisos] == [
+        ('7_dias', date.today() + timedelta(days=5)),
+        ('7_dias', date.today() + timedelta(days=6)),
+    ]
+    assert len({n.id_plazo for n in avisos}) == 1
+    assert job_check_vencimientos() == 0
+
+
+def test_rescheduled_vencimiento_alerts_again(app):
+    cliente = Cliente(nombre_razon_social='Reprogramados SA')
+    db.session.add(cliente)
+    db.session.flush()
+    vencimiento = Vencimiento(
+        id_cliente=cliente.id_cliente,
+        tipo_documento='Licencia',
+        fecha_vencimiento=date.today() + timedelta(days=20),
+        estado='vigente',
+    )
+    db.session.add(vencimiento)
+    db.session.commit()
+    assert job_check_vencimientos() == 1
+
+    vencimiento.fecha_vencimiento = date.today() + timedelta(days=25)
+    db.session.commit()
+    assert job_check_vencimientos() == 1
+    assert {n.tipo for n in Notificacion.query} == {'30_dias'}
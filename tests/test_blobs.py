@@ -0,0 +1,41 @@
+"""Blobs colocados por una transacción que se revierte."""
+import os
+
+from app.extensions import db
+from app.models import Blob, Cliente, DocumentoCliente
+from app.storage import get_storage, store_file
+
+
+def _archivo(tmp_path):
+    path = tmp_path / 'data'
+    path.write_bytes(b'contenido de prueba')
+    return str(path)
+
+
+def test_rollback_discards_placed_blob(app, tmp_path):
+    source = _archivo(tmp_path)
+    sha256, key = store_file(source)
+    assert get_storage().exists(key)
+
+    db.session.rollback()
+
+    assert db.session.get(Blob, sha256) is None
+    assert not get_storage().exists(key)
+    # Se enlazó, no se movió: la carga sigue disponible para reintentar
+    assert os.path.exists(source)
+
+
+def test_rollback_keeps_blob_committed_elsewhere(app, tmp_path):
+    source = _archivo(tmp_path)
+    cliente = Cliente(nombre_razon_social='Blobs SA')
+    db.session.add(cliente)
+    db.session.flush()
+    sha256, key = store_file(source)
+    db.session.add(DocumentoCliente(id_cliente=cliente.id_cliente, archivo_url=key, sha256=sha256))
+    db.session.commit()
+
+    store_file(source)
+    db.session.rollback()
+
+    assert db.session.get(Blob, sha256).referencias == 1
+    assert get_storage().exists(key)
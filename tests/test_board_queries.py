@@ -0,0 +1,70 @@
+"""Las vistas de tableros y listados no hacen una consulta por proyecto."""
+from datetime import date, timedelta
+
+from app.extensions import db
+from app.models import Cliente, DocumentoProyecto, Proyecto, ProyectoEstado
+
+
+def _seed(cliente, cantidad, anho=2024):
+    for i in range(cantidad):
+        proyecto = Proyecto(
+            id_cliente=cliente.id_cliente,
+            institucion='MADES',
+            anho=anho,
+            subtipo='EIA',
+            nombre_proyecto=f'Proyecto {i}',
+            estado=ProyectoEstado.en_proceso if i % 2 else ProyectoEstado.licencia_emitida,
+            fecha_vencimiento_licencia=date.today() + timedelta(days=30 * i),
+        )
+        db.session.add(proyecto)
+        db.session.flush()
+        for nombre, categoria in (('mapa.pdf', 'mapa'), ('foto.jpg', 'imagen'), ('factura.pdf', 'factura')):
+            doc = DocumentoProyecto(
+                id_proyecto=proyecto.id_proyecto,
+                tipo=categoria,
+                categoria=categoria,
+                archivo_url=f'legacy/{proyecto.id_proyecto}/{nombre}',
+                nombre_original=nombre,
+            )
+            db.session.add(doc)
+            db.session.flush()
+            proyecto.registrar_documento(doc)
+    db.session.commit()
+
+
+def _cliente(nombre):
+    cliente = Cliente(nombre_razon_social=nombre)
+    db.session.add(cliente)
+    db.session.commit()
+    return cliente
+
+
+def test_board_query_count_does_not_grow_with_projects(client, count_queries):
+    chico = _cliente('Chico SA')
+    grande = _cliente('Grande SA')
+    _seed(chico, 5)
+    _seed(grande, 10)
+    url = '/proyectos/clientes/{}/ano/2024/institucion/MADES/proyectos'
+
+    pocos, respuesta = count_queries(lambda: client.get(url.format(chico.id_cliente)))
+    assert respuesta.status_code == 200
+    muchos, respuesta = count_queries(lambda: client.get(url.format(grande.id_cliente)))
+    assert respuesta.status_code == 200
+    assert b'Proyecto 9' in respuesta.data
+
+    assert muchos.count == pocos.count, muchos.statements
+    assert pocos.count <= 4, pocos.statements
+
+
+def test_project_list_query_count_does_not_grow_with_projects(app, client, count_queries):
+    cliente = _cliente('Lista SA')
+    _seed(cliente, 5)
+    pocos, respuesta = count_queries(lambda: client.get('/proyectos/?per_page=50'))
+    assert respuesta.status_code == 200
+
+    _seed(cliente, 5, anho=2023)
+    muchos, respuesta = count_queries(lambda: client.get('/proyectos/?per_page=50'))
+    assert respuesta.status_code == 200
+    assert b'Proyecto 4' in respuesta.data
+
+    assert muchos.count == pocos.count, muchos.statements
@@ -0,0 +1,73 @@
+"""Protocolo de cargas por partes (/proyectos/<id>/cargas)."""
+import hashlib
+
+import pytest
+
+from app.extensions import db
+from app.models import Cliente, DocumentoProyecto, Proyecto
+from app.uploads import record_result
+
+PDF = b'%PDF-1.4\n' + bytes(range(256)) * 8
+
+
+@pytest.fixture
+def carga(client, app):
+    cliente = Cliente(nombre_razon_social='Cargas SA')
+    db.session.add(cliente)
+    db.session.flush()
+    proyecto = Proyecto(id_cliente=cliente.id_cliente, institucion='MADES', anho=2024)
+    db.session.add(proyecto)
+    db.session.commit()
+    base = f'/proyectos/{proyecto.id_proyecto}/cargas'
+    respuesta = client.post(base, json={'filename': 'informe.pdf', 'size': len(PDF)})
+    assert respuesta.status_code == 201
+    return f"{base}/{respuesta.json['upload_id']}"
+
+
+def _parte(client, url, offset, data, checksum=None):
+    checksum = checksum or hashlib.sha256(data).hexdigest()
+    return client.put(f'{url}?offset={offset}', data=data, headers={'X-Chunk-Sha256': checksum})
+
+
+def test_wrong_offset_answers_409_with_received(client, carga):
+    assert _parte(client, carga, 0, PDF[:1000]).json['received'] == 1000
+
+    repetida = _parte(client, carga, 0, PDF[:1000])
+    assert repetida.status_code == 409
+    assert repetida.json['received'] == 1000
+    adelantada = _parte(client, carga, 1500, PDF[1500:])
+    assert adelantada.status_code == 409
+    assert adelantada.json['received'] == 1000
+    assert client.get(carga).json['received'] == 1000
+
+
+def test_checksum_mismatch_answers_422_without_writing(client, carga):
+    respuesta = _parte(client, carga, 0, PDF[:1000], checksum='0' * 64)
+    assert respuesta.status_code == 422
+    assert client.get(carga).json['received'] == 0
+
+
+def test_repeated_completar_returns_the_same_document(client, carga):
+    assert _parte(client, carga, 0, PDF).status_code == 200
+    primera = client.post(f'{carga}/completar')
+    assert primera.status_code == 200
+
+    # La respuesta se perdió: el cliente pregunta el estado y reintenta
+    estado = client.get(carga)
+    assert estado.status_code == 200
+    assert estado.json['received'] == len(PDF)
+    assert _parte(client, carga, len(PDF), b'x').status_code == 409
+    segunda = client.post(f'{carga}/completar')
+    assert segunda.status_code == 200
+    assert segunda.json == primera.json
+    assert DocumentoProyecto.query.count() == 1
+
+
+def test_result_of_a_rolled_back_completar_is_ignored(client, carga):
+    assert _parte(client, carga, 0, PDF).status_code == 200
+    # Resultado anotado por un intento cuyo commit no llegó a ocurrir
+    record_result(carga.rsplit('/', 1)[1], id_documento=999, sha256=hashlib.sha256(PDF).hexdigest())
+
+    respuesta = client.post(f'{carga}/completar')
+    assert respuesta.status_code == 200
+    assert respuesta.json['id_documento'] == DocumentoProyecto.query.one().id_documento
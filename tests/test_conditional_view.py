@@ -0,0 +1,28 @@
+"""ETags débiles de las vistas con GET condicional."""
+from datetime import date
+
+from app import cache
+from app.extensions import db
+from app.models import Cliente
+
+
+class _Manana(date):
+    @classmethod
+    def today(cls):
+        return date.fromordinal(date.today().toordinal() + 1)
+
+
+def test_etag_changes_with_the_day(client, monkeypatch):
+    cliente = Cliente(nombre_razon_social='Tablero SA')
+    db.session.add(cliente)
+    db.session.commit()
+    url = f'/proyectos/clientes/{cliente.id_cliente}/ano/2024/institucion/MADES/proyectos'
+
+    etag = client.get(url).headers['ETag']
+    assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+    # Al día siguiente las cuentas regresivas cambian aunque los datos no
+    monkeypatch.setattr(cache, 'date', _Manana)
+    respuesta = client.get(url, headers={'If-None-Match': etag})
+    assert respuesta.status_code == 200
+    assert respuesta.headers['ETag'] != etag
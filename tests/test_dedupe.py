@@ -0,0 +1,80 @@
+"""flask dedupe-documentos: paso de archivos viejos al almacén por contenido."""
+import os
+
+import pytest
+
+import app.storage as storage
+from app.extensions import db
+from app.models import Blob, Cliente, DocumentoCliente, DocumentoProyecto, Proyecto
+from app.storage import upload_root
+
+
+def _archivo(nombre, contenido):
+    ruta = os.path.join(upload_root(), 'clientes', nombre)
+    os.makedirs(os.path.dirname(ruta), exist_ok=True)
+    with open(ruta, 'wb') as fh:
+        fh.write(contenido)
+    return ruta
+
+
+@pytest.fixture
+def documentos(app):
+    cliente = Cliente(nombre_razon_social='Dedupe SA')
+    db.session.add(cliente)
+    db.session.flush()
+    proyecto = Proyecto(id_cliente=cliente.id_cliente, institucion='MADES', anho=2024)
+    db.session.add(proyecto)
+    db.session.flush()
+    unico = _archivo('unico.pdf', b'%PDF-1.4 unico')
+    compartido = _archivo('compartido.pdf', b'%PDF-1.4 compartido')
+    proyecto.mapa_archivo_url = 'clientes/unico.pdf'
+    db.session.add_all([
+        DocumentoProyecto(id_proyecto=proyecto.id_proyecto, archivo_url='clientes/unico.pdf'),
+        # El mismo archivo, por ruta relativa y por ruta absoluta
+        DocumentoProyecto(id_proyecto=proyecto.id_proyecto, archivo_url='clientes/compartido.pdf'),
+        DocumentoCliente(id_cliente=cliente.id_cliente, archivo_url=compartido),
+    ])
+    db.session.commit()
+    return proyecto.id_proyecto, unico, compartido
+
+
+def _dedupe(app):
+    return app.test_cli_runner().invoke(args=['dedupe-documentos', '--batch-size', '1'])
+
+
+def test_dedupe_moves_files_and_deletes_originals(app, documentos):
+    id_proyecto, unico, compartido = documentos
+    resultado = _dedupe(app)
+    assert resultado.exit_code == 0, resultado.output
+
+    assert not os.path.exists(unico) and not os.path.exists(compartido)
+    docs = DocumentoProyecto.query.all() + DocumentoCliente.query.all()
+    assert all(doc.sha256 and os.path.exists(storage.absolute_path(doc.archivo_url)) for doc in docs)
+    assert sorted(blob.referencias for blob in Blob.query) == [1, 2]
+    proyecto = db.session.get(Proyecto, id_proyecto)
+    assert proyecto.mapa_archivo_url.startswith(storage.BLOB_FOLDER + '/')
+
+
+def test_interrupted_dedupe_deletes_originals_of_committed_batches(app, documentos, monkeypatch):
+    _, unico, compartido = documentos
+    place_blob = storage.place_blob
+    llamadas = []
+
+    def _falla_en_el_segundo(*args, **kwargs):
+        llamadas.append(args)
+        if len(llamadas) == 2:
+            raise RuntimeError('corte')
+        return place_blob(*args, **kwargs)
+
+    monkeypatch.setattr(storage, 'place_blob', _falla_en_el_segundo)
+    assert _dedupe(app).exit_code != 0
+    db.session.rollback()
+    # El primer lote se confirmó y su original ya no hace falta
+    assert not os.path.exists(unico)
+    assert os.path.exists(compartido)
+
+    monkeypatch.setattr(storage, 'place_blob', place_blob)
+    assert _dedupe(app).exit_code == 0
+    assert not os.path.exists(compartido)
+    assert DocumentoProyecto.query.filter(DocumentoProyecto.sha256.is_(None)).count() == 0
+    assert DocumentoCliente.query.filter(DocumentoCliente.sha256.is_(None)).count() == 0
@@ -0,0 +1,116 @@
+"""Tipo de los documentos subidos: el contenido manda sobre la extensión."""
+import hashlib
+import io
+import os
+
+import pytest
+
+import app.jobs.documentos as documentos_jobs
+from app.extensions import db
+from app.models import DOC_FLAG_PDF, Blob, Cliente, DocumentoProyecto, Proyecto
+from app.storage import BLOB_FOLDER, STAGING_FOLDER, get_storage, upload_root
+
+PDF = b'%PDF-1.4\n' + b'0' * 200
+PNG = b'\x89PNG\r\n\x1a\n' + b'0' * 200
+
+
+@pytest.fixture
+def proyecto(app):
+    cliente = Cliente(nombre_razon_social='Documentos SA')
+    db.session.add(cliente)
+    db.session.flush()
+    proyecto = Proyecto(id_cliente=cliente.id_cliente, institucion='MADES', anho=2024)
+    db.session.add(proyecto)
+    db.session.commit()
+    return proyecto
+
+
+def _subir(client, id_proyecto, filename, data):
+    base = f'/proyectos/{id_proyecto}/cargas'
+    upload_id = client.post(base, json={'filename': filename, 'size': len(data)}).json['upload_id']
+    client.put(
+        f'{base}/{upload_id}?offset=0',
+        data=data,
+        headers={'X-Chunk-Sha256': hashlib.sha256(data).hexdigest()},
+    )
+    return client.post(f'{base}/{upload_id}/completar'), upload_id
+
+
+def test_category_and_flags_come_from_content(client, proyecto):
+    response, _ = _subir(client, proyecto.id_proyecto, 'informe.pdf', PDF)
+    assert response.status_code == 200
+
+    doc = DocumentoProyecto.query.one()
+    assert (doc.categoria, doc.mime_type) == ('pdf', 'application/pdf')
+    assert db.session.get(Proyecto, proyecto.id_proyecto).doc_flags == DOC_FLAG_PDF
+
+
+def test_renamed_file_is_rejected(client, proyecto):
+    response, upload_id = _subir(client, proyecto.id_proyecto, 'mapa.png', PDF)
+    assert response.status_code == 400
+
+    assert DocumentoProyecto.query.count() == 0
+    assert Blob.query.count() == 0
+    assert db.session.get(Proyecto, proyecto.id_proyecto).hero_documento_id is None
+    # La carga se descarta: reintentarla no puede funcionar
+    assert client.get(f'/proyectos/{proyecto.id_proyecto}/cargas/{upload_id}').status_code == 404
+
+
+def test_form_upload_rejects_renamed_file(client, proyecto):
+    response = client.post(
+        f'/proyectos/{proyecto.id_proyecto}/documentos',
+        data={'documentos': [(io.BytesIO(PNG), 'foto.jpg')]},
+        content_type='multipart/form-data',
+    )
+    assert response.status_code == 302
+    assert DocumentoProyecto.query.count() == 0
+
+
+def test_delete_releases_blob_set_by_worker(client, proyecto):
+    response, _ = _subir(client, proyecto.id_proyecto, 'informe.pdf', PDF)
+    doc = DocumentoProyecto.query.one()
+    sha256 = doc.sha256
+    # La sesión de la vista tiene la fila como la dejó la subida por formulario
+    # (sin sha256); el worker ya la pasó al almacén en otra transacción
+    tabla = DocumentoProyecto.__table__
+    with db.engine.begin() as connection:
+        connection.execute(tabla.update().values(sha256=None))
+    db.session.expire_all()
+    assert doc.sha256 is None
+    with db.engine.begin() as connection:
+        connection.execute(tabla.update().values(sha256=sha256))
+
+    response = client.post(f'/proyectos/doc/{doc.id_documento}/eliminar')
+    assert response.status_code == 302
+    assert db.session.get(Blob, sha256) is None
+
+
+def test_worker_places_spooled_documents_after_commit(client, proyecto, monkeypatch):
+    # Pool propio para poder esperar a que termine
+    monkeypatch.setattr(documentos_jobs, '_executor', None)
+    mapa = PDF + b'mapa'
+    respuesta = client.post(
+        f'/proyectos/{proyecto.id_proyecto}/editar',
+        data={
+            'mapa': (io.BytesIO(mapa), 'mapa.pdf'),
+            'facturas': [(io.BytesIO(PDF), 'factura.pdf')],
+        },
+        content_type='multipart/form-data',
+    )
+    assert respuesta.status_code == 302
+    db.session.commit()
+    documentos_jobs._executor.shutdown(wait=True)
+    db.session.expire_all()
+
+    docs = {doc.categoria: doc for doc in DocumentoProyecto.query}
+    assert set(docs) == {'mapa', 'factura'}
+    for doc, contenido in ((docs['mapa'], mapa), (docs['factura'], PDF)):
+        assert doc.sha256 == hashlib.sha256(contenido).hexdigest()
+        assert doc.archivo_url.startswith(BLOB_FOLDER + '/')
+        assert get_storage().exists(doc.archivo_url)
+        assert doc.mime_type == 'application/pdf'
+    proyecto = db.session.get(Proyecto, proyecto.id_proyecto)
+    assert proyecto.mapa_archivo_url == docs['mapa'].archivo_url
+    assert proyecto.factura_archivo_url == docs['factura'].archivo_url
+    assert sorted(blob.referencias for blob in Blob.query) == [1, 1]
+    assert os.listdir(os.path.join(upload_root(), STAGING_FOLDER, 'spool')) == []
@@ -0,0 +1,114 @@
+"""Los índices de los caminos de acceso (migración c5e1a9d3f7b6) se usan.
+
+Cada caso pide la ruta real, captura las sentencias que emite y pasa cada
+SELECT por EXPLAIN QUERY PLAN: el índice tiene que aparecer en el plan de
+alguna de ellas.
+"""
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.extensions import db
+from app.models import (
+    Cliente,
+    DocumentoCliente,
+    DocumentoProyecto,
+    Proyecto,
+    ProyectoEstado,
+    Vencimiento,
+)
+
+
+@pytest.fixture
+def datos(app):
+    hoy = date.today()
+    clientes = [Cliente(nombre_razon_social=f'Cliente {i:02d}') for i in range(20)]
+    db.session.add_all(clientes)
+    db.session.flush()
+    for i in range(200):
+        cliente = clientes[i % len(clientes)]
+        db.session.add(Proyecto(
+            id_cliente=cliente.id_cliente,
+            institucion=('MADES', 'SENAVE', 'INFONA')[i % 3],
+            anho=2020 + i % 5,
+            subtipo=('EIA', 'PGAG', 'Otros')[i % 3],
+            nombre_proyecto=f'Proyecto {i}',
+            estado=ProyectoEstado.en_proceso,
+            fecha_vencimiento_licencia=hoy + timedelta(days=i),
+        ))
+        db.session.add(Vencimiento(
+            id_cliente=cliente.id_cliente,
+            tipo_documento='Licencia',
+            fecha_vencimiento=hoy + timedelta(days=i),
+            estado='vigente',
+        ))
+        db.session.add(DocumentoCliente(
+            id_cliente=cliente.id_cliente,
+            nombre_original=f'doc{i}.pdf',
+            archivo_url=f'legacy/doc{i}.pdf',
+        ))
+    db.session.flush()
+    proyecto = Proyecto.query.filter_by(id_cliente=clientes[0].id_cliente).first()
+    for i in range(50):
+        db.session.add(DocumentoProyecto(
+            id_proyecto=proyecto.id_proyecto if i % 5 == 0 else proyecto.id_proyecto + i,
+            nombre_original=f'anexo{i}.pdf',
+            archivo_url=f'legacy/anexo{i}.pdf',
+            categoria='documento',
+            uploaded_at=hoy - timedelta(days=i),
+        ))
+    db.session.commit()
+    return {'cliente': clientes[0], 'proyecto': proyecto, 'hoy': hoy}
+
+
+def _planes(client, url):
+    """Detalle de EXPLAIN QUERY PLAN de cada SELECT que emite ``url``."""
+    capturadas = []
+
+    def _capturar(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            capturadas.append((statement, parameters))
+
+    event.listen(db.engine, 'before_cursor_execute', _capturar)
+    try:
+        respuesta = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', _capturar)
+    assert respuesta.status_code == 200, url
+
+    planes = []
+    with db.engine.connect() as conn:
+        for statement, parameters in capturadas:
+            filas = conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).all()
+            planes.append((statement, [fila[-1] for fila in filas]))
+    return planes
+
+
+def _usa_indice(planes, indice):
+    return any(indice in detalle for _, detalles in planes for detalle in detalles)
+
+
+CASOS = [
+    ('ix_proyecto_cliente_modulo',
+     lambda d: f"/proyectos/clientes/{d['cliente'].id_cliente}/ano/2020/institucion/MADES/proyectos"),
+    ('ix_proyecto_fecha_vencimiento_licencia',
+     lambda d: '/proyectos/?sort=vencimiento&direction=asc'),
+    ('ix_proyecto_institucion_lower', lambda d: '/proyectos/?sort=institucion&direction=asc'),
+    ('ix_proyecto_subtipo_lower', lambda d: '/proyectos/?sort=subtipo&direction=desc'),
+    ('ix_proyecto_nombre_lower', lambda d: '/proyectos/?sort=proyecto&direction=asc'),
+    ('ix_cliente_nombre_lower', lambda d: '/clientes/lookup'),
+    ('ix_documento_proyecto_proyecto_fecha',
+     lambda d: f"/proyectos/{d['proyecto'].id_proyecto}/editar"),
+    ('ix_vencimiento_fecha_vencimiento',
+     lambda d: f"/vencimientos/?mes={d['hoy'].strftime('%Y-%m')}"),
+    ('ix_documento_cliente_cliente', lambda d: f"/clientes/{d['cliente'].id_cliente}/detalle"),
+]
+
+
+@pytest.mark.parametrize('indice,url', CASOS, ids=[indice for indice, _ in CASOS])
+def test_route_uses_index(app, client, datos, indice, url):
+    planes = _planes(client, url(datos))
+    assert _usa_indice(planes, indice), '\n'.join(
+        f'{statement}\n  -> {detalles}' for statement, detalles in planes
+    )
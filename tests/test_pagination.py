@@ -0,0 +1,27 @@
+"""Paginación de los listados en modo OFFSET."""
+import pytest
+
+import app.clientes.routes as clientes_routes
+import app.proyectos.routes as proyectos_routes
+from app.extensions import db
+from app.models import Cliente, Proyecto
+
+
+@pytest.fixture
+def estimado(app, monkeypatch):
+    # Como si la tabla fuera grande: el total viene del planificador
+    app.config['LIST_PAGINATION_MODE'] = 'offset'
+    for modulo in (clientes_routes, proyectos_routes):
+        monkeypatch.setattr(modulo, 'count_rows', lambda query: (12345, True))
+    cliente = Cliente(nombre_razon_social='Estimados SA')
+    db.session.add(cliente)
+    db.session.flush()
+    db.session.add(Proyecto(id_cliente=cliente.id_cliente, institucion='MADES', anho=2024))
+    db.session.commit()
+
+
+@pytest.mark.parametrize('url', ['/clientes/', '/proyectos/'])
+def test_offset_mode_marks_estimated_total(client, estimado, url):
+    respuesta = client.get(url)
+    assert respuesta.status_code == 200
+    assert '~12345' in respuesta.get_data(as_text=True)
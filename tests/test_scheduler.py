@@ -0,0 +1,48 @@
+"""Programador de tareas persistidas en la base."""
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.background import BackgroundScheduler
+
+import app.jobs.alerts as alerts
+import app.jobs.scheduler as scheduler_module
+from app.extensions import db
+from app.jobs.scheduler import JOBS_TABLE, create_scheduler
+
+
+def test_missed_run_is_caught_up_once_after_restart(app, monkeypatch):
+    corridas = []
+    corrio = threading.Event()
+
+    def _job():
+        corridas.append(datetime.now(timezone.utc))
+        corrio.set()
+
+    monkeypatch.setattr(scheduler_module, '_app', app)
+    monkeypatch.setattr(alerts, 'job_check_vencimientos', _job)
+
+    # Primera vida del proceso: deja guardada una corrida que quedó atrás
+    scheduler = create_scheduler(db.engine, BackgroundScheduler)
+    scheduler.start(paused=True)
+    scheduler.shutdown()
+    store = SQLAlchemyJobStore(engine=db.engine, tablename=JOBS_TABLE)
+    store.start(scheduler, 'default')
+    job = store.lookup_job('check_vencimientos')
+    job.next_run_time = datetime.now(timezone.utc) - timedelta(days=1)
+    store.update_job(job)
+
+    # Reinicio: la corrida perdida se ejecuta una sola vez
+    scheduler = create_scheduler(db.engine, BackgroundScheduler)
+    scheduler.start()
+    try:
+        assert corrio.wait(10)
+        time.sleep(0.5)
+        proxima = scheduler.get_job('check_vencimientos').next_run_time
+    finally:
+        scheduler.shutdown()
+
+    assert len(corridas) == 1
+    assert proxima > datetime.now(timezone.utc)
+    assert (proxima.hour, proxima.minute) == (7, 0)
@@ -0,0 +1,39 @@
+"""Búsqueda de clientes con texto libre del usuario."""
+import pytest
+
+from app.extensions import db
+from app.models import Cliente
+
+
+@pytest.fixture
+def clientes(app):
+    db.session.add_all([
+        Cliente(nombre_razon_social='Núñez SA', cedula_identidad='1234567'),
+        Cliente(nombre_razon_social='Agro 100% Natural', cedula_identidad='7654321'),
+        Cliente(nombre_razon_social='Campo_Verde', cedula_identidad='5550001'),
+    ])
+    db.session.commit()
+
+
+def _nombres(client, q):
+    respuesta = client.get('/clientes/lookup', query_string={'q': q})
+    assert respuesta.status_code == 200
+    return sorted(item['nombre'] for item in respuesta.get_json()['items'])
+
+
+@pytest.mark.parametrize('q', ['%', '_', '\\'])
+def test_lookup_wildcards_are_literal(client, clientes, q):
+    esperado = {'%': ['Agro 100% Natural'], '_': ['Campo_Verde'], '\\': []}[q]
+    assert _nombres(client, q) == esperado
+
+
+def test_lookup_still_matches_prefix_and_accents(client, clientes):
+    assert _nombres(client, 'nunez') == ['Núñez SA']
+    assert _nombres(client, '765') == ['Agro 100% Natural']
+
+
+def test_client_list_wildcards_are_literal(client, clientes):
+    respuesta = client.get('/clientes/', query_string={'q': '%'})
+    assert respuesta.status_code == 200
+    assert b'Agro 100% Natural' in respuesta.data
+    assert 'Núñez SA'.encode() not in respuesta.data
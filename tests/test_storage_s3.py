@@ -0,0 +1,172 @@
+"""Backend S3 contra un cliente falso en memoria (el papel de MinIO en desarrollo)."""
+import hashlib
+import io
+import os
+
+import pytest
+
+import app.storage as storage
+from app.extensions import db
+from app.models import Cliente, DocumentoCliente, Proyecto
+from app.storage import S3Storage, send_stored, upload_root
+
+
+def _no_existe():
+    error = storage.ClientError({'Error': {'Code': '404'}}, 'HeadObject')
+    error.response = {'Error': {'Code': '404'}}
+    return error
+
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise _no_existe()
+        data = self.objects[Key]
+        return {'ContentLength': len(data), 'ETag': f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def upload_file(self, path, bucket, key):
+        with open(path, 'rb') as fh:
+            self.objects[key] = fh.read()
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self.objects[Key]
+        self.ranges.append(Range)
+        if Range:
+            start, end = Range[len('bytes='):].split('-')
+            data = data[int(start):int(end) + 1]
+        return {'Body': io.BytesIO(data)}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop(Key, None)
+
+    def download_file(self, bucket, key, path):
+        if key not in self.objects:
+            raise _no_existe()
+        with open(path, 'wb') as fh:
+            fh.write(self.objects[key])
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f"https://s3.test/{Params['Key']}?expira={ExpiresIn}&ct={Params.get('ResponseContentType')}"
+
+
+@pytest.fixture
+def s3(app, tmp_path):
+    fake = FakeS3()
+    app.extensions['storage'] = S3Storage(
+        'bucket', prefix='pre', cache_root=str(tmp_path / 'cache'), client=fake
+    )
+    return fake
+
+
+def _archivo(tmp_path, nombre='a.pdf', contenido=b'%PDF-1.4 contenido'):
+    ruta = tmp_path / nombre
+    ruta.write_bytes(contenido)
+    return str(ruta)
+
+
+def test_backend_operations(app, s3, tmp_path):
+    backend = storage.get_storage()
+    origen = _archivo(tmp_path)
+    assert not backend.exists('clientes/a.pdf')
+
+    backend.save_file('clientes/a.pdf', origen)
+    assert backend.exists('clientes/a.pdf') and os.path.exists(origen)
+    assert s3.objects['pre/clientes/a.pdf'] == b'%PDF-1.4 contenido'
+    backend.save_file('clientes/b.pdf', origen, move=True)
+    assert not os.path.exists(origen)
+
+    copia = backend.local_copy('clientes/a.pdf')
+    assert open(copia, 'rb').read() == b'%PDF-1.4 contenido'
+    assert backend.local_copy('clientes/no-existe.pdf') is None
+
+    url = backend.download_url('clientes/a.pdf', 'a.pdf', True, 'application/pdf')
+    assert url == 'https://s3.test/pre/clientes/a.pdf?expira=300&ct=application/pdf'
+
+    backend.delete('clientes/a.pdf')
+    assert not backend.exists('clientes/a.pdf')
+    # La copia en caché se va con el objeto
+    assert not os.path.exists(copia)
+
+
+def test_send_stored_redirects_to_presigned_url(app, s3, tmp_path):
+    storage.get_storage().save_file('clientes/a.pdf', _archivo(tmp_path))
+    with app.test_request_context():
+        respuesta = send_stored('clientes/a.pdf', 'a.pdf', as_attachment=True)
+        assert respuesta.status_code == 302
+        assert respuesta.location.startswith('https://s3.test/pre/clientes/a.pdf')
+        assert send_stored('clientes/otro.pdf', 'otro.pdf', as_attachment=True).status_code == 302
+
+
+def test_streamed_download_honours_range(app, s3, tmp_path):
+    contenido = bytes(range(256)) * 40
+    backend = storage.get_storage()
+    backend.presign_expires = 0
+    backend.save_file('clientes/capas.zip', _archivo(tmp_path, 'capas.zip', contenido))
+    etag = hashlib.md5(contenido).hexdigest()
+
+    def _descargar(**headers):
+        with app.test_request_context(headers=headers):
+            respuesta = send_stored('clientes/capas.zip', 'capas.zip', as_attachment=True)
+            if respuesta is not None:
+                respuesta.direct_passthrough = False
+            return respuesta
+
+    completa = _descargar()
+    assert completa.status_code == 200
+    assert completa.content_length == len(contenido) and completa.get_data() == contenido
+    assert completa.headers['Accept-Ranges'] == 'bytes'
+
+    parcial = _descargar(Range='bytes=1000-1999')
+    assert parcial.status_code == 206
+    assert parcial.get_data() == contenido[1000:2000]
+    assert parcial.headers['Content-Range'] == f'bytes 1000-1999/{len(contenido)}'
+    # Solo se pidió esa parte al backend
+    assert s3.ranges[-1] == 'bytes=1000-1999'
+
+    assert _descargar(Range='bytes=5000-', **{'If-Range': f'"{etag}"'}).status_code == 206
+    assert _descargar(Range='bytes=5000-', **{'If-Range': '"otro"'}).status_code == 200
+    assert _descargar(Range=f'bytes={len(contenido)}-').status_code == 416
+
+    with app.test_request_context():
+        assert send_stored('clientes/no-existe.zip', 'x.zip', as_attachment=True) is None
+
+
+def test_migrate_storage_uploads_tree_and_rewrites_paths(app, s3, tmp_path):
+    root = upload_root()
+    for relativa in ('clientes/1/viejo.pdf', 'proyectos/mapa.png', '_cache/x', '_cargas/spool/y'):
+        ruta = os.path.join(root, *relativa.split('/'))
+        os.makedirs(os.path.dirname(ruta), exist_ok=True)
+        with open(ruta, 'wb') as fh:
+            fh.write(relativa.encode())
+    afuera = _archivo(tmp_path, 'afuera.pdf')
+
+    cliente = Cliente(nombre_razon_social='Migración SA')
+    db.session.add(cliente)
+    db.session.flush()
+    db.session.add_all([
+        DocumentoCliente(id_cliente=cliente.id_cliente, archivo_url=os.path.join(root, 'clientes', '1', 'viejo.pdf')),
+        DocumentoCliente(id_cliente=cliente.id_cliente, archivo_url=afuera),
+        Proyecto(
+            id_cliente=cliente.id_cliente,
+            mapa_archivo_url=os.path.join(root, 'proyectos', 'mapa.png'),
+            factura_archivo_url='proyectos/factura.pdf',
+        ),
+    ])
+    db.session.commit()
+
+    resultado = app.test_cli_runner().invoke(args=['migrate-storage', '--delete-local'])
+    assert resultado.exit_code == 0, resultado.output
+
+    assert sorted(s3.objects) == ['pre/clientes/1/viejo.pdf', 'pre/proyectos/mapa.png']
+    assert not os.path.exists(os.path.join(root, 'clientes', '1', 'viejo.pdf'))
+    assert os.path.exists(os.path.join(root, '_cargas', 'spool', 'y'))
+    urls = sorted(doc.archivo_url for doc in DocumentoCliente.query)
+    assert urls == sorted(['clientes/1/viejo.pdf', afuera])
+    proyecto = Proyecto.query.one()
+    assert (proyecto.mapa_archivo_url, proyecto.factura_archivo_url) == (
+        'proyectos/mapa.png', 'proyectos/factura.pdf'
+    )